@@ -0,0 +1,301 @@
+"""
+End-to-end benchmarks for install_programs_and_configure().
+
+Every scenario runs offline: the OpenAI client is replaced by an in-process fake and
+apt, dpkg-query, sudo and ansible-playbook are replaced by shell shims on a
+temporary PATH. For each scenario the report records wall time, the subprocesses
+spawned, the LLM calls made and the bytes of prompt sent.
+
+    python benchmarks/bench.py --output report.json
+    python benchmarks/bench.py --compare report.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from program_installer import index, main, names  # noqa: E402
+from program_installer.retry import RetryPolicy, reset_circuit_breakers  # noqa: E402
+from program_installer.environment import reset_environment_facts  # noqa: E402
+from program_installer.prompts import usage_log  # noqa: E402
+
+# Marks a generated task that the ansible-playbook shim rejects in --syntax-check.
+SYNTAX_ERROR_MARKER = "FAIL_SYNTAX"
+
+SHIMS = {
+    "sudo": 'exec "$@"\n',
+    "apt": "exit 0\n",
+    "snap": "exit 0\n",
+    # Nothing is installed yet, so every program is missing.
+    "dpkg-query": "exit 1\n",
+    # What the distribution repositories offer; the rest is left to the playbook.
+    "apt-cache": "printf '%s\\n' docker.io evince gimp git htop libreoffice neovim tmux vlc\n",
+    "ansible-playbook": """playbook="$1"
+case " $* " in
+  *" --syntax-check "*)
+    n=0
+    while IFS= read -r line; do
+      n=$((n+1))
+      case "$line" in
+        *%(marker)s*)
+          echo "ERROR! couldn't resolve module/action '%(marker)s'."
+          echo "The error appears to be in '$playbook': line $n, column 7, but may"
+          exit 4;;
+      esac
+    done < "$playbook"
+    echo "playbook: $playbook"
+    exit 0;;
+esac
+echo "PLAY RECAP *********************************************************************"
+echo "localhost : ok=1 changed=0 unreachable=0 failed=0 skipped=0 rescued=0 ignored=0"
+exit 0
+""" % {"marker": SYNTAX_ERROR_MARKER},
+}
+
+SCENARIOS = {
+    "basic": {"choice": "a", "programs": main.BASIC_PROGRAMS["linux"]},
+    "developer": {"choice": "b", "programs": main.DEVELOPER_PROGRAMS["linux"]},
+    "custom": {"choice": "c", "programs": ["git", "htop", "neovim", "tmux"]},
+    "repair-loop": {"choice": "c", "programs": ["htop", "broken-tool"]},
+}
+
+FRAGMENTS_RE = re.compile(r"install it on \S+?(?: using \S+)?: (.*?)\. Answer with a YAML mapping")
+
+
+class FakeAPIError(Exception):
+    status_code = 500
+
+
+def apt_task(program, name=None):
+    return (
+        f"- name: {name or 'Install ' + program}\n"
+        f"  apt:\n"
+        f"    name: {program}\n"
+        f"    state: present\n"
+        f"  become: true\n"
+        f"  ignore_errors: true\n"
+    )
+
+
+def fake_answer(prompt):
+    """
+    Answers the prompts sent by main.py with valid YAML. Programs named "broken-*"
+    get a task that fails the syntax check until it is repaired on its own.
+    """
+    match = FRAGMENTS_RE.search(prompt)
+    if match:
+        answer = ""
+        for program in match.group(1).split(", "):
+            name = f"Install {program} {SYNTAX_ERROR_MARKER}" if program.startswith("broken-") else None
+            answer += f"{program}:\n" + "".join("  " + line + "\n" for line in apt_task(program, name).splitlines())
+        return answer
+    if prompt.startswith("Fix the following Ansible task"):
+        return apt_task("broken-tool")
+    return "---\n- hosts: localhost\n  connection: local\n  tasks:\n" + "".join(
+        "    " + line + "\n" for line in apt_task("placeholder").splitlines()
+    )
+
+
+class FakeOpenAI:
+    """
+    Stands in for openai.OpenAI with a configurable latency and failure rate.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.prompt_bytes = 0
+        self.completion_bytes = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, stream=False, timeout=None):
+        prompt = "".join(m["content"] for m in messages)
+        self.calls += 1
+        self.prompt_bytes += len(prompt.encode("utf-8"))
+        time.sleep(self.latency)
+        if self.random.random() < self.failure_rate:
+            raise FakeAPIError("Internal server error")
+
+        content = fake_answer(prompt)
+        self.completion_bytes += len(content.encode("utf-8"))
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4, completion_tokens=len(content) // 4,
+                                total_tokens=(len(prompt) + len(content)) // 4)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+def write_shims(directory):
+    for name, body in SHIMS.items():
+        path = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\n" + body)
+        os.chmod(path, 0o755)
+
+
+@contextlib.contextmanager
+def sandbox(directory):
+    """
+    Runs with the shims as the only PATH entries, fresh caches, fast retries and
+    every spawned subprocess recorded.
+    """
+    commands = []
+    original_popen = subprocess.Popen
+
+    class CountingPopen(original_popen):
+        def __init__(self, args, *rest, **kwargs):
+            commands.append(args if isinstance(args, str) else [str(a) for a in args])
+            super().__init__(args, *rest, **kwargs)
+
+    shim_dir = os.path.join(directory, "bin")
+    os.makedirs(shim_dir)
+    write_shims(shim_dir)
+
+    saved_env = {key: os.environ.get(key) for key in ("PATH", "AES_CM_CACHE_DIR")}
+    saved_cwd = os.getcwd()
+    saved_policy = main.DEFAULT_RETRY_POLICY
+    saved_index_paths = dict(index.INDEX_PATHS)
+    saved_name_commands = names.NAME_COMMANDS
+    os.environ["PATH"] = shim_dir
+    os.environ["AES_CM_CACHE_DIR"] = os.path.join(directory, "cache")
+    os.chdir(directory)
+    main.DEFAULT_RETRY_POLICY = RetryPolicy(base_delay=0.01, max_delay=0.05)
+    # No package index inside the sandbox, so every run refreshes it whatever the host's state.
+    index.INDEX_PATHS.update((manager, [os.path.join(directory, "index")]) for manager in index.INDEX_PATHS)
+    names.NAME_COMMANDS = {"apt": [["apt-cache", "pkgnames"]]}
+    subprocess.Popen = CountingPopen
+    reset_environment_facts()
+    reset_circuit_breakers()
+    usage_log.clear()
+    try:
+        yield commands
+    finally:
+        subprocess.Popen = original_popen
+        main.DEFAULT_RETRY_POLICY = saved_policy
+        index.INDEX_PATHS.update(saved_index_paths)
+        names.NAME_COMMANDS = saved_name_commands
+        os.chdir(saved_cwd)
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        reset_environment_facts()
+        reset_circuit_breakers()
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Silences the installer and the subprocesses it spawns.
+    """
+    sys.stdout.flush()
+    saved_fd = os.dup(1)
+    with open(os.devnull, "w") as devnull:
+        os.dup2(devnull.fileno(), 1)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                yield
+        finally:
+            os.dup2(saved_fd, 1)
+            os.close(saved_fd)
+
+
+def run_scenario(name, latency=0.0, failure_rate=0.0, seed=0, verbose=False):
+    scenario = SCENARIOS[name]
+    client = FakeOpenAI(latency=latency, failure_rate=failure_rate, seed=seed)
+    with tempfile.TemporaryDirectory() as directory, sandbox(directory) as commands:
+        started = time.perf_counter()
+        with contextlib.nullcontext() if verbose else quiet():
+            main.install_programs_and_configure(list(scenario["programs"]), "linux", client, scenario["choice"])
+        wall_time = time.perf_counter() - started
+        playbook_ran = any(c[:1] == ["ansible-playbook"] and "--syntax-check" not in c for c in commands)
+
+    return {
+        "wall_time": round(wall_time, 4),
+        "subprocesses": len(commands),
+        # Playbook preparation overlaps the native install, so the order is not stable.
+        "commands": sorted(" ".join(c) if isinstance(c, list) else c for c in commands),
+        "llm_calls": client.calls,
+        "prompt_bytes": client.prompt_bytes,
+        "completion_bytes": client.completion_bytes,
+        "playbook_ran": playbook_ran,
+    }
+
+
+def run_all(names=None, latency=0.0, failure_rate=0.0, seed=0, verbose=False):
+    return {
+        "python": platform.python_version(),
+        "latency": latency,
+        "failure_rate": failure_rate,
+        "scenarios": {
+            name: run_scenario(name, latency, failure_rate, seed, verbose) for name in (names or SCENARIOS)
+        },
+    }
+
+
+def compare(baseline, report):
+    """
+    Returns one line per metric that differs from the baseline.
+    """
+    lines = []
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for metric in ("subprocesses", "llm_calls", "prompt_bytes", "completion_bytes", "playbook_ran"):
+            if previous.get(metric) != current.get(metric):
+                lines.append(f"{name}: {metric} {previous.get(metric)} -> {current.get(metric)}")
+        if previous.get("wall_time"):
+            ratio = current["wall_time"] / previous["wall_time"]
+            # Ignore noise on runs that only take a few milliseconds.
+            if ratio > 1.25 and current["wall_time"] - previous["wall_time"] > 0.05:
+                lines.append(f"{name}: wall_time {previous['wall_time']}s -> {current['wall_time']}s ({ratio:.1f}x)")
+    return lines
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmarks for program-installer.")
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all).")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds each fake LLM call takes.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of fake LLM calls that fail.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the fake failures.")
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against an earlier JSON report.")
+    parser.add_argument("--verbose", action="store_true", help="Show the installer's output.")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    report = run_all(args.scenarios, args.latency, args.failure_rate, args.seed, args.verbose)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            differences = compare(json.load(f), report)
+        for line in differences:
+            print(line, file=sys.stderr)
+        if differences:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -15,6 +15,7 @@ setup(
     install_requires=[
         "python-dotenv",
         "openai",
+        "PyYAML",
     ],
     entry_points={
         'console_scripts': [
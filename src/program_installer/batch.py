@@ -0,0 +1,176 @@
+import json
+import re
+import threading
+import time
+
+from .cache import normalize_programs
+from .prompts import estimate_tokens
+from .validator import load_yaml
+
+DEFAULT_WORKERS = 4
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 90000
+# Budgeted for the answer of every request; corrected from response.usage when it is reported.
+EXPECTED_OUTPUT_TOKENS = 1500
+
+LISTS = {"basic": "a", "developer": "b"}
+NAME_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class TokenBucket:
+    """
+    Allows `rate_per_minute` units per minute with bursts up to `capacity`.
+    acquire() blocks until enough units are available.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        # A request larger than the bucket waits for a full bucket instead of forever.
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            self.sleep(wait)
+
+    def consume(self, amount):
+        """
+        Debits (or, for a negative amount, credits) units without waiting.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """
+    Enforces a requests-per-minute and a tokens-per-minute quota together.
+    """
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.requests = TokenBucket(requests_per_minute, clock=clock, sleep=sleep)
+        self.tokens = TokenBucket(tokens_per_minute, clock=clock, sleep=sleep)
+
+    def acquire(self, tokens):
+        self.requests.acquire(1)
+        self.tokens.acquire(tokens)
+
+
+class _Namespace:
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+class RateLimitedClient:
+    """
+    Wraps an OpenAI client so that every chat completion, including retries and
+    repairs, waits for the rate limiter first.
+    """
+
+    def __init__(self, client, limiter, expected_output_tokens=EXPECTED_OUTPUT_TOKENS):
+        self._client = client
+        self._limiter = limiter
+        self._expected_output_tokens = expected_output_tokens
+        self.chat = _Namespace(completions=_Namespace(create=self._create))
+
+    def _create(self, **kwargs):
+        prompt = "".join(m.get("content") or "" for m in kwargs.get("messages", []))
+        estimate = estimate_tokens(prompt) + self._expected_output_tokens
+        self._limiter.acquire(estimate)
+        response = self._client.chat.completions.create(**kwargs)
+
+        usage = getattr(response, "usage", None)
+        total = getattr(usage, "total_tokens", None)
+        if isinstance(total, int):
+            self._limiter.tokens.consume(total - estimate)
+        return response
+
+
+def load_profiles(path):
+    """
+    Reads a JSON or YAML list of profiles such as
+    {"name": "web", "os": "linux", "package_manager": "apt", "programs": ["git", "vim"]}.
+    Instead of "programs", a profile may name a built-in "list": basic or developer.
+    """
+    with open(path, "r") as f:
+        text = f.read()
+    if path.endswith((".yml", ".yaml")):
+        data = load_yaml().safe_load(text)
+    else:
+        data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("profiles", [])
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: expected a list of profiles.")
+    return data
+
+
+def profile_name(profile, index):
+    name = NAME_RE.sub("-", str(profile.get("name") or f"profile-{index + 1}")).strip("-")
+    return name or f"profile-{index + 1}"
+
+
+def profile_request(profile, builtin_lists):
+    """
+    Returns (os_name, package_manager, choice, programs) for a profile, or raises ValueError.
+    `builtin_lists` maps the choices 'a' and 'b' to {os_name: programs}.
+    """
+    os_name = str(profile.get("os", "")).lower()
+    if os_name not in ("linux", "darwin"):
+        raise ValueError(f"unsupported os '{profile.get('os')}'")
+    pm = profile.get("package_manager")
+
+    if profile.get("list"):
+        choice = LISTS.get(str(profile["list"]).lower())
+        if choice is None:
+            raise ValueError(f"unknown list '{profile['list']}'")
+        programs = builtin_lists[choice].get(os_name, [])
+    else:
+        choice = "c"
+        programs = profile.get("programs") or []
+        if isinstance(programs, str):
+            programs = programs.split(",")
+        programs = [p.strip() for p in programs if p.strip()]
+    if not programs:
+        raise ValueError("no programs")
+    return os_name, pm, choice, programs
+
+
+def dedup_requests(profiles, builtin_lists):
+    """
+    Groups profiles that ask for the same playbook. Returns (requests, errors) where
+    requests maps (os_name, package_manager, programs) to {"choice", "programs", "names"}
+    and errors maps profile names to the reason they were rejected.
+    """
+    requests = {}
+    errors = {}
+    for index, profile in enumerate(profiles):
+        name = profile_name(profile if isinstance(profile, dict) else {}, index)
+        try:
+            if not isinstance(profile, dict):
+                raise ValueError("profile must be a mapping")
+            os_name, pm, choice, programs = profile_request(profile, builtin_lists)
+        except ValueError as e:
+            errors[name] = str(e)
+            continue
+        key = (os_name, pm, tuple(normalize_programs(programs)))
+        request = requests.setdefault(key, {"choice": choice, "programs": programs, "names": []})
+        request["names"].append(name)
+    return requests, errors
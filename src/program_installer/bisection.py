@@ -0,0 +1,75 @@
+import re
+import subprocess
+
+from .runner import run_streaming
+
+# Lines in which a package manager names a package it cannot install. Packages
+# reported this way are set aside without bisecting.
+NAMED_FAILURE_PATTERNS = [
+    re.compile(r"Unable to locate package (\S+)"),  # apt
+    re.compile(r"Package '?(\S+?)'? has no installation candidate"),  # apt
+    re.compile(r"No match for argument: (\S+)"),  # dnf
+    re.compile(r"No package (\S+) available"),  # yum
+    re.compile(r"target not found: (\S+)"),  # pacman
+    re.compile(r"error: snap \"([^\"]+)\" not found"),  # snap
+    re.compile(r"No available (?:formula|cask|formula or cask) with the name \"([^\"]+)\""),  # brew
+    re.compile(r"^(\S+) not installed\. The package was not found", re.MULTILINE),  # choco
+]
+
+ERROR_LINES = 5
+
+
+def named_failures(output, batch):
+    """
+    Returns {package: error line} for the packages of batch that the output names
+    as impossible to install.
+    """
+    failures = {}
+    for line in output.splitlines():
+        for pattern in NAMED_FAILURE_PATTERNS:
+            for match in pattern.finditer(line):
+                if match.group(1) in batch:
+                    failures[match.group(1)] = line.strip()
+    return failures
+
+
+def error_tail(output):
+    lines = [line for line in output.splitlines() if line.strip()]
+    return "\n".join(lines[-ERROR_LINES:])
+
+
+def install_bisecting(build_command, packages, run=None):
+    """
+    Installs packages with build_command(batch) and isolates the ones that fail.
+    When a batch fails, packages the package manager names in its error are dropped
+    and the rest is retried; otherwise the batch is split in half. Finding k bad
+    packages among n takes O(k log n) runs. Returns (installed, failed), where
+    failed maps each bad package to its error output.
+    """
+    run = run or run_streaming
+    installed = []
+    failed = {}
+    pending = [list(packages)]
+    while pending:
+        batch = pending.pop()
+        if not batch:
+            continue
+        try:
+            run(build_command(batch))
+        except subprocess.CalledProcessError as e:
+            output = (e.output or b"").decode("utf-8", errors="replace")
+            named = named_failures(output, batch)
+            if named:
+                failed.update(named)
+                pending.append([p for p in batch if p not in named])
+            elif len(batch) == 1:
+                failed[batch[0]] = error_tail(output) or str(e)
+            else:
+                middle = len(batch) // 2
+                print(f"Installing {len(batch)} packages failed; retrying them in two halves.")
+                # Popped last-in first-out, so the first half runs first.
+                pending.append(batch[middle:])
+                pending.append(batch[:middle])
+        else:
+            installed.extend(batch)
+    return [p for p in packages if p in installed], failed
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60  # seconds
+
+
+def cache_dir(*parts):
+    """
+    Returns the cache directory, honoring AES_CM_CACHE_DIR and XDG_CACHE_HOME.
+    """
+    base = os.environ.get("AES_CM_CACHE_DIR")
+    if not base:
+        xdg_cache = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        base = os.path.join(xdg_cache, "aes-cm")
+    return os.path.join(base, *parts)
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(*parts):
+    serialized = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return content_hash(serialized)
+
+
+def normalize_programs(programs):
+    return sorted({p.strip().lower() for p in programs if p.strip()})
+
+
+def playbook_cache_key(os_name, programs, template, prompt_version, model):
+    """
+    Builds the content address of a generated playbook.
+    Any change to the OS, program set, template text, prompt wording or model list
+    produces a different key, so stale entries are never returned.
+    """
+    template_hash = content_hash(template) if template else None
+    return cache_key("playbook", os_name, normalize_programs(programs), template_hash, prompt_version, model)
+
+
+def optimized_cache_key(content, optimizer_version):
+    """
+    Builds the address of the optimized version of a checked playbook.
+    """
+    return cache_key("optimized", content_hash(content), optimizer_version)
+
+
+def write_atomic(path, text):
+    """
+    Writes text to path via a temporary file and rename so that concurrent
+    readers never observe a partially written file.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class DiskCache:
+    """
+    A directory of text entries with LRU eviction by entry count, total size and age.
+    Recency is tracked through file modification times, which are bumped on every hit.
+    """
+
+    def __init__(self, directory, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age=DEFAULT_MAX_AGE, suffix=".yml"):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.suffix = suffix
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        if time.time() - stat.st_mtime > self.max_age:
+            self._remove(path)
+            return None
+
+        try:
+            with open(path, "r") as f:
+                content = f.read()
+        except OSError:
+            return None
+        if not content:
+            return None
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return content
+
+    def put(self, key, content):
+        try:
+            write_atomic(self._path(key), content)
+            self.evict()
+        except OSError as e:
+            print(f"Warning: Could not write cache entry: {e}")
+
+    def entries(self):
+        """
+        Returns (mtime, size, path) tuples for all entries, oldest first.
+        """
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+
+        entries = []
+        for name in names:
+            if not name.endswith(self.suffix) or name.startswith("."):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for mtime, size, path in self.entries():
+            if now - mtime > self.max_age:
+                self._remove(path)
+            else:
+                entries.append((mtime, size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, path = entries.pop(0)
+            self._remove(path)
+            total_bytes -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def playbook_cache():
+    return DiskCache(cache_dir("playbooks"))
@@ -0,0 +1,127 @@
+# Offline catalog of the programs in BASIC_PROGRAMS and DEVELOPER_PROGRAMS.
+# Each entry maps a backend (the Ansible module that installs it) to the package name
+# for that backend. On Linux the backend matching the detected package manager wins,
+# with snap as the fallback for programs that are not in the distribution repositories.
+
+CATALOG = {
+    "linux": {
+        "git": {"apt": "git", "dnf": "git", "yum": "git", "pacman": "git"},
+        "vlc": {"apt": "vlc", "dnf": "vlc", "yum": "vlc", "pacman": "vlc"},
+        "docker.io": {"apt": "docker.io", "dnf": "moby-engine", "yum": "docker", "pacman": "docker"},
+        "code": {"pacman": "code", "snap": "code"},
+        "postman": {"snap": "postman"},
+        "dbeaver-ce": {"snap": "dbeaver-ce"},
+        "libreoffice": {"apt": "libreoffice", "dnf": "libreoffice", "yum": "libreoffice", "pacman": "libreoffice-fresh"},
+        "evince": {"apt": "evince", "dnf": "evince", "yum": "evince", "pacman": "evince"},
+        "slack": {"snap": "slack"},
+        "gimp": {"apt": "gimp", "dnf": "gimp", "yum": "gimp", "pacman": "gimp"},
+        "spotify-client": {"snap": "spotify"},
+    },
+    "darwin": {
+        "git": {"homebrew": "git"},
+        "vlc": {"homebrew_cask": "vlc"},
+        "docker": {"homebrew_cask": "docker"},
+        "visual-studio-code": {"homebrew_cask": "visual-studio-code"},
+        "google-chrome": {"homebrew_cask": "google-chrome"},
+        "postman": {"homebrew_cask": "postman"},
+        "dbeaver-community": {"homebrew_cask": "dbeaver-community"},
+        "libreoffice": {"homebrew_cask": "libreoffice"},
+        "adobe-acrobat-reader": {"homebrew_cask": "adobe-acrobat-reader"},
+        "slack": {"homebrew_cask": "slack"},
+        "gimp": {"homebrew_cask": "gimp"},
+        "spotify": {"homebrew_cask": "spotify"},
+    },
+}
+
+# Snaps that need classic confinement to install.
+CLASSIC_SNAPS = {"code", "slack"}
+
+# Backends whose tasks must run with elevated privileges.
+PRIVILEGED_BACKENDS = {"apt", "dnf", "yum", "pacman", "snap"}
+
+PLAY_NAMES = {
+    "linux": "Setup Linux Development Environment",
+    "darwin": "Setup macOS Development Environment",
+}
+
+
+def lookup(os_name, program, package_manager):
+    """
+    Returns (backend, package) for a catalog program, or None if it is unknown.
+    """
+    entry = CATALOG.get(os_name, {}).get(program.strip().lower())
+    if not entry:
+        return None
+
+    if os_name == "darwin":
+        backend = "homebrew" if "homebrew" in entry else "homebrew_cask"
+        return backend, entry[backend]
+
+    if package_manager in entry:
+        return package_manager, entry[package_manager]
+    if "snap" in entry:
+        return "snap", entry["snap"]
+    return None
+
+
+def render_task(program, backend, package):
+    lines = [
+        f"    - name: Install {program}",
+        f"      {backend}:",
+        f"        name: {package}",
+        "        state: present",
+    ]
+    if backend == "snap" and package in CLASSIC_SNAPS:
+        lines.append("        classic: true")
+    if backend in PRIVILEGED_BACKENDS:
+        lines.append("      become: true")
+    lines.append("      ignore_errors: true")
+    return "\n".join(lines) + "\n"
+
+
+def compile_tasks(os_name, programs, package_manager=None):
+    """
+    Renders one task per catalog program. Returns (tasks, unknown_programs).
+    Tasks of the same backend are kept next to each other, in order of first
+    appearance, so that the optimizer can merge them into one install.
+    """
+    groups = {}
+    unknown = []
+    for program in programs:
+        resolved = lookup(os_name, program, package_manager)
+        if resolved is None:
+            unknown.append(program)
+        else:
+            backend, package = resolved
+            # Classic snaps take different arguments, so they form a group of their own.
+            group = (backend, backend == "snap" and package in CLASSIC_SNAPS)
+            groups.setdefault(group, []).append(render_task(program, backend, package))
+    return [task for tasks in groups.values() for task in tasks], unknown
+
+
+def render_playbook(os_name, tasks):
+    """
+    Wraps rendered task blocks (indented for the tasks list) in a local play.
+    """
+    header = (
+        "---\n"
+        f"- name: {PLAY_NAMES.get(os_name, 'Setup Development Environment')}\n"
+        "  hosts: localhost\n"
+        "  connection: local\n"
+        "  gather_facts: false\n"
+        "\n"
+        "  tasks:\n"
+    )
+    return header + "\n".join(tasks)
+
+
+def compile_playbook(os_name, programs, package_manager=None):
+    """
+    Emits a playbook for the catalog programs in `programs` without calling the API.
+    Returns (playbook_content, unknown_programs); playbook_content is None when
+    none of the programs are in the catalog.
+    """
+    tasks, unknown = compile_tasks(os_name, programs, package_manager)
+    if not tasks:
+        return None, unknown
+    return render_playbook(os_name, tasks), unknown
@@ -0,0 +1,76 @@
+import queue
+
+DEFAULT_MAX_LINES = 5000
+DRAIN_INTERVAL_MS = 100
+
+
+class ConsoleBatch:
+    """
+    Text to append to the console widget, and how many lines to drop from its top first.
+    """
+
+    def __init__(self, text, trim_lines):
+        self.text = text
+        self.trim_lines = trim_lines
+
+
+class ConsoleBuffer:
+    """
+    A file-like sink for sys.stdout/sys.stderr that any thread may write to.
+    The GUI thread calls drain() on a timer and applies the coalesced batch to the
+    widget, which never holds more than max_lines lines. With spill_path set, the
+    full output is also appended to that file.
+    """
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, spill_path=None):
+        self.max_lines = max_lines
+        self.lines = 0
+        self._queue = queue.Queue()
+        self._spill = open(spill_path, "a") if spill_path else None
+
+    def write(self, text):
+        if text:
+            self._queue.put(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def _pending(self):
+        chunks = []
+        while True:
+            try:
+                chunks.append(self._queue.get_nowait())
+            except queue.Empty:
+                return "".join(chunks)
+
+    def drain(self):
+        """
+        Collects everything written since the last call. Returns a ConsoleBatch,
+        or None if nothing was written.
+        """
+        text = self._pending()
+        if not text:
+            return None
+        if self._spill:
+            self._spill.write(text)
+            self._spill.flush()
+
+        new_lines = text.count("\n")
+        if new_lines >= self.max_lines:
+            # Only the tail of this batch fits; replace everything on screen.
+            text = "\n".join(text.split("\n")[-(self.max_lines + 1):])
+            trim_lines = self.lines + 1
+            self.lines = self.max_lines
+            return ConsoleBatch(text, trim_lines)
+
+        self.lines += new_lines
+        trim_lines = max(0, self.lines - self.max_lines)
+        self.lines -= trim_lines
+        return ConsoleBatch(text, trim_lines)
+
+    def close(self):
+        if self._spill:
+            self.drain()
+            self._spill.close()
+            self._spill = None
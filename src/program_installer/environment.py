@@ -0,0 +1,105 @@
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+
+from .cache import cache_dir, write_atomic
+
+FACTS_FILE = "environment.json"
+
+
+def module_available(name):
+    """
+    Checks whether a module can be imported without importing it.
+    """
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def fingerprint():
+    """
+    Identifies the environment the probes ran in. Facts are discarded whenever the
+    PATH or the Python interpreter changes.
+    """
+    parts = [os.environ.get("PATH", ""), sys.executable, sys.version, sys.platform]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class EnvironmentFacts:
+    """
+    Probe results (pip, ansible-playbook, package manager) persisted in a stamp file
+    so that later runs do not have to spawn the probes again.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or cache_dir(FACTS_FILE)
+        self.fingerprint = fingerprint()
+        self.facts = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                stamp = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(stamp, dict) and stamp.get("fingerprint") == self.fingerprint:
+            self.facts = stamp.get("facts") or {}
+
+    def _save(self):
+        stamp = {"fingerprint": self.fingerprint, "facts": self.facts}
+        try:
+            write_atomic(self.path, json.dumps(stamp, indent=2, sort_keys=True))
+        except OSError as e:
+            print(f"Warning: Could not save environment facts: {e}")
+
+    def get(self, name, probe, cache_if=bool):
+        """
+        Returns the cached fact, or runs probe() and caches its result when cache_if(result)
+        is true. Negative results are not cached by default so that a later install is noticed.
+        """
+        with self._lock:
+            if name in self.facts:
+                return self.facts[name]
+        value = probe()
+        if cache_if(value):
+            self.set(name, value)
+        return value
+
+    def set(self, name, value):
+        with self._lock:
+            self.facts[name] = value
+            self._save()
+
+    def forget(self, name):
+        with self._lock:
+            if self.facts.pop(name, None) is not None:
+                self._save()
+
+
+_facts = None
+_facts_lock = threading.Lock()
+
+
+def environment_facts():
+    """
+    Returns the facts for this process, loading the stamp file on first use.
+    """
+    global _facts
+    with _facts_lock:
+        if _facts is None or _facts.fingerprint != fingerprint() or _facts.path != cache_dir(FACTS_FILE):
+            _facts = EnvironmentFacts()
+        return _facts
+
+
+def reset_environment_facts():
+    global _facts
+    with _facts_lock:
+        _facts = None
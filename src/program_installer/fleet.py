@@ -0,0 +1,252 @@
+import re
+
+from .validator import load_yaml
+
+DEFAULT_FORKS = 5
+
+# Group variables that tell fleet mode which playbook a group needs.
+OS_VAR = "installer_os"
+PACKAGE_MANAGER_VAR = "installer_package_manager"
+
+# Used when a group does not set the variables above, e.g. [ubuntu] or [macs].
+OS_HINTS = {
+    "darwin": "darwin", "mac": "darwin", "macos": "darwin", "osx": "darwin",
+    "linux": "linux", "debian": "linux", "ubuntu": "linux", "fedora": "linux",
+    "centos": "linux", "rhel": "linux", "arch": "linux",
+}
+PACKAGE_MANAGER_HINTS = {
+    "debian": "apt", "ubuntu": "apt", "fedora": "dnf", "centos": "yum", "rhel": "yum", "arch": "pacman",
+}
+
+HOSTS_RE = re.compile(r"^(\s*-?\s*)hosts:\s*['\"]?localhost['\"]?\s*$")
+CONNECTION_RE = re.compile(r"^\s*connection:\s*['\"]?local['\"]?\s*$")
+ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
+RECAP_RE = re.compile(r"^(\S+)\s*:\s*((?:\w+=\d+\s*)+)$")
+
+
+def _new_group(groups, name):
+    return groups.setdefault(name, {"hosts": [], "vars": {}, "children": []})
+
+
+def _parse_vars(tokens):
+    result = {}
+    for token in tokens:
+        if "=" in token:
+            key, value = token.split("=", 1)
+            result[key] = value.strip("'\"")
+    return result
+
+
+def parse_ini_inventory(text):
+    """
+    Parses an INI inventory into {group: {"hosts": [...], "vars": {...}, "children": [...]}}.
+    """
+    groups = {}
+    group, kind = _new_group(groups, "ungrouped"), "hosts"
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line or line.startswith(("#", ";")):
+            continue
+        if line.startswith("[") and line.endswith("]"):
+            name, _, kind = line[1:-1].partition(":")
+            group, kind = _new_group(groups, name), kind or "hosts"
+            continue
+        if kind == "hosts":
+            tokens = line.split()
+            group["hosts"].append(tokens[0])
+        elif kind == "vars":
+            group["vars"].update(_parse_vars([line.replace(" = ", "=")]))
+        elif kind == "children":
+            group["children"].append(line)
+    return groups
+
+
+def _walk_yaml_group(name, data, groups):
+    group = _new_group(groups, name)
+    data = data or {}
+    group["hosts"].extend((data.get("hosts") or {}).keys())
+    group["vars"].update(data.get("vars") or {})
+    for child, child_data in (data.get("children") or {}).items():
+        group["children"].append(child)
+        _walk_yaml_group(child, child_data, groups)
+
+
+def parse_yaml_inventory(text):
+    data = load_yaml().safe_load(text) or {}
+    groups = {}
+    for name, group_data in data.items():
+        _walk_yaml_group(name, group_data, groups)
+    return groups
+
+
+def load_inventory(path):
+    with open(path, "r") as f:
+        text = f.read()
+    if path.endswith((".yml", ".yaml")):
+        return parse_yaml_inventory(text)
+    return parse_ini_inventory(text)
+
+
+def group_hosts(groups, name, seen=None):
+    """
+    Returns the hosts of a group, including the hosts of its child groups.
+    """
+    seen = set() if seen is None else seen
+    if name in seen or name not in groups:
+        return []
+    seen.add(name)
+    hosts = list(groups[name]["hosts"])
+    for child in groups[name]["children"]:
+        hosts.extend(h for h in group_hosts(groups, child, seen) if h not in hosts)
+    return hosts
+
+
+def group_platform(name, group):
+    """
+    Returns (os_name, package_manager) for a group, from its variables or its name.
+    Returns (None, None) for groups that do not name an OS.
+    """
+    words = re.split(r"[^a-z0-9]+", name.lower())
+    # Also match plural group names such as "macs".
+    words += [w[:-1] for w in words if w.endswith("s")]
+    os_name = group["vars"].get(OS_VAR)
+    if os_name is None:
+        os_name = next((OS_HINTS[w] for w in words if w in OS_HINTS), None)
+    if os_name is None:
+        return None, None
+    pm = group["vars"].get(PACKAGE_MANAGER_VAR)
+    if pm is None and os_name == "linux":
+        pm = next((PACKAGE_MANAGER_HINTS[w] for w in words if w in PACKAGE_MANAGER_HINTS), None)
+    return os_name.lower(), pm
+
+
+def os_groups(groups):
+    """
+    Returns {group: (os_name, package_manager)} for the inventory groups that name an OS.
+    """
+    result = {}
+    for name, group in groups.items():
+        if name in ("all", "ungrouped"):
+            continue
+        os_name, pm = group_platform(name, group)
+        if os_name is not None:
+            result[name] = (os_name, pm)
+    return result
+
+
+def os_descendants(groups, name, platforms, seen=None):
+    """
+    Returns the descendants of a group that are OS groups themselves, nearest first.
+    """
+    seen = set() if seen is None else seen
+    if name in seen or name not in groups:
+        return []
+    seen.add(name)
+    found = []
+    for child in groups[name]["children"]:
+        if child in platforms and child not in seen:
+            found.append(child)
+        found.extend(g for g in os_descendants(groups, child, platforms, seen) if g not in found)
+    return found
+
+
+def fleet_limit(groups, name, platforms):
+    """
+    Returns (limit, hosts) for provisioning an OS group. Hosts that belong to a more
+    specific OS group, e.g. ubuntu in [linux:children], are left to that group, so a
+    parent group only gets the hosts no child OS group covers.
+    """
+    specific = os_descendants(groups, name, platforms)
+    covered = {host for child in specific for host in group_hosts(groups, child)}
+    hosts = [host for host in group_hosts(groups, name) if host not in covered]
+    return ":".join([name] + [f"!{child}" for child in specific]), hosts
+
+
+def fleet_playbook(content, group):
+    """
+    Retargets a generated local playbook at an inventory group. The connection is
+    left to the inventory, so `ansible_connection=local` aliases keep working.
+    """
+    lines = []
+    for line in content.splitlines():
+        match = HOSTS_RE.match(line)
+        if match:
+            lines.append(f"{match.group(1)}hosts: {group}")
+        elif not CONNECTION_RE.match(line):
+            lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def fleet_command(playbook_file, inventory_file, group, forks=DEFAULT_FORKS):
+    return ["ansible-playbook", playbook_file, "-i", inventory_file, "--limit", group, "-f", str(forks)]
+
+
+def parse_recap(output):
+    """
+    Parses the PLAY RECAP of an ansible-playbook run into {host: {"ok": 3, "failed": 0, ...}}.
+    """
+    results = {}
+    in_recap = False
+    for line in ANSI_RE.sub("", output).splitlines():
+        if line.startswith("PLAY RECAP"):
+            in_recap = True
+            continue
+        if not in_recap:
+            continue
+        match = RECAP_RE.match(line.strip())
+        if match:
+            results[match.group(1)] = {
+                key: int(value) for key, value in (pair.split("=") for pair in match.group(2).split())
+            }
+    return results
+
+
+class RecapCollector:
+    """
+    Output sink that keeps only the PLAY RECAP section of an ansible-playbook run.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.active = False
+
+    def __call__(self, line):
+        if ANSI_RE.sub("", line).startswith("PLAY RECAP"):
+            self.active = True
+            self.lines = []
+        if self.active:
+            self.lines.append(line)
+
+    def text(self):
+        return "".join(self.lines)
+
+
+def host_failed(stats):
+    return stats is None or stats.get("failed", 0) > 0 or stats.get("unreachable", 0) > 0
+
+
+def print_fleet_summary(results):
+    """
+    Prints one line per host and returns the hosts that failed or were unreachable.
+    `results` maps group -> {host: stats}, where stats is None if the host has no recap.
+    """
+    failed = []
+    print("Fleet summary:")
+    for group, hosts in results.items():
+        for host, stats in sorted(hosts.items()):
+            if stats is None:
+                status = "no result"
+            elif stats.get("unreachable", 0):
+                status = "unreachable"
+            elif stats.get("failed", 0):
+                status = f"failed ({stats['failed']} tasks)"
+            else:
+                status = f"ok (changed={stats.get('changed', 0)})"
+            print(f"  [{group}] {host}: {status}")
+            if host_failed(stats):
+                failed.append(host)
+    total = sum(len(hosts) for hosts in results.values())
+    print(f"{total - len(failed)} of {total} hosts succeeded.")
+    if failed:
+        print(f"Failed hosts: {', '.join(failed)}")
+    return failed
@@ -0,0 +1,62 @@
+from .cache import DiskCache, cache_dir, cache_key
+from .validator import check_tasks, load_yaml, strip_fences
+
+FRAGMENT_CACHE_ENTRIES = 1024
+
+
+def fragment_cache():
+    return DiskCache(cache_dir("fragments"), max_entries=FRAGMENT_CACHE_ENTRIES)
+
+
+def fragment_key(os_name, package_manager, program, prompt_version, model):
+    return cache_key("fragment", os_name, package_manager, program.strip().lower(), prompt_version, model)
+
+
+def build_fragments_prompt(os_name, package_manager, programs):
+    manager = f" using {package_manager}" if package_manager else ""
+    return (
+        f"For each of the following programs, write the Ansible tasks that install it on {os_name}{manager}: "
+        f"{', '.join(programs)}. "
+        f"Answer with a YAML mapping from each program name exactly as given to the list of its tasks. "
+        f"For each program installation task, add 'ignore_errors: true' to prevent failures if the program is already installed. "
+        f"Do not include anything but the YAML and no text before or after answering this prompt and get rid of ''' before and after"
+    )
+
+
+def parse_fragments(response, programs):
+    """
+    Splits the model's answer into validated per-program task lists.
+    Returns {program: fragment} for the programs whose tasks are valid; a fragment
+    is the YAML text of the task list.
+    """
+    if not isinstance(response, str):
+        return {}
+    yaml = load_yaml()
+    try:
+        answer = yaml.safe_load(strip_fences(response))
+    except yaml.YAMLError:
+        return {}
+    if not isinstance(answer, dict):
+        return {}
+
+    by_name = {str(name).strip().lower(): tasks for name, tasks in answer.items()}
+    fragments = {}
+    for program in programs:
+        tasks = by_name.get(program.strip().lower())
+        if isinstance(tasks, dict):
+            tasks = [tasks]
+        if not isinstance(tasks, list) or not tasks:
+            continue
+        errors = []
+        check_tasks(tasks, program, errors)
+        if not errors:
+            fragments[program] = yaml.safe_dump(tasks, default_flow_style=False, sort_keys=False)
+    return fragments
+
+
+def indent_fragment(fragment, indent=4):
+    """
+    Indents a fragment so that it can be placed in a play's tasks list.
+    """
+    prefix = " " * indent
+    return "\n".join(prefix + line if line else line for line in fragment.splitlines()) + "\n"
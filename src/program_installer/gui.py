@@ -7,23 +7,27 @@ from .main import (
     install_programs_and_configure,
     BASIC_PROGRAMS,
     DEVELOPER_PROGRAMS,
-    check_pip,
-    install_pip,
-    install_package,
+    bootstrap_dependencies,
+    load_env_file,
+    create_client,
     ensure_ansible_installed,
 )
-from dotenv import load_dotenv
-from openai import OpenAI
+from .console import DEFAULT_MAX_LINES, DRAIN_INTERVAL_MS, ConsoleBuffer
+from .prompts import usage_log
+import argparse
 import os
 
 class ProgramInstallerGUI(tk.Tk):
-    def __init__(self):
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, log_file=None):
         super().__init__()
         self.title("Program Installer")
         self.geometry("800x600")
 
         self.os_name = platform.system().lower()
         self.client = None
+        self.console = ConsoleBuffer(max_lines=max_lines, spill_path=log_file)
+        self.saved_streams = None
+        self.protocol("WM_DELETE_WINDOW", self.close)
 
         self.create_widgets()
         self.init_app()
@@ -58,15 +62,30 @@ class ProgramInstallerGUI(tk.Tk):
             self.custom_entry.config(state="disabled")
 
     def redirect_output(self):
-        sys.stdout = self
-        sys.stderr = self
-
-    def write(self, text):
-        self.output_console.insert(tk.END, text)
-        self.output_console.see(tk.END)
-
-    def flush(self):
-        pass
+        # Worker threads only enqueue output; the widget is updated from the Tk main loop.
+        self.saved_streams = (sys.stdout, sys.stderr)
+        sys.stdout = self.console
+        sys.stderr = self.console
+        self.drain_console()
+
+    def restore_output(self):
+        if self.saved_streams:
+            sys.stdout, sys.stderr = self.saved_streams
+            self.saved_streams = None
+
+    def drain_console(self):
+        batch = self.console.drain()
+        if batch:
+            if batch.trim_lines:
+                self.output_console.delete("1.0", f"{batch.trim_lines + 1}.0")
+            self.output_console.insert(tk.END, batch.text)
+            self.output_console.see(tk.END)
+        self.after(DRAIN_INTERVAL_MS, self.drain_console)
+
+    def close(self):
+        self.restore_output()
+        self.console.close()
+        self.destroy()
 
     def init_app(self):
         self.redirect_output()
@@ -78,24 +97,15 @@ class ProgramInstallerGUI(tk.Tk):
             self.install_button.config(state="disabled")
             return
 
-        if not check_pip():
-            print("pip is not installed. Attempting to install...")
-            install_pip()
-
-        install_package("python-dotenv")
-        install_package("openai")
-
-        load_dotenv()
+        bootstrap_dependencies()
+        load_env_file()
         api_key = os.environ.get("OPENAI_API_KEY")
         if not api_key:
             print("OPENAI_API_KEY environment variable not set.")
             self.install_button.config(state="disabled")
             return
 
-        self.client = OpenAI(
-            base_url="https://api.aimlapi.com/v1",
-            api_key=api_key,
-        )
+        self.client = create_client(api_key)
 
         if self.os_name in ("linux", "darwin"):
             ensure_ansible_installed()
@@ -122,7 +132,8 @@ class ProgramInstallerGUI(tk.Tk):
 
         install_thread = threading.Thread(
             target=install_programs_and_configure,
-            args=(programs, self.os_name, self.client, choice)
+            args=(programs, self.os_name, self.client, choice),
+            kwargs={"stream": True}
         )
         install_thread.start()
         self.monitor_thread(install_thread)
@@ -132,10 +143,24 @@ class ProgramInstallerGUI(tk.Tk):
             self.after(100, lambda: self.monitor_thread(thread))
         else:
             print("\nInstallation process finished.")
+            usage_log.print_summary()
+            usage_log.clear()
             self.install_button.config(state="normal")
 
 def main():
-    app = ProgramInstallerGUI()
+    parser = argparse.ArgumentParser(prog="program-installer-gui")
+    parser.add_argument(
+        '--max-lines',
+        type=int,
+        default=DEFAULT_MAX_LINES,
+        help=f'Lines kept in the output console; older lines are dropped (default: {DEFAULT_MAX_LINES}).'
+    )
+    parser.add_argument(
+        '--log-file',
+        help='Also append the full output to this file.'
+    )
+    args = parser.parse_args()
+    app = ProgramInstallerGUI(max_lines=args.max_lines, log_file=args.log_file)
     app.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+import glob
+import os
+import subprocess
+import time
+
+from .runner import run_streaming
+
+# Refresh the package index when it is older than this many seconds.
+DEFAULT_INDEX_TTL = 6 * 60 * 60
+
+# Files that change when the index is refreshed. Some managers copy the mirror's
+# Last-Modified time onto the files they download, which can only make the index
+# look older than it is, so the newest of these is used.
+INDEX_PATHS = {
+    "apt": ["/var/lib/apt/periodic/update-success-stamp", "/var/cache/apt/pkgcache.bin", "/var/lib/apt/lists"],
+    "dnf": ["/var/cache/dnf/last_makecache", "/var/cache/dnf/*.solv"],
+    "yum": ["/var/cache/yum/*/*/*/repomd.xml", "/var/cache/dnf/last_makecache", "/var/cache/dnf/*.solv"],
+    "pacman": ["/var/lib/pacman/sync", "/var/lib/pacman/sync/*.db"],
+}
+
+# Sync-only refreshes: none of them upgrades installed packages.
+REFRESH_COMMANDS = {
+    "apt": ["sudo", "apt", "update"],
+    "dnf": ["sudo", "dnf", "makecache", "--refresh"],
+    "yum": ["sudo", "yum", "makecache"],
+    "pacman": ["sudo", "pacman", "-Sy"],
+}
+
+# Extra install options once refresh_index() has run. dnf and yum would otherwise
+# apply their own metadata expiry and refresh again during the install.
+INSTALL_OPTIONS = {
+    "dnf": ["--setopt=metadata_expire=never"],
+    "yum": ["--setopt=metadata_expire=never"],
+}
+
+
+def index_age(manager, now=None):
+    """
+    Returns the age in seconds of the manager's package index, or None if it
+    cannot be found.
+    """
+    mtimes = []
+    for pattern in INDEX_PATHS.get(manager, []):
+        for path in glob.glob(pattern):
+            try:
+                mtimes.append(os.path.getmtime(path))
+            except OSError:
+                continue
+    if not mtimes:
+        return None
+    now = time.time() if now is None else now
+    return max(0, now - max(mtimes))
+
+
+def index_is_fresh(manager, ttl=DEFAULT_INDEX_TTL):
+    age = index_age(manager)
+    return age is not None and age < ttl
+
+
+def refresh_index(manager, ttl=DEFAULT_INDEX_TTL, force=False):
+    """
+    Refreshes the package index unless it is younger than ttl seconds.
+    Returns True if a refresh was run. A failed refresh is reported, not raised,
+    so that the install can still try with the index it has.
+    """
+    if manager not in REFRESH_COMMANDS:
+        return False
+
+    if not force:
+        age = index_age(manager)
+        if age is not None and age < ttl:
+            print(f"{manager} package index is {age / 60:.0f} minutes old, skipping refresh "
+                  "(use --refresh-index to force one).")
+            return False
+
+    try:
+        run_streaming(REFRESH_COMMANDS[manager])
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Warning: Could not refresh the {manager} package index: {e}")
+        return False
+    return True
+
+
+def install_command(manager, programs):
+    """
+    Returns the command that installs programs with a Linux package manager.
+    """
+    if manager == "apt":
+        command = ["sudo", "apt", "install", "-y"]
+    elif manager in ("dnf", "yum"):
+        command = ["sudo", manager, "install", "-y"]
+    elif manager == "pacman":
+        # The sync database was refreshed separately; --needed skips installed packages.
+        command = ["sudo", "pacman", "-S", "--needed", "--noconfirm"]
+    else:
+        raise ValueError(f"Unsupported package manager: {manager}")
+    return command + INSTALL_OPTIONS.get(manager, []) + list(programs)
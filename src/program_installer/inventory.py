@@ -0,0 +1,66 @@
+import subprocess
+
+from .profiling import subprocess_span
+
+# One batched query per package manager. Each command lists the requested packages
+# that are installed; packages that are not installed are reported on stderr or with
+# a line that does not start with the package name.
+INVENTORY_COMMANDS = {
+    "apt": ["dpkg-query", "-W", "-f=${Package} ${db:Status-Abbrev}\\n"],
+    "dnf": ["rpm", "-q", "--qf", "%{NAME} ii\\n"],
+    "yum": ["rpm", "-q", "--qf", "%{NAME} ii\\n"],
+    "pacman": ["pacman", "-Q"],
+    "brew": ["brew", "list", "--versions"],
+    # Snaps are invisible to dpkg-query and rpm.
+    "snap": ["snap", "list"],
+}
+
+# Inventory command of each install backend (see planner.assign_backends()), where
+# it is not named after the backend.
+BACKEND_INVENTORIES = {"homebrew": "brew", "homebrew_cask": "brew", "classic snap": "snap"}
+
+
+def query_installed(manager, packages):
+    """
+    Returns the subset of packages that the package manager reports as installed.
+    Raises OSError if the query tool is not available.
+    """
+    command = INVENTORY_COMMANDS[manager] + list(packages)
+    try:
+        with subprocess_span(command):
+            output = subprocess.check_output(command, stderr=subprocess.DEVNULL)
+    except subprocess.CalledProcessError as e:
+        # Every tool exits non-zero when at least one package is missing,
+        # but still lists the installed ones.
+        output = e.output or b""
+
+    requested = set(packages)
+    installed = set()
+    for line in output.decode("utf-8", errors="replace").splitlines():
+        fields = line.split()
+        if not fields or fields[0] not in requested:
+            continue
+        # dpkg-query also lists removed packages; only "ii" means installed.
+        if manager == "apt" and (len(fields) < 2 or fields[1] != "ii"):
+            continue
+        installed.add(fields[0])
+    return installed
+
+
+def missing_packages(manager, packages):
+    """
+    Returns the packages that still need to be installed, in their original order.
+    If the inventory cannot be queried every package is assumed to be missing.
+    """
+    if manager not in INVENTORY_COMMANDS or not packages:
+        return list(packages)
+
+    try:
+        installed = query_installed(manager, packages)
+    except OSError as e:
+        print(f"Warning: Could not query installed packages with {manager}: {e}")
+        return list(packages)
+
+    if installed:
+        print(f"Already installed: {', '.join(p for p in packages if p in installed)}")
+    return [p for p in packages if p not in installed]
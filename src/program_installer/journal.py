@@ -0,0 +1,131 @@
+import json
+import os
+import re
+import threading
+import time
+
+from .cache import cache_dir, cache_key, content_hash, normalize_programs
+from .fleet import ANSI_RE
+from .validator import load_yaml
+
+TASK_RE = re.compile(r"^TASK \[(.*)\]")
+
+
+def journal_path(os_name, programs):
+    """
+    Returns the journal file of an install run. Runs for the same OS and program set
+    share it, so a run can resume where an identical one stopped.
+    """
+    return cache_dir("journals", cache_key("journal", os_name, normalize_programs(programs)) + ".jsonl")
+
+
+class Journal:
+    """
+    Append-only record of the work an install run has finished, one JSON object per
+    line. With resume=False the previous run's entries are ignored and the file is
+    replaced on the first write; with resume=True they are read back so that the run
+    can skip that work. A line cut short by a crash is ignored.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.entries = self.read() if resume else []
+        self._truncate = not resume
+        self._lock = threading.Lock()
+
+    def read(self):
+        entries = []
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return entries
+
+    def record(self, event, **data):
+        entry = dict(data, event=event, time=time.time())
+        line = json.dumps(entry, sort_keys=True) + "\n"
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, "w" if self._truncate else "a") as f:
+                    f.write(line)
+                self._truncate = False
+            except OSError as e:
+                print(f"Warning: Could not write the install journal: {e}")
+            self.entries.append(entry)
+
+    def events(self, event):
+        with self._lock:
+            return [entry for entry in self.entries if entry.get("event") == event]
+
+    def installed_programs(self):
+        return {program for entry in self.events("installed") for program in entry.get("programs", [])}
+
+    def validated_playbook(self, playbook_file, programs):
+        """
+        Returns the content of playbook_file if an earlier run validated exactly this
+        content for programs, otherwise None.
+        """
+        try:
+            with open(playbook_file, "r") as f:
+                content = f.read()
+        except OSError:
+            return None
+        for entry in reversed(self.events("playbook")):
+            if entry.get("file") == playbook_file and entry.get("programs") == list(programs):
+                return content if entry.get("hash") == content_hash(content) else None
+        return None
+
+    def finished_tasks(self, playbook_hash):
+        return {entry["task"] for entry in self.events("task") if entry.get("playbook") == playbook_hash}
+
+
+class TaskRecorder:
+    """
+    Output sink that journals every task of an ansible-playbook run that finished
+    without an unignored failure.
+    """
+
+    def __init__(self, journal, playbook_hash):
+        self.journal = journal
+        self.playbook_hash = playbook_hash
+        self.task = None
+        self.failed = False
+
+    def __call__(self, line):
+        line = ANSI_RE.sub("", line)
+        match = TASK_RE.match(line)
+        if match or line.startswith("PLAY RECAP"):
+            self.finish()
+            self.task = match.group(1) if match else None
+            self.failed = False
+        elif self.task is not None:
+            if line.startswith("fatal:"):
+                self.failed = True
+            elif line.startswith("...ignoring"):
+                self.failed = False
+
+    def finish(self):
+        if self.task is not None and not self.failed:
+            self.journal.record("task", playbook=self.playbook_hash, task=self.task)
+        self.task = None
+
+
+def task_names(content):
+    """
+    Returns the names of the tasks of a playbook in order, or [] if it cannot be parsed.
+    """
+    yaml = load_yaml()
+    try:
+        plays = yaml.safe_load(content)
+    except yaml.YAMLError:
+        return []
+    if not isinstance(plays, list):
+        return []
+    return [task["name"] for play in plays if isinstance(play, dict)
+            for task in play.get("tasks") or [] if isinstance(task, dict) and task.get("name")]
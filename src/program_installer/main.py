@@ -4,18 +4,49 @@ import sys
 import subprocess
 import platform
 import os
+import importlib
 import urllib.request
 import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from .batch import (DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, DEFAULT_WORKERS, RateLimitedClient,
+                    RateLimiter, dedup_requests, load_profiles)
+from .bisection import install_bisecting
+from .cache import content_hash, optimized_cache_key, playbook_cache, playbook_cache_key, write_atomic
+from .catalog import compile_tasks, render_playbook
+from .environment import environment_facts, module_available
+from .fleet import (DEFAULT_FORKS, RecapCollector, fleet_command, fleet_limit, fleet_playbook, load_inventory,
+                    os_groups, parse_recap, print_fleet_summary)
+from .fragments import build_fragments_prompt, fragment_cache, fragment_key, indent_fragment, parse_fragments
+from .index import DEFAULT_INDEX_TTL, REFRESH_COMMANDS, index_is_fresh, install_command, refresh_index
+from .inventory import BACKEND_INVENTORIES, missing_packages
+from .journal import Journal, TaskRecorder, journal_path, task_names
+from .names import resolve_programs
+from .optimizer import OPTIMIZER_VERSION, optimize_playbook
+from .planner import (BACKEND_LOCKS, Plan, assign_backends, native_backend, playbook_locks, program_dependencies,
+                      run_plan)
+from .profiling import DEFAULT_TRACE_FILE, profiler, span, subprocess_span, traced
+from .prompts import build_fix_prompt, build_generate_prompt, truncate_error, usage_log
+from .repair import build_task_repair_prompt, failing_spans, parse_fixed_tasks, splice_tasks, task_fragment
+from .retry import DEFAULT_RETRY_POLICY, circuit_breaker, classify_error
+from .runner import DEFAULT_SINKS, FileSink, add_default_sink, run_streaming
+from .streaming import stream_completion
+from .validator import validate_playbook
 
 try:
     from dotenv import load_dotenv
 except ModuleNotFoundError:
     load_dotenv = None
 
-try:
-    from openai import OpenAI
-except ModuleNotFoundError:
-    OpenAI = None
+# openai is slow to import, so it is only imported once an API call is made.
+OpenAI = None
+
+# pip package -> importable module
+REQUIRED_PACKAGES = {"python-dotenv": "dotenv", "openai": "openai", "PyYAML": "yaml"}
+
+API_BASE_URL = "https://api.aimlapi.com/v1"
 
 BASIC_PROGRAMS = {
     "linux": ["vlc", "docker.io", "git", "code"],
@@ -29,9 +60,40 @@ DEVELOPER_PROGRAMS = {
     "windows": ["git", "docker-desktop", "vscode", "postman", "dbeaver", "libreoffice", "adobereader", "slack", "vlc", "gimp", "spotify"]
 }
 
+# Models tried in order by generate_playbook().
+MODELS = ["gpt-4o-mini", "gpt-5-2025-08-07"]
+
+# Package manager used for name resolution when the OS has no choice of them.
+OS_PACKAGE_MANAGERS = {"darwin": "brew", "windows": "choco"}
+
+# Install commands of the backends that are not a Linux package manager, see assign_backends().
+BACKEND_COMMANDS = {
+    "homebrew": ["brew", "install"],
+    "homebrew_cask": ["brew", "install", "--cask"],
+    "choco": ["choco", "install", "-y"],
+    "snap": ["sudo", "snap", "install"],
+    "classic snap": ["sudo", "snap", "install", "--classic"],
+}
+
+# Backends that take a single package per command: snapd rejects --classic with several snap names.
+SINGLE_PACKAGE_BACKENDS = {"classic snap"}
+
+# Seconds to wait for the first model before also asking the next one.
+DEFAULT_HEDGE_AFTER = 15
+
+# Bump whenever the wording of the generate_playbook() prompts changes so that
+# playbooks cached under the old prompt are no longer reused.
+PROMPT_VERSION = 3
+SYNTAX_CHECK_TIMEOUT = 300  # seconds
+# Upper bound for one model request. A request that lost a hedge race cannot be
+# aborted, so this also bounds how long it keeps running in the background.
+REQUEST_TIMEOUT = 120  # seconds
+
 def check_pip():
     try:
-        subprocess.check_call([sys.executable, "-m", "pip", "--version"])
+        command = [sys.executable, "-m", "pip", "--version"]
+        with subprocess_span(command):
+            subprocess.check_call(command)
         return True
     except subprocess.CalledProcessError:
         return False
@@ -54,12 +116,80 @@ def install_package(package):
     if sys.prefix == sys.base_prefix:
         command.insert(4, "--user")
 
-    subprocess.check_call(command)
+    with subprocess_span(command):
+        subprocess.check_call(command)
     print(f"{package} installed successfully.")
 
 def command_exists(cmd):
     return shutil.which(cmd) is not None
 
+@traced("bootstrap dependencies")
+def bootstrap_dependencies():
+    """
+    Installs the Python packages this tool needs, skipping the ones that are already
+    importable so that a normal start does not spawn pip at all.
+    """
+    missing = [package for package, module in REQUIRED_PACKAGES.items() if not module_available(module)]
+    if not missing:
+        return
+
+    facts = environment_facts()
+    if not facts.get("pip", check_pip):
+        install_pip()
+        facts.set("pip", True)
+    for package in missing:
+        install_package(package)
+    importlib.invalidate_caches()
+
+def load_env_file():
+    global load_dotenv
+    if load_dotenv is None:
+        try:
+            from dotenv import load_dotenv
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError("python-dotenv is required. Please install it before running.")
+    load_dotenv()
+
+def openai_client_class():
+    global OpenAI
+    if OpenAI is None:
+        try:
+            from openai import OpenAI
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError("openai is required. Please install it before running.")
+    return OpenAI
+
+class LazyOpenAIClient:
+    """
+    Stands in for the OpenAI client and creates it, importing openai, on first use.
+    Runs that never call the API, such as the built-in profiles, never import openai.
+    """
+
+    def __init__(self, **kwargs):
+        self._kwargs = kwargs
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        with self._lock:
+            if self._client is None:
+                self._client = openai_client_class()(**self._kwargs)
+        return getattr(self._client, name)
+
+def create_client(api_key):
+    return LazyOpenAIClient(base_url=API_BASE_URL, api_key=api_key)
+
+def probe_package_manager():
+    for pm in ("apt", "dnf", "yum", "pacman"):
+        if command_exists(pm):
+            return pm
+    return None
+
+def detect_package_manager():
+    return environment_facts().get("package_manager", probe_package_manager)
+
 def install_homebrew():
     print("Installing Homebrew...")
     install_cmd = '/bin/bash -c "$(curl -fsSL https://raw.githubusercontent.com/Homebrew/install/HEAD/install.sh)"'
@@ -87,53 +217,167 @@ def install_chocolatey():
     os.environ["Path"] += os.pathsep + os.path.join(choco_path, "bin")
     print("Chocolatey installed.")
 
-def generate_playbook(client, os_name, programs, template=None, error=None, previous_content=None):
+def generate_playbook(client, os_name, programs, template=None, error=None, previous_content=None, hedge_after=None,
+                      stream=False, minify_template=True):
     if error:
-        prompt = (
-            f"Fix this Ansible playbook YAML for {os_name} environment based on the following error: {error}\n"
-            f"Previous playbook:\n{previous_content}\n"
-            f"The playbook should install a development environment and the user-required programs: {', '.join(programs)}. "
-            f"For each program installation task, make sure to add 'ignore_errors: true' to prevent failures if the program is already installed. "
-            f"Do not include anything but the complete program and no text before or after answering this prompt and get rid of ''' before and after"
-        )
+        prompt = build_fix_prompt(os_name, programs, error, previous_content)
     else:
-        prompt = (
-            f"Create an Ansible playbook YAML for {os_name} environment in order to install development environment "
-            f"and user required programs: {', '.join(programs)}. "
-            f"For each program installation task, add 'ignore_errors: true' to prevent failures if the program is already installed. "
-        )
-        if template:
-            prompt += f"\nUse the following template as a base:\n{template}\n"
-        prompt += "Do not include anything but the complete program and no text before or after answering this prompt and get rid of ''' before and after"
-
-    import time
-
-    models_to_try = ["gpt-4o-mini", "gpt-5-2025-08-07"]
-    max_retries_per_model = 3
-    initial_sleep_duration = 7  # seconds
-    increment = 5  # seconds
-
-    for model in models_to_try:
-        sleep_duration = initial_sleep_duration
-        print(f"Attempting to generate playbook with model: {model}")
-        for i in range(max_retries_per_model):
-            try:
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                content = response.choices[0].message.content
-                if content and content.strip():
-                    print(f"Successfully generated playbook with model: {model}")
-                    return content
+        prompt = build_generate_prompt(os_name, programs, template, minify=minify_template)
+
+    return complete_prompt(client, prompt, hedge_after=hedge_after, stream=stream)
+
+def complete_prompt(client, prompt, hedge_after=None, stream=False):
+    """
+    Sends a prompt to the configured models and returns the first non-empty response.
+    Streamed requests echo tokens as they arrive and try the models one at a time.
+    """
+    if hedge_after is not None and not stream:
+        return hedged_completion(client, prompt, MODELS, hedge_after)
+
+    for model in MODELS:
+        content = request_with_retries(client, model, prompt, stream=stream)
+        if content:
+            return content
+
+    print("Failed to generate playbook with all models after multiple retries.")
+    return None
+
+def repair_playbook_tasks(client, os_name, playbook_content, error, hedge_after=None):
+    """
+    Regenerates only the tasks that the error points at and splices them back into
+    the playbook. Returns None when the error cannot be attributed to specific tasks
+    or a task could not be fixed, so the caller can fall back to a full regeneration.
+    """
+    spans = failing_spans(playbook_content, error)
+    if not spans:
+        return None
+
+    # Splice from the bottom up so earlier line numbers stay valid.
+    for task_span in reversed(spans):
+        fragment = task_fragment(playbook_content, task_span)
+        print(f"Regenerating task at line {task_span['start'] + 1}:")
+        print(fragment)
+        prompt = build_task_repair_prompt(os_name, fragment, truncate_error(error))
+        response = complete_prompt(client, prompt, hedge_after=hedge_after)
+        tasks = parse_fixed_tasks(response)
+        if tasks is None:
+            print("Could not fix the task in isolation.")
+            return None
+        playbook_content = splice_tasks(playbook_content, task_span, tasks)
+    return playbook_content
+
+def request_with_retries(client, model, prompt, cancelled=None, policy=None, stream=False):
+    """
+    Requests a completion from one model, retrying according to the retry policy.
+    Errors that can never succeed are not retried, and models whose circuit breaker
+    is open are skipped. When a `cancelled` event is given, retry sleeps wake up
+    early and the result is discarded once the event is set. With stream=True the
+    response is echoed live and aborted as soon as a generated task is broken.
+    """
+    policy = policy or DEFAULT_RETRY_POLICY
+    breaker = circuit_breaker(model)
+    if not breaker.allow():
+        print(f"Skipping model {model}: too many recent failures.")
+        return None
+
+    print(f"Attempting to generate playbook with model: {model}")
+    for attempt in range(policy.max_attempts):
+        if cancelled is not None and cancelled.is_set():
+            return None
+        error = None
+        try:
+            started = time.monotonic()
+            with span(f"llm {model}", "llm", attempt=attempt + 1, prompt_chars=len(prompt)):
+                if stream:
+                    content = stream_completion(client, model, prompt, cancelled=cancelled,
+                                                timeout=REQUEST_TIMEOUT)
+                    usage = None
                 else:
-                    print(f"Warning: Model {model} returned empty content. Retrying after {sleep_duration} seconds...")
-                    time.sleep(sleep_duration)
-                    sleep_duration += increment
-            except Exception as e:
-                print(f"An error occurred with model {model}: {e}. Retrying after {sleep_duration} seconds...")
-                time.sleep(sleep_duration)
-                sleep_duration += increment
+                    response = client.chat.completions.create(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        timeout=REQUEST_TIMEOUT
+                    )
+                    content = response.choices[0].message.content
+                    usage = getattr(response, "usage", None)
+            usage_log.record(model, prompt, content, time.monotonic() - started, usage)
+            if cancelled is not None and cancelled.is_set():
+                return None
+            if content and content.strip():
+                print(f"Successfully generated playbook with model: {model}")
+                breaker.record_success()
+                return content
+            message = f"Warning: Model {model} returned empty content."
+        except Exception as e:
+            if cancelled is not None and cancelled.is_set():
+                return None
+            error = e
+            if not policy.should_retry(classify_error(e)):
+                print(f"A non-retryable error occurred with model {model}: {e}")
+                breaker.record_failure(trip=True)
+                return None
+            message = f"An error occurred with model {model}: {e}."
+
+        breaker.record_failure()
+        if attempt == policy.max_attempts - 1 or breaker.is_open:
+            print(message)
+            break
+
+        sleep_duration = policy.delay(attempt, error)
+        print(f"{message} Retrying after {sleep_duration:.1f} seconds...")
+        if cancelled is None:
+            time.sleep(sleep_duration)
+        else:
+            cancelled.wait(sleep_duration)
+    return None
+
+def start_daemon(function, *args):
+    """
+    Runs function(*args) on a daemon thread and returns a Future for its result.
+    Unlike ThreadPoolExecutor workers, the thread is not joined at interpreter exit.
+    """
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+def hedged_completion(client, prompt, models, hedge_after):
+    """
+    Starts the first model and launches the next one whenever no valid response has
+    arrived within hedge_after seconds, or as soon as all running models have failed.
+    Returns the first non-empty response and cancels the remaining requests.
+
+    An HTTP request that is already in flight cannot be aborted: the losers stop
+    retrying and their answers are discarded, but each keeps running on a daemon
+    thread until it finishes or hits REQUEST_TIMEOUT. They never delay the return
+    or the exit of the process.
+    """
+    cancelled = threading.Event()
+    pending = set()
+    try:
+        for index, model in enumerate(models):
+            pending.add(start_daemon(request_with_retries, client, model, prompt, cancelled))
+            is_last = index == len(models) - 1
+            deadline = None if is_last else time.monotonic() + hedge_after
+
+            while pending:
+                timeout = None if deadline is None else max(0, deadline - time.monotonic())
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    content = future.result()
+                    if content:
+                        return content
+                if not done:
+                    print(f"No response from {model} within {hedge_after} seconds, hedging with the next model...")
+                    break
+    finally:
+        cancelled.set()
 
     print("Failed to generate playbook with all models after multiple retries.")
     return None
@@ -147,9 +391,11 @@ def advise_path_update():
         print(export_line)
         print("Then restart your terminal or run `source ~/.zshrc` (or your shell config file). ***\n")
 
+@traced("ensure ansible")
 def ensure_ansible_installed():
     # Check if ansible-playbook is available, otherwise install and set PATH
-    if command_exists("ansible-playbook"):
+    facts = environment_facts()
+    if facts.get("ansible-playbook", lambda: command_exists("ansible-playbook")):
         print("Ansible is already installed.")
         return
 
@@ -161,13 +407,13 @@ def ensure_ansible_installed():
             if not command_exists("brew"):
                 install_homebrew()
             try:
-                subprocess.check_call(["brew", "install", "ansible"])
+                run_streaming(["brew", "install", "ansible"])
             except subprocess.CalledProcessError:
                 print("Homebrew install failed, trying pip install...")
-                subprocess.check_call([sys.executable, "-m", "pip", "install", "--user", "ansible"])
+                run_streaming([sys.executable, "-m", "pip", "install", "--user", "ansible"])
                 advise_path_update()
         elif os_name == "linux":
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "--user", "ansible"])
+            run_streaming([sys.executable, "-m", "pip", "install", "--user", "ansible"])
             advise_path_update()
         else:
             print("Automatic Ansible install not supported for this OS.")
@@ -179,6 +425,7 @@ def ensure_ansible_installed():
     if not command_exists("ansible-playbook"):
         print("Ansible installation failed or ansible-playbook still not in PATH. Please check your setup.")
         sys.exit(1)
+    facts.set("ansible-playbook", True)
     print("Ansible installed successfully.")
 
 def get_program_list(os_name):
@@ -204,137 +451,201 @@ def get_program_list(os_name):
 import argparse
 from importlib import metadata
 
-def install_programs_and_configure(programs, os_name, client, choice):
+@traced("syntax check loop")
+def check_and_fix_playbook(client, os_name, programs, playbook_file, playbook_content, max_attempts=3, hedge_after=None,
+                           stream=False):
     """
-    Installs programs and runs Ansible configuration.
-    This function is designed to be called from both the CLI and GUI.
+    Validates the playbook in-process, then runs `ansible-playbook --syntax-check` on
+    playbook_file, asking the model to fix the playbook on failure. Playbooks with
+    structural defects are sent back for fixing without starting Ansible. Only the
+    failing tasks are regenerated when the error points at them.
+    Returns the content that passed, or None if it never did.
     """
-    if not programs:
-        print("No programs specified.")
-        return
+    for attempt in range(max_attempts):
+        repaired_content, problems = validate_playbook(playbook_content)
+        if repaired_content != playbook_content:
+            print("Repaired obvious playbook defects.")
+            playbook_content = repaired_content
+            with open(playbook_file, 'w') as f:
+                f.write(playbook_content)
+
+        if problems:
+            error_msg = "\n".join(problems)
+            print(f"Attempt {attempt + 1}: Playbook validation failed:")
+            print(error_msg)
+        else:
+            try:
+                print(f"Attempt {attempt + 1}: Checking playbook syntax...")
+                run_streaming(['ansible-playbook', playbook_file, '--syntax-check', '-v'],
+                              timeout=SYNTAX_CHECK_TIMEOUT)
+                print("Syntax check passed.")
+                return playbook_content
+            except subprocess.CalledProcessError as e:
+                # The output was already shown while it streamed; e.output holds its last lines.
+                error_msg = e.output.decode('utf-8')
+                print("Syntax check failed.")
+            except subprocess.TimeoutExpired:
+                print(f"Syntax check did not finish within {SYNTAX_CHECK_TIMEOUT} seconds.")
+                return None
+
+        if attempt < max_attempts - 1:
+            print("Attempting to fix the playbook...")
+            fixed_content = repair_playbook_tasks(client, os_name, playbook_content, error_msg, hedge_after=hedge_after)
+            if fixed_content is None:
+                print("Regenerating the whole playbook...")
+                fixed_content = generate_playbook(client, os_name, programs, error=error_msg,
+                                                  previous_content=playbook_content, hedge_after=hedge_after,
+                                                  stream=stream)
+            playbook_content = fixed_content
+            if not playbook_content:
+                print("Error: Could not generate a fixed playbook.")
+                return None
+            with open(playbook_file, 'w') as f:
+                f.write(playbook_content)
+            print("Updated playbook:")
+            print(playbook_content)
+        else:
+            print("Failed to fix playbook after maximum attempts.")
+    return None
 
-    try:
-        if os_name == "linux":
-            pm = None
-            if command_exists("apt"):
-                pm = "apt"
-            elif command_exists("dnf"):
-                pm = "dnf"
-            elif command_exists("yum"):
-                pm = "yum"
-            elif command_exists("pacman"):
-                pm = "pacman"
-            else:
-                print("No supported package manager found (apt, dnf, yum, pacman).")
-                return
-
-            print(f"Using package manager: {pm}")
-
-            if pm == "apt":
-                subprocess.check_call(["sudo", "apt", "update"])
-                install_cmd = ["sudo", "apt", "install", "-y"] + programs
-            elif pm == "dnf":
-                install_cmd = ["sudo", "dnf", "install", "-y"] + programs
-            elif pm == "yum":
-                install_cmd = ["sudo", "yum", "install", "-y"] + programs
-            elif pm == "pacman":
-                install_cmd = ["sudo", "pacman", "-Syu", "--noconfirm"] + programs
-
-            subprocess.check_call(install_cmd)
-            print("Installation complete.")
+def backend_command(backend, packages):
+    if backend in BACKEND_COMMANDS:
+        return BACKEND_COMMANDS[backend] + list(packages)
+    return install_command(backend, packages)
 
-        elif os_name == "darwin":
-            if not command_exists("brew"):
-                install_homebrew()
-            install_cmd = ["brew", "install"] + programs
-            subprocess.check_call(install_cmd)
-            print("Installation complete.")
+def backend_batches(backend, packages):
+    """
+    Splits packages into the batches installed by one command each.
+    """
+    if backend in SINGLE_PACKAGE_BACKENDS:
+        return [[package] for package in packages]
+    return [list(packages)]
 
-        elif os_name == "windows":
-            if not command_exists("choco"):
-                install_chocolatey()
-            install_cmd = ["choco", "install", "-y"] + programs
-            subprocess.check_call(install_cmd)
+@traced("native install")
+def install_with_package_manager(os_name, pm, programs, backend=None):
+    """
+    Installs programs with the native package manager, or with backend (see
+    assign_backends()) if given, reporting errors instead of raising.
+    If the combined install fails, the packages that cannot be installed are isolated
+    and everything else is still installed. Returns {program: error} for those packages.
+    """
+    try:
+        backend = backend or native_backend(os_name, pm)
+        run = run_streaming
+        if backend == "homebrew_cask":
+            # Runs next to the formula install, which already updates Homebrew.
+            env = dict(os.environ, HOMEBREW_NO_AUTO_UPDATE="1")
+            run = lambda command: run_streaming(command, env=env)
+
+        installed, failed = [], {}
+        for batch in backend_batches(backend, programs):
+            batch_installed, batch_failed = install_bisecting(lambda b: backend_command(backend, b), batch, run=run)
+            installed += batch_installed
+            failed.update(batch_failed)
+        if not failed:
             print("Installation complete.")
+            return {}
+
+        print(f"Installed {len(installed)} of {len(programs)} programs. These could not be installed:")
+        for program, error in failed.items():
+            print(f"  {program}:")
+            for line in error.splitlines():
+                print(f"    {line}")
+        return failed
 
-    except subprocess.CalledProcessError as e:
-        print(f"Error during installation: {e}")
     except Exception as e:
         print(f"Unexpected error: {e}")
+        return {program: str(e) for program in programs}
 
-    if os_name not in ("linux", "darwin"):
-        print("Cannot generate and run Ansible playbook on Windows.")
-        return
+def generate_task_fragments(client, os_name, pm, programs, hedge_after=None, stream=False):
+    """
+    Asks the model for the tasks of several programs in one request.
+    Returns {program: fragment} for the programs that came back valid.
+    """
+    print(f"Generating tasks for: {', '.join(programs)}")
+    response = complete_prompt(client, build_fragments_prompt(os_name, pm, programs), hedge_after=hedge_after, stream=stream)
+    return parse_fragments(response, programs)
 
-    playbook_content_template = """---
-- name: Setup macOS Development Environment
-  hosts: localhost
-  connection: local
-  gather_facts: false
-
-  tasks:
-    - name: Ensure Homebrew is installed
-      homebrew:
-        state: present
-
-    - name: Install Python
-      homebrew:
-        name: python
-        state: present
-
-    - name: Install VLC
-      homebrew_cask:
-        name: vlc
-        state: present
-
-    - name: Install DuckDuckGo
-      homebrew_cask:
-        name: duckduckgo
-        state: present
-
-    - name: Install Zoom
-      homebrew_cask:
-        name: zoom
-        state: present
-
-    - name: Install UTM
-      homebrew_cask:
-        name: utm
-        state: present
-
-    - name: Install Docker
-      homebrew_cask:
-        name: docker
-        state: present
-
-    - name: Install LM Studio
-      homebrew_cask:
-        name: lm-studio
-        state: present
-"""
+def compose_from_fragments(programs, os_name, pm, client, use_cache=True, hedge_after=None, stream=False):
+    """
+    Collects a task fragment for every program, reusing cached fragments and generating
+    all misses in a single request. Returns (fragments, new_fragments), or (None, None)
+    if a program could not be generated.
+    """
+    cache = fragment_cache() if use_cache else None
+    fragments = {}
+    for program in programs:
+        fragment = cache.get(fragment_key(os_name, pm, program, PROMPT_VERSION, MODELS)) if cache else None
+        if fragment:
+            fragments[program] = fragment
+
+    misses = [p for p in programs if p not in fragments]
+    if fragments:
+        print(f"Using cached tasks for: {', '.join(fragments)}")
+
+    new_fragments = generate_task_fragments(client, os_name, pm, misses, hedge_after, stream) if misses else {}
+    failed = [p for p in misses if p not in new_fragments]
+    if failed:
+        print(f"Could not generate tasks for: {', '.join(failed)}")
+        return None, None
+
+    fragments.update(new_fragments)
+    return fragments, new_fragments
+
+@traced("prepare playbook")
+def prepare_playbook(programs, os_name, pm, client, choice, playbook_file, use_cache=True, hedge_after=None,
+                     stream=False):
+    """
+    Compiles or generates the playbook for programs, writes it to playbook_file and
+    makes sure it passes the syntax check. Returns the final content, or None on failure.
 
+    Catalog programs are compiled locally. Other programs are composed from per-program
+    task fragments, so only programs never seen before are sent to the model.
+    The checked playbook is then optimized (see optimize_playbook()); the caches keep
+    the unoptimized version.
+    """
     print("Generating Ansible playbook...")
 
-    # Determine which template to use
-    if choice == 'b':
-        template_path = 'template-full.yml'
+    # Programs in the offline catalog are compiled locally; only the rest need the API.
+    compiled_tasks, unknown_programs = compile_tasks(os_name, programs, pm)
+    compiled_content = render_playbook(os_name, compiled_tasks) if compiled_tasks else None
+    cache = None
+    cached_content = None
+    new_fragments = {}
+    composed_content = None
+    needs_check = False
+
+    if not unknown_programs:
+        print("All programs found in the offline catalog. Compiled playbook locally.")
+        playbook_content = compiled_content
     else:
-        template_path = 'ansible_playbook_template.yml'
-
-    try:
-        with open(template_path, 'r') as f:
-            playbook_content_template = f.read()
-    except FileNotFoundError:
-        print(f"Warning: Template file not found at {template_path}. Proceeding without a template.")
-        playbook_content_template = None
-
-    playbook_content = generate_playbook(client, os_name, programs, template=playbook_content_template)
+        print(f"Programs not in the offline catalog: {', '.join(unknown_programs)}")
+        cache = playbook_cache() if use_cache else None
+        cache_key = playbook_cache_key(os_name, programs, compiled_content, PROMPT_VERSION, MODELS)
+        cached_content = cache.get(cache_key) if cache else None
+
+        if cached_content:
+            print("Using cached playbook (already passed syntax check).")
+            playbook_content = cached_content
+        else:
+            fragments, new_fragments = compose_from_fragments(
+                unknown_programs, os_name, pm, client, use_cache, hedge_after, stream
+            )
+            if fragments is not None:
+                blocks = compiled_tasks + [indent_fragment(fragments[p]) for p in unknown_programs]
+                playbook_content = composed_content = render_playbook(os_name, blocks)
+            else:
+                playbook_content = generate_full_playbook(
+                    client, os_name, unknown_programs, choice, compiled_content, hedge_after, stream
+                )
+            # Only playbooks that passed the syntax check go into the cache, even when
+            # every fragment passed it before as part of another playbook.
+            needs_check = True
 
     if not playbook_content or not playbook_content.strip():
         print("Error: Generated playbook content is empty. Aborting.")
-        return
+        return None
 
-    playbook_file = 'ansible_playbook.yml'
     with open(playbook_file, 'w') as f:
         f.write(playbook_content)
     print("Generated playbook:")
@@ -342,43 +653,419 @@ def install_programs_and_configure(programs, os_name, client, choice):
     print(playbook_content)
     print("===================")
 
-    max_attempts = 3
-    for attempt in range(max_attempts):
+    if needs_check:
+        playbook_content = check_and_fix_playbook(client, os_name, programs, playbook_file, playbook_content,
+                                                  hedge_after=hedge_after, stream=stream)
+        if playbook_content is None:
+            return None
+        if use_cache and new_fragments and playbook_content == composed_content:
+            store = fragment_cache()
+            for program, fragment in new_fragments.items():
+                store.put(fragment_key(os_name, pm, program, PROMPT_VERSION, MODELS), fragment)
+    if cache and not cached_content:
+        cache.put(cache_key, playbook_content)
+
+    return optimize_checked_playbook(playbook_file, playbook_content, playbook_cache() if use_cache else None)
+
+def optimize_checked_playbook(playbook_file, playbook_content, cache=None):
+    """
+    Optimizes a playbook that passed its checks (see optimize_playbook()) and writes it
+    to playbook_file. The optimized playbook is validated and syntax-checked again;
+    if it fails either check, the unoptimized playbook is kept. Optimized playbooks
+    that passed are cached by the content they were made from, so a cache hit is not
+    checked again. Returns the content in playbook_file.
+    """
+    key = optimized_cache_key(playbook_content, OPTIMIZER_VERSION)
+    cached_content = cache.get(key) if cache else None
+    if cached_content:
+        with open(playbook_file, 'w') as f:
+            f.write(cached_content)
+        print("Using cached optimized playbook.")
+        return cached_content
+
+    optimized_content, merged = optimize_playbook(playbook_content)
+    if optimized_content == playbook_content:
+        return playbook_content
+
+    checked_content, problems = validate_playbook(optimized_content)
+    passed = not problems and checked_content == optimized_content
+    if passed:
+        with open(playbook_file, 'w') as f:
+            f.write(optimized_content)
         try:
-            print(f"Attempt {attempt + 1}: Checking playbook syntax...")
-            output = subprocess.check_output(
-                ['ansible-playbook', playbook_file, '--syntax-check', '-v'],
-                stderr=subprocess.STDOUT
-            ).decode('utf-8')
-            print("Syntax check output:")
-            print(output)
-            print("Syntax check passed.")
-            break
-        except subprocess.CalledProcessError as e:
-            error_msg = e.output.decode('utf-8')
-            print("Syntax check failed:")
-            print(error_msg)
-            if attempt < max_attempts - 1:
-                print("Attempting to fix the playbook...")
-                playbook_content = generate_playbook(client, os_name, programs, error=error_msg, previous_content=playbook_content)
-                with open(playbook_file, 'w') as f:
-                    f.write(playbook_content)
-                print("Updated playbook:")
-                print(playbook_content)
-            else:
-                print("Failed to fix playbook after maximum attempts.")
-                return
+            run_streaming(['ansible-playbook', playbook_file, '--syntax-check', '-v'], timeout=SYNTAX_CHECK_TIMEOUT)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError):
+            passed = False
+    if not passed:
+        print("The optimized playbook did not pass the checks; running the unoptimized playbook.")
+        with open(playbook_file, 'w') as f:
+            f.write(playbook_content)
+        return playbook_content
+    if cache:
+        cache.put(key, optimized_content)
+    print(f"Optimized playbook: merged {merged} install tasks into package lists.")
+    return optimized_content
+
+def generate_full_playbook(client, os_name, programs, choice, compiled_content, hedge_after=None, stream=False):
+    """
+    Generates the whole playbook in one prompt, using the compiled catalog tasks or the
+    bundled template file as the base. Only the template file is minified: the
+    compiled tasks are the only place the catalog programs appear in the prompt.
+    """
+    template = compiled_content
+    if template is None:
+        # Determine which template to use
+        if choice == 'b':
+            template_path = 'template-full.yml'
+        else:
+            template_path = 'ansible_playbook_template.yml'
+
+        try:
+            with open(template_path, 'r') as f:
+                template = f.read()
+        except FileNotFoundError:
+            print(f"Warning: Template file not found at {template_path}. Proceeding without a template.")
+
+    return generate_playbook(client, os_name, programs, template=template, hedge_after=hedge_after, stream=stream,
+                             minify_template=compiled_content is None)
 
-    # Run the playbook
+@traced("run playbook")
+def run_playbook(playbook_file, start_at_task=None, recorder=None):
+    """
+    Runs the playbook, from start_at_task if given, and returns whether it succeeded.
+    recorder is an extra output sink, such as a TaskRecorder.
+    """
+    command = ['ansible-playbook', playbook_file, '-v']
+    if start_at_task:
+        command += ['--start-at-task', start_at_task]
     try:
         print("Running the playbook...")
-        subprocess.check_call(['ansible-playbook', playbook_file, '-v'])
+        run_streaming(command, sinks=DEFAULT_SINKS + [recorder] if recorder else None)
         print("Playbook executed successfully.")
+        return True
     except subprocess.CalledProcessError as e:
         print(f"Error running playbook: {e}")
     except Exception as e:
         print(f"Unexpected error running playbook: {e}")
+    return False
+
+def skip_installed(groups, playbook_programs, manager):
+    """
+    Drops the programs that are already installed from the output of assign_backends().
+    Each backend is probed for the package it would install, e.g. moby-engine for
+    docker.io on dnf, and snaps with snap list. Playbook programs are probed by name
+    with the native manager. Returns (groups, playbook_programs).
+    """
+    packages = {}
+    for (backend, _), pairs in groups.items():
+        packages.setdefault(BACKEND_INVENTORIES.get(backend, backend), []).extend(p for _, p in pairs)
+    if playbook_programs:
+        packages.setdefault(manager, []).extend(p for p in playbook_programs if p not in packages.get(manager, []))
+    missing = {inventory: set(missing_packages(inventory, names)) for inventory, names in packages.items()}
+
+    remaining = {}
+    for (backend, stage), pairs in groups.items():
+        pairs = [pair for pair in pairs if pair[1] in missing[BACKEND_INVENTORIES.get(backend, backend)]]
+        if pairs:
+            remaining[(backend, stage)] = pairs
+    return remaining, [p for p in playbook_programs if p in missing[manager]]
+
+def build_install_plan(os_name, pm, groups, playbook_programs, client, choice, playbook_file, use_cache=True,
+                       hedge_after=DEFAULT_HEDGE_AFTER, stream=False, force_refresh=False, index_ttl=DEFAULT_INDEX_TTL,
+                       journal=None):
+    """
+    Builds the execution plan for programs already assigned to a backend: groups
+    comes from assign_backends() and playbook_programs are installed by the playbook.
+    Every group is installed by its own step after the steps installing what it
+    depends on. Steps of independent backends, such as apt and snap, run at the same
+    time, while steps sharing a lock take turns. The playbook is prepared while the
+    packages are installed.
+
+    If journal is given, the installed programs, the validated playbook and the
+    finished playbook tasks are recorded in it, and a playbook or tasks it already
+    records are reused or skipped.
+    """
+    plan = Plan()
+    dependencies = program_dependencies(os_name, [p for pairs in groups.values() for p, _ in pairs] + playbook_programs)
+    refresh_after = []
+    # The playbook may install with the package manager too, so it needs the index as well.
+    if os_name == "linux" and (force_refresh or not index_is_fresh(pm, index_ttl)):
+        def refresh():
+            refresh_index(pm, index_ttl, force=True)
+
+        plan.add("refresh index", " ".join(REFRESH_COMMANDS[pm]), refresh, locks=[BACKEND_LOCKS[pm]])
+        refresh_after = ["refresh index"]
+
+    step_of = {}
+    for (backend, stage), pairs in groups.items():
+        name = f"{backend} install" + (f", stage {stage + 1}" if stage else "")
+        packages = [package for _, package in pairs]
+        after = list(refresh_after) if backend == pm else []
+        for program, _ in pairs:
+            after += [step_of[d] for d in dependencies[program] if step_of[d] not in after]
+
+        def install(backend=backend, pairs=pairs, packages=packages):
+            failed = install_with_package_manager(os_name, pm, packages, backend)
+            if journal is not None:
+                journal.record("installed", backend=backend,
+                               programs=[program for program, package in pairs if package not in failed])
+
+        commands = [" ".join(backend_command(backend, batch)) for batch in backend_batches(backend, packages)]
+        plan.add(name, "; ".join(commands), install, after=after,
+                 locks=[BACKEND_LOCKS[backend]])
+        step_of.update((program, name) for program, _ in pairs)
+
+    if playbook_programs:
+        prepared = {}
+
+        def prepare():
+            content = journal.validated_playbook(playbook_file, playbook_programs) if journal is not None else None
+            if content is not None:
+                print("Reusing the playbook validated by the interrupted run.")
+            else:
+                try:
+                    content = prepare_playbook(playbook_programs, os_name, pm, client, choice, playbook_file,
+                                               use_cache, hedge_after, stream)
+                except Exception as e:
+                    print(f"Error preparing playbook: {e}")
+                    return False
+                if content is None:
+                    return False
+                if journal is not None:
+                    journal.record("playbook", file=playbook_file, hash=content_hash(content),
+                                   programs=playbook_programs)
+            prepared["content"] = content
+
+        def run():
+            if journal is None:
+                return run_playbook(playbook_file)
+            playbook_hash = content_hash(prepared["content"])
+            finished = journal.finished_tasks(playbook_hash)
+            tasks = task_names(prepared["content"])
+            remaining = [task for task in tasks if task not in finished]
+            start_at_task = None
+            if finished and tasks and not remaining:
+                print("Every playbook task finished in the interrupted run.")
+            else:
+                if finished and remaining:
+                    start_at_task = remaining[0]
+                    print(f"Resuming the playbook at task: {start_at_task}")
+                if not run_playbook(playbook_file, start_at_task, TaskRecorder(journal, playbook_hash)):
+                    return False
+            journal.record("installed", backend="playbook", programs=playbook_programs)
+
+        after = ["prepare playbook"] + refresh_after
+        for program in playbook_programs:
+            after += [step_of[d] for d in dependencies[program] if d in step_of and step_of[d] not in after]
+        plan.add("prepare playbook", f"compile or generate tasks for {', '.join(playbook_programs)}", prepare)
+        plan.add("run playbook", f"ansible-playbook {playbook_file}", run, after=after,
+                 locks=playbook_locks(os_name, pm))
+    return plan
+
+def install_programs_and_configure(programs, os_name, client, choice, use_cache=True, hedge_after=DEFAULT_HEDGE_AFTER,
+                                   stream=False, force_refresh=False, index_ttl=DEFAULT_INDEX_TTL, dry_run=False,
+                                   resume=False):
+    """
+    Installs programs and runs Ansible configuration.
+    This function is designed to be called from both the CLI and GUI.
+    Programs that are already installed are skipped.
+    Playbooks that pass the syntax check are cached on disk and reused for
+    identical requests unless use_cache is False.
+
+    Every program is installed exactly once: by the package manager if it is known
+    to offer it, otherwise by the playbook (see assign_backends()). The resulting plan
+    is printed before it runs; with dry_run=True nothing is installed.
+    Finished work is recorded in a journal (see Journal). With resume=True, programs
+    an interrupted run with the same program list installed are skipped, its
+    validated playbook is reused and the playbook starts at its first unfinished task.
+    Backends that do not share a lock install at the same time, and the playbook is
+    generated and syntax-checked meanwhile (see build_install_plan()).
+    If the first model has not answered within hedge_after seconds the next model is
+    queried in parallel; pass None to try the models one after another.
+    With stream=True generated playbooks are echoed token by token and aborted early
+    when a task is clearly broken.
+    On Linux the package index is only refreshed when it is older than index_ttl
+    seconds, or always with force_refresh=True.
+    Aliases such as "vscode" are mapped to real package names first.
+    """
+    if not programs:
+        print("No programs specified.")
+        return
+
+    pm = None
+    if os_name == "linux":
+        pm = detect_package_manager()
+        if pm is None:
+            print("No supported package manager found (apt, dnf, yum, pacman).")
+            return
+        print(f"Using package manager: {pm}")
+    elif os_name == "darwin":
+        try:
+            if not command_exists("brew"):
+                if dry_run:
+                    print("Homebrew is not installed and would be installed first.")
+                else:
+                    install_homebrew()
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+    elif os_name == "windows":
+        try:
+            if not command_exists("choco"):
+                if dry_run:
+                    print("Chocolatey is not installed and would be installed first.")
+                else:
+                    install_chocolatey()
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+
+    journal = Journal(journal_path(os_name, programs), resume=resume)
+    manager = pm or OS_PACKAGE_MANAGERS.get(os_name)
+    with span("name resolution"):
+        programs, known = resolve_programs(manager, programs, refresh=force_refresh)
+    if resume:
+        installed = journal.installed_programs()
+        skipped = [p for p in programs if p in installed]
+        if skipped:
+            print(f"Skipping programs installed by the interrupted run: {', '.join(skipped)}")
+            programs = [p for p in programs if p not in installed]
+
+    groups, playbook_programs = assign_backends(os_name, pm, programs, known)
+    with span("inventory probe"):
+        groups, playbook_programs = skip_installed(groups, playbook_programs, manager)
+    if not groups and not playbook_programs:
+        print("All programs are already installed. Nothing to do.")
+        return
+
+    plan = build_install_plan(os_name, pm, groups, playbook_programs, client, choice, 'ansible_playbook.yml',
+                              use_cache, hedge_after, stream, force_refresh, index_ttl, journal)
+    plan.print_plan()
+    if dry_run:
+        print("Dry run: nothing was installed.")
+        return
+    run_plan(plan)
+
+def run_fleet_group(playbook_file, inventory_file, group, forks=DEFAULT_FORKS):
+    """
+    Runs a playbook against one inventory group, streaming its output, and returns
+    the PLAY RECAP section.
+    """
+    print(f"Running {playbook_file} on group {group}...")
+    recap = RecapCollector()
+    try:
+        # Exit codes 2 and 4 mean some hosts failed or were unreachable; the recap still lists them.
+        run_streaming(fleet_command(playbook_file, inventory_file, group, forks), sinks=DEFAULT_SINKS + [recap],
+                      check=False)
+    except OSError as e:
+        print(f"Error running playbook: {e}")
+    return recap.text()
+
+def run_fleet(inventory_file, client, choice, programs=None, forks=DEFAULT_FORKS, use_cache=True, hedge_after=None,
+              stream=False):
+    """
+    Provisions every OS group of an inventory. The playbook is prepared once per
+    OS and package manager, retargeted at each group and run with `forks` hosts
+    in parallel. A parent group only runs on the hosts that none of its child OS
+    groups provisions. Returns {group: {host: stats}}, with None for hosts without a recap.
+    """
+    groups = load_inventory(inventory_file)
+    platforms = os_groups(groups)
+    if not platforms:
+        print(f"No OS groups found in {inventory_file}. Set installer_os (and installer_package_manager) "
+              f"in the group vars.")
+        return {}
+
+    prepared = {}
+    results = {}
+    for group, (os_name, pm) in platforms.items():
+        if os_name not in ("linux", "darwin"):
+            print(f"Skipping group {group}: cannot run Ansible playbooks on {os_name}.")
+            continue
+        limit, hosts = fleet_limit(groups, group, platforms)
+        if limit != group and not hosts:
+            print(f"Skipping group {group}: its hosts are provisioned through its child groups.")
+            continue
+        if choice == 'a':
+            group_programs = BASIC_PROGRAMS.get(os_name, [])
+        elif choice == 'b':
+            group_programs = DEVELOPER_PROGRAMS.get(os_name, [])
+        else:
+            group_programs = programs or []
+        if not group_programs:
+            print(f"Skipping group {group}: no programs to install.")
+            continue
+
+        key = (os_name, pm, tuple(group_programs))
+        if key not in prepared:
+            base_file = f"fleet_{os_name}_{pm or 'default'}.yml"
+            prepared[key] = prepare_playbook(group_programs, os_name, pm, client, choice, base_file, use_cache,
+                                             hedge_after, stream)
+        if prepared[key] is None:
+            print(f"Skipping group {group}: no valid playbook.")
+            continue
+
+        playbook_file = f"fleet_{group}.yml"
+        with open(playbook_file, 'w') as f:
+            f.write(fleet_playbook(prepared[key], group))
+        recap = parse_recap(run_fleet_group(playbook_file, inventory_file, limit, forks))
+        results[group] = {host: recap.get(host) for host in hosts or recap}
+
+    print_fleet_summary(results)
+    return results
+
+def run_batch(profiles_file, output_dir, client, workers=DEFAULT_WORKERS,
+              requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+              use_cache=True):
+    """
+    Generates a validated playbook for every profile in profiles_file and writes it to
+    output_dir/<name>.yml. Identical requests are generated once, and up to `workers`
+    requests run concurrently while all API calls share one rate limiter.
+    Returns {profile name: written path, or None if it failed}.
+    """
+    requests, errors = dedup_requests(load_profiles(profiles_file), {'a': BASIC_PROGRAMS, 'b': DEVELOPER_PROGRAMS})
+    for name, error in errors.items():
+        print(f"Skipping profile {name}: {error}.")
+    profile_count = sum(len(r["names"]) for r in requests.values()) + len(errors)
+    print(f"{profile_count} profiles, {len(requests)} unique playbooks to generate.")
+
+    os.makedirs(output_dir, exist_ok=True)
+    limited_client = RateLimitedClient(client, RateLimiter(requests_per_minute, tokens_per_minute))
+    results = {name: None for name in errors}
+
+    def generate(key, request):
+        os_name, pm, _ = key
+        names = request["names"]
+        # Work on a scratch file so that a failed request never leaves a playbook behind.
+        pending_file = os.path.join(output_dir, f".{names[0]}.pending.yml")
+        try:
+            # Hedging would spend quota twice, so batch requests try the models one at a time.
+            content = prepare_playbook(request["programs"], os_name, pm, limited_client, request["choice"],
+                                       pending_file, use_cache)
+        finally:
+            if os.path.exists(pending_file):
+                os.remove(pending_file)
+        if content is None:
+            return {name: None for name in names}
+        written = {}
+        for name in names:
+            path = os.path.join(output_dir, f"{name}.yml")
+            write_atomic(path, content)
+            written[name] = path
+        return written
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(generate, key, request): request for key, request in requests.items()}
+        for future, request in futures.items():
+            try:
+                results.update(future.result())
+            except Exception as e:
+                print(f"Error generating playbook for {', '.join(request['names'])}: {e}")
+                results.update({name: None for name in request["names"]})
 
+    failed = sorted(name for name, path in results.items() if path is None)
+    print(f"Wrote {len(results) - len(failed)} of {len(results)} playbooks to {output_dir}.")
+    if failed:
+        print(f"Failed profiles: {', '.join(failed)}")
+    return results
 
 def main():
     try:
@@ -395,36 +1082,160 @@ def main():
         action='version',
         version=f'%(prog)s {version}'
     )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Always generate a fresh playbook instead of reusing a cached one.'
+    )
+    parser.add_argument(
+        '--hedge-after',
+        type=float,
+        default=DEFAULT_HEDGE_AFTER,
+        metavar='SECONDS',
+        help='Query the fallback model in parallel if the primary model has not answered '
+             'within this many seconds. A negative value tries the models one at a time.'
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Show the playbook live while it is generated and stop early if it is broken. '
+             'Models are tried one at a time.'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Print which programs would be installed by the package manager and which by the playbook, '
+             'then stop.'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue an interrupted install of the same programs: skip what it installed, reuse its '
+             'checked playbook and start the playbook at the first unfinished task.'
+    )
+    parser.add_argument(
+        '--refresh-index',
+        action='store_true',
+        help='Always refresh the Linux package index before installing.'
+    )
+    parser.add_argument(
+        '--index-ttl',
+        type=float,
+        default=DEFAULT_INDEX_TTL / 3600,
+        metavar='HOURS',
+        help='Skip the Linux package index refresh if the index is younger than this '
+             f'(default: {DEFAULT_INDEX_TTL / 3600:g}).'
+    )
+    subparsers = parser.add_subparsers(dest='command')
+    fleet_parser = subparsers.add_parser(
+        'fleet',
+        help='Provision every OS group of an Ansible inventory with one playbook per OS.'
+    )
+    fleet_parser.add_argument('inventory', help='Ansible inventory file (INI or YAML).')
+    fleet_parser.add_argument(
+        '-f', '--forks',
+        type=int,
+        default=DEFAULT_FORKS,
+        help=f'Number of hosts provisioned in parallel (default: {DEFAULT_FORKS}).'
+    )
+    fleet_parser.add_argument(
+        '--programs',
+        metavar='LIST',
+        help='Comma separated programs to install instead of choosing a list interactively.'
+    )
+    batch_parser = subparsers.add_parser(
+        'batch',
+        help='Generate playbooks for a file of machine profiles without prompting.'
+    )
+    batch_parser.add_argument('profiles', help='JSON or YAML list of profiles (name, os, package_manager, programs).')
+    batch_parser.add_argument(
+        '-o', '--output-dir',
+        default='playbooks',
+        help='Directory the validated playbooks are written to (default: playbooks).'
+    )
+    batch_parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f'Number of playbooks generated concurrently (default: {DEFAULT_WORKERS}).'
+    )
+    batch_parser.add_argument(
+        '--rpm',
+        type=int,
+        default=DEFAULT_REQUESTS_PER_MINUTE,
+        help=f'API requests allowed per minute (default: {DEFAULT_REQUESTS_PER_MINUTE}).'
+    )
+    batch_parser.add_argument(
+        '--tpm',
+        type=int,
+        default=DEFAULT_TOKENS_PER_MINUTE,
+        help=f'API tokens allowed per minute (default: {DEFAULT_TOKENS_PER_MINUTE}).'
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Time every phase, subprocess and model request, write a Chrome trace '
+             'and print a summary table at the end.'
+    )
+    parser.add_argument(
+        '--profile-file',
+        metavar='PATH',
+        help=f'Write the --profile trace to this file (default: {DEFAULT_TRACE_FILE}). Implies --profile.'
+    )
+    parser.add_argument(
+        '--log-file',
+        help='Also append the output of package managers and Ansible to this file.'
+    )
     args = parser.parse_args()
-
+    if args.dry_run and args.command:
+        parser.error("--dry-run only applies to local installs.")
+    if args.resume and args.command:
+        parser.error("--resume only applies to local installs.")
+    if args.log_file:
+        add_default_sink(FileSink(args.log_file))
+    trace_file = args.profile_file or (DEFAULT_TRACE_FILE if args.profile else None)
+    if trace_file:
+        profiler.enable()
+    try:
+        run_main(args)
+    finally:
+        if trace_file:
+            profiler.print_summary()
+            profiler.write_trace(trace_file)
+            print(f"Profile trace written to {trace_file} (open it in chrome://tracing or ui.perfetto.dev).")
+
+def run_main(args):
     os_name = platform.system().lower()
 
     if os_name not in ("linux", "darwin", "windows"):
         print(f"Unsupported operating system: {os_name}")
         return
 
-    if not check_pip():
-        install_pip()
-
-    install_package("python-dotenv")
-    install_package("openai")
-
-    if load_dotenv is None:
-        raise ModuleNotFoundError("python-dotenv is required. Please install it before running.")
-    if OpenAI is None:
-        raise ModuleNotFoundError("openai is required. Please install it before running.")
-
-    load_dotenv()
+    bootstrap_dependencies()
+    load_env_file()
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OPENAI_API_KEY environment variable not set.")
 
-    client = OpenAI(
-        base_url="https://api.aimlapi.com/v1",
-        api_key=api_key,
-    )
+    client = create_client(api_key)
+    try:
+        run_command(args, os_name, client)
+    finally:
+        usage_log.print_summary()
+
+def run_command(args, os_name, client):
+    if args.command == 'batch':
+        if os_name not in ("linux", "darwin"):
+            print("Batch generation needs Ansible for the syntax check and is not supported on Windows.")
+            return
+        ensure_ansible_installed()
+        run_batch(args.profiles, args.output_dir, client, workers=args.workers, requests_per_minute=args.rpm,
+                  tokens_per_minute=args.tpm, use_cache=not args.no_cache)
+        return
 
-    if os_name in ("linux", "darwin"):
+    if args.dry_run:
+        print("Dry run: Ansible and the programs will not be installed.")
+    elif os_name in ("linux", "darwin"):
         ensure_ansible_installed()
         print("\nInstallation complete. You can now use Ansible.")
         print("Note: Ansible requires Python 3.5+ and may need additional system dependencies like SSH on Linux.")
@@ -433,8 +1244,20 @@ def main():
         print("Ansible does not support Windows as a control machine natively.")
         print("Skipping Ansible installation. Proceeding with program installation if applicable.")
 
+    hedge_after = args.hedge_after if args.hedge_after >= 0 else None
+    if args.command == 'fleet':
+        if args.programs:
+            choice, programs = 'c', [p.strip() for p in args.programs.split(',') if p.strip()]
+        else:
+            choice, programs = get_program_list(os_name)
+        run_fleet(args.inventory, client, choice, programs, forks=args.forks, use_cache=not args.no_cache,
+                  hedge_after=hedge_after, stream=args.stream)
+        return
+
     choice, programs = get_program_list(os_name)
-    install_programs_and_configure(programs, os_name, client, choice)
+    install_programs_and_configure(programs, os_name, client, choice, use_cache=not args.no_cache,
+                                   hedge_after=hedge_after, stream=args.stream, force_refresh=args.refresh_index,
+                                   index_ttl=args.index_ttl * 3600, dry_run=args.dry_run, resume=args.resume)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,193 @@
+import bisect
+import os
+import subprocess
+import time
+from collections import defaultdict
+
+from .cache import cache_dir, write_atomic
+from .profiling import subprocess_span
+
+# Rebuild the list of available package names when it is older than this many seconds.
+DEFAULT_NAMES_TTL = 24 * 60 * 60
+MAX_SUGGESTIONS = 3
+# Minimum trigram similarity (0 to 1) for a name to be suggested.
+MIN_SIMILARITY = 0.3
+
+# Commands that print every available package name, one per line.
+NAME_COMMANDS = {
+    "apt": [["apt-cache", "pkgnames"]],
+    "dnf": [["dnf", "repoquery", "--quiet", "--qf", "%{name}"]],
+    "yum": [["repoquery", "--all", "--quiet", "--qf", "%{name}"]],
+    "pacman": [["pacman", "-Slq"]],
+    "brew": [["brew", "formulae"], ["brew", "casks"]],
+}
+
+# Common names -> package id per package manager.
+ALIASES = {
+    "vscode": {"apt": "code", "dnf": "code", "yum": "code", "pacman": "code", "brew": "visual-studio-code",
+               "choco": "vscode"},
+    "visual-studio-code": {"apt": "code", "dnf": "code", "yum": "code", "pacman": "code", "choco": "vscode"},
+    "chrome": {"apt": "google-chrome-stable", "dnf": "google-chrome-stable", "yum": "google-chrome-stable",
+               "pacman": "chromium", "brew": "google-chrome", "choco": "googlechrome"},
+    "google-chrome": {"apt": "google-chrome-stable", "dnf": "google-chrome-stable", "yum": "google-chrome-stable",
+                      "pacman": "chromium", "choco": "googlechrome"},
+    "docker": {"apt": "docker.io", "dnf": "moby-engine", "choco": "docker-desktop"},
+    "node": {"apt": "nodejs", "dnf": "nodejs", "yum": "nodejs", "pacman": "nodejs", "choco": "nodejs"},
+    "python": {"apt": "python3", "dnf": "python3", "yum": "python3", "brew": "python", "choco": "python"},
+    "spotify": {"apt": "spotify-client", "dnf": "lpf-spotify-client"},
+    "dbeaver": {"apt": "dbeaver-ce", "brew": "dbeaver-community"},
+    "acrobat": {"brew": "adobe-acrobat-reader", "choco": "adobereader"},
+}
+
+
+def trigrams(name):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    The package names one package manager can install, with exact, prefix and
+    trigram lookups. The trigram index is only built once a name is not found.
+    """
+
+    def __init__(self, names):
+        self.names = sorted(set(names))
+        self._known = set(self.names)
+        self._trigrams = None
+
+    def __contains__(self, name):
+        return name in self._known
+
+    def __len__(self):
+        return len(self.names)
+
+    def prefix_matches(self, prefix, limit=MAX_SUGGESTIONS):
+        start = bisect.bisect_left(self.names, prefix)
+        matches = []
+        for name in self.names[start:]:
+            if not name.startswith(prefix) or len(matches) >= limit:
+                break
+            matches.append(name)
+        return matches
+
+    def _trigram_index(self):
+        if self._trigrams is None:
+            index = defaultdict(list)
+            for position, name in enumerate(self.names):
+                for trigram in trigrams(name):
+                    index[trigram].append(position)
+            self._trigrams = index
+        return self._trigrams
+
+    def similar(self, name, limit=MAX_SUGGESTIONS):
+        """
+        Returns up to limit names ranked by trigram similarity to name.
+        """
+        wanted = trigrams(name)
+        shared = defaultdict(int)
+        index = self._trigram_index()
+        for trigram in wanted:
+            for position in index.get(trigram, ()):
+                shared[position] += 1
+
+        scored = []
+        for position, count in shared.items():
+            candidate = self.names[position]
+            # Jaccard similarity; a name of n characters has about n + 1 padded trigrams.
+            similarity = count / (len(wanted) + len(candidate) + 1 - count)
+            if similarity >= MIN_SIMILARITY:
+                scored.append((-similarity, candidate))
+        scored.sort()
+        return [candidate for _, candidate in scored[:limit]]
+
+    def suggest(self, name, limit=MAX_SUGGESTIONS):
+        suggestions = self.prefix_matches(name, limit)
+        if len(suggestions) >= limit:
+            return suggestions
+        for candidate in self.similar(name, limit):
+            if candidate not in suggestions and len(suggestions) < limit:
+                suggestions.append(candidate)
+        return suggestions
+
+
+def names_file(manager):
+    return cache_dir("names", f"{manager}.txt")
+
+
+def query_names(manager):
+    """
+    Lists the available package names. Raises OSError or CalledProcessError if the
+    package manager cannot be queried.
+    """
+    names = []
+    for command in NAME_COMMANDS[manager]:
+        with subprocess_span(command):
+            output = subprocess.check_output(command, stderr=subprocess.DEVNULL)
+        names.extend(line.strip() for line in output.decode("utf-8", errors="replace").splitlines() if line.strip())
+    return names
+
+
+def load_name_index(manager, ttl=DEFAULT_NAMES_TTL, refresh=False):
+    """
+    Returns the NameIndex for manager, rebuilding the cached name list when it is
+    older than ttl seconds. Falls back to a stale list, and returns None when no
+    list can be obtained.
+    """
+    if manager not in NAME_COMMANDS:
+        return None
+
+    path = names_file(manager)
+    try:
+        fresh = not refresh and time.time() - os.path.getmtime(path) < ttl
+    except OSError:
+        fresh = False
+
+    if not fresh:
+        try:
+            names = query_names(manager)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"Warning: Could not list the available {manager} packages: {e}")
+        else:
+            if names:
+                write_atomic(path, "\n".join(sorted(set(names))) + "\n")
+                return NameIndex(names)
+
+    try:
+        with open(path) as f:
+            return NameIndex(f.read().split())
+    except OSError:
+        return None
+
+
+def resolve_programs(manager, programs, ttl=DEFAULT_NAMES_TTL, refresh=False):
+    """
+    Maps aliases such as "vscode" to the package id for manager and checks every name
+    against the available packages. Returns (programs, known), where known is the set
+    of resolved names the package manager offers, or None when the available packages
+    cannot be listed.
+    """
+    resolved = []
+    for program in programs:
+        alias = ALIASES.get(program.strip().lower(), {}).get(manager)
+        if alias and alias != program:
+            print(f"Using {manager} package {alias} for {program}.")
+        name = alias or program
+        if name not in resolved:
+            resolved.append(name)
+
+    index = load_name_index(manager, ttl, refresh) if resolved else None
+    if index is None:
+        return resolved, None
+
+    known = set()
+    for position, name in enumerate(resolved):
+        if name.lower() in index and name not in index:
+            resolved[position] = name = name.lower()
+        if name in index:
+            known.add(name)
+            continue
+        suggestions = index.suggest(name.lower())
+        hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+        print(f"Warning: {name} is not a known {manager} package.{hint}")
+    return resolved, known
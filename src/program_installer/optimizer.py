@@ -0,0 +1,159 @@
+import json
+
+from .validator import dump_playbook, load_yaml, module_name, task_module
+
+# Package modules whose `name` accepts a list, so one call can install many packages.
+LIST_MODULES = {"apt", "dnf", "flatpak", "homebrew", "homebrew_cask", "package", "pacman", "pip", "snap", "yum"}
+
+# Task keywords that give a task its own identity; such tasks are never merged.
+UNMERGEABLE_KEYS = {
+    "block", "delegate_to", "loop", "loop_control", "notify", "register", "run_once", "until", "with_dict",
+    "with_items", "with_list",
+}
+
+REGISTER_PREFIX = "installer_batch_"
+
+# Bump whenever optimize_playbook() rewrites playbooks differently, so that optimized
+# playbooks cached by an older version are checked again.
+OPTIMIZER_VERSION = 1
+
+TASK_SECTIONS = ("pre_tasks", "tasks", "post_tasks", "handlers", "roles")
+
+
+def merge_key(task):
+    """
+    Returns what a task must share with its neighbours to be merged with them, or
+    None if it installs something other than a single plain package name.
+    """
+    if not isinstance(task, dict) or UNMERGEABLE_KEYS & set(task):
+        return None
+    module = task_module(task)
+    if module is None or module_name(module) not in LIST_MODULES:
+        return None
+    args = task[module]
+    if not isinstance(args, dict) or not isinstance(args.get("name"), str) or "{{" in args["name"]:
+        return None
+    if module_name(module) == "snap" and args.get("classic"):
+        # The snap module only installs a single snap with classic confinement.
+        return None
+    other_args = {k: v for k, v in args.items() if k != "name"}
+    keywords = {k: v for k, v in task.items() if k not in ("name", module)}
+    return module, json.dumps(other_args, sort_keys=True, default=str), json.dumps(keywords, sort_keys=True, default=str)
+
+
+def merged_tasks(group, register):
+    """
+    Replaces a run of tasks that differ only in the package name by one task that
+    installs the whole list. Because one bad package fails the whole list, a second
+    task retries the packages one at a time when the batch fails.
+    """
+    first = group[0]
+    module = task_module(first)
+    packages = [task[module]["name"] for task in group]
+    keywords = {k: v for k, v in first.items() if k not in ("name", module)}
+    ignore_errors = keywords.pop("ignore_errors", False)
+    condition = keywords.pop("when", None)
+    conditions = condition if isinstance(condition, list) else ([condition] if condition is not None else [])
+
+    batch = {"name": f"Install {', '.join(packages)}", module: dict(first[module], name=packages)}
+    batch.update(keywords)
+    if conditions:
+        batch["when"] = condition
+    batch["register"] = register
+    batch["ignore_errors"] = True
+
+    fallback = {"name": f"Install {', '.join(packages)} one at a time", module: dict(first[module], name="{{ item }}")}
+    fallback.update(keywords)
+    fallback["loop"] = list(packages)
+    fallback["when"] = conditions + [f"{register} is failed"] if conditions else f"{register} is failed"
+    if ignore_errors:
+        fallback["ignore_errors"] = ignore_errors
+    return [batch, fallback]
+
+
+def collapse_tasks(tasks, counter):
+    """
+    Merges consecutive install tasks with the same module, arguments and keywords.
+    Returns (tasks, merged), where merged is the number of tasks folded into others.
+    """
+    result = []
+    merged = 0
+    index = 0
+    while index < len(tasks):
+        key = merge_key(tasks[index])
+        end = index + 1
+        while key is not None and end < len(tasks) and merge_key(tasks[end]) == key:
+            end += 1
+        if end - index > 1:
+            counter[0] += 1
+            result.extend(merged_tasks(tasks[index:end], f"{REGISTER_PREFIX}{counter[0]}"))
+            merged += end - index - 1
+        else:
+            result.append(tasks[index])
+        index = end
+    return result, merged
+
+
+def uses_facts(play):
+    """
+    Returns True if anything in the play refers to gathered facts (ansible_* variables).
+    """
+    sections = {k: v for k, v in play.items() if k not in ("hosts", "name", "gather_facts")}
+    text = json.dumps(sections, default=str).replace("ansible_pipelining", "")
+    return "ansible_" in text
+
+
+def set_play_keys(play, updates):
+    """
+    Returns a copy of play with updates applied; new keys go before the task lists.
+    """
+    pending = dict(updates)
+    result = {}
+    for key, value in play.items():
+        if key in TASK_SECTIONS:
+            result.update((k, v) for k, v in pending.items() if k not in play)
+            pending = {k: v for k, v in pending.items() if k in play}
+        result[key] = pending.pop(key, value)
+    result.update(pending)
+    return result
+
+
+def optimize_playbook(content):
+    """
+    Rewrites a playbook to run faster without changing what it installs:
+    consecutive per-package install tasks become one task per package list,
+    SSH pipelining is turned on and fact gathering is skipped when no task uses facts.
+    Returns (content, merged); the content is unchanged if it cannot be parsed.
+    """
+    if not content:
+        return content, 0
+    yaml = load_yaml()
+    try:
+        plays = yaml.safe_load(content)
+    except yaml.YAMLError:
+        return content, 0
+    if not isinstance(plays, list) or not all(isinstance(play, dict) for play in plays):
+        return content, 0
+
+    changed = False
+    merged = 0
+    counter = [0]
+    for index, play in enumerate(plays):
+        for section in ("pre_tasks", "tasks", "post_tasks"):
+            if isinstance(play.get(section), list):
+                play[section], section_merged = collapse_tasks(play[section], counter)
+                merged += section_merged
+
+        updates = {}
+        if play.get("gather_facts", True) and not uses_facts(play):
+            updates["gather_facts"] = False
+        play_vars = play.get("vars")
+        if (play_vars is None or isinstance(play_vars, dict)) and not (play_vars or {}).get("ansible_pipelining"):
+            updates["vars"] = dict(play_vars or {}, ansible_pipelining=True)
+        if updates:
+            plays[index] = set_play_keys(play, updates)
+            changed = True
+
+    if not changed and not merged:
+        return content, 0
+    return dump_playbook(plays), merged
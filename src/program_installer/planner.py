@@ -0,0 +1,207 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .catalog import CLASSIC_SNAPS, lookup
+
+# Backend of the native package manager, per OS. On Linux it is the detected manager.
+NATIVE_BACKENDS = {"darwin": "homebrew", "windows": "choco"}
+
+# Steps holding the same lock never run at the same time: two dpkg processes, for
+# example, would fail on the dpkg lock. Backends with different locks run concurrently.
+BACKEND_LOCKS = {
+    "apt": "dpkg",
+    "dnf": "rpm",
+    "yum": "rpm",
+    "pacman": "pacman",
+    "snap": "snapd",
+    "classic snap": "snapd",
+    "homebrew": "homebrew",
+    "homebrew_cask": "homebrew_cask",
+    "choco": "choco",
+}
+
+# Programs that must be installed after other programs of the same run, per OS.
+PROGRAM_DEPENDENCIES = {
+    "linux": {
+        "docker-compose": ["docker.io"],
+        "docker-buildx": ["docker.io"],
+    },
+    "darwin": {
+        "docker-compose": ["docker"],
+    },
+}
+
+
+class Step:
+    """
+    One node of an execution plan. action is called without arguments when every
+    step named in after has finished; the step fails if it raises or returns False.
+    """
+
+    def __init__(self, name, description, action=None, after=(), locks=()):
+        self.name = name
+        self.description = description
+        self.action = action
+        self.after = list(after)
+        self.locks = set(locks)
+
+
+class Plan:
+    def __init__(self):
+        self.steps = []
+
+    def add(self, name, description, action=None, after=(), locks=()):
+        missing = [dependency for dependency in after if dependency not in self.names()]
+        if missing:
+            raise ValueError(f"Step {name} depends on unknown steps: {', '.join(missing)}")
+        step = Step(name, description, action, after, locks)
+        self.steps.append(step)
+        return step
+
+    def names(self):
+        return [step.name for step in self.steps]
+
+    def describe(self):
+        """
+        Returns the plan as numbered lines, each naming the steps it waits for.
+        """
+        numbers = {step.name: number for number, step in enumerate(self.steps, 1)}
+        lines = []
+        for number, step in enumerate(self.steps, 1):
+            line = f"  {number}. {step.name}: {step.description}"
+            if step.after:
+                line += f"  (after {', '.join(str(numbers[d]) for d in step.after)})"
+            lines.append(line)
+        return lines
+
+    def print_plan(self):
+        print("Execution plan:")
+        for line in self.describe():
+            print(line)
+
+
+def native_backend(os_name, pm):
+    return pm if os_name == "linux" else NATIVE_BACKENDS.get(os_name)
+
+
+def playbook_locks(os_name, pm):
+    """
+    Returns the locks the playbook run takes. It may install with any backend of
+    the OS, so it waits for all of them.
+    """
+    backends = {"linux": [pm, "snap"], "darwin": ["homebrew", "homebrew_cask"]}.get(os_name, [])
+    return {BACKEND_LOCKS[backend] for backend in backends if backend in BACKEND_LOCKS}
+
+
+def program_dependencies(os_name, programs):
+    """
+    Returns {program: [programs of programs it must be installed after]}.
+    """
+    table = PROGRAM_DEPENDENCIES.get(os_name, {})
+    return {p: [d for d in table.get(p, []) if d in programs and d != p] for p in programs}
+
+
+def dependency_stages(dependencies):
+    """
+    Returns {program: stage}, where stage is the length of the longest chain of
+    dependencies below the program: 0 for programs that need nothing else.
+    """
+    stages = {}
+
+    def stage(program, chain):
+        if program in chain:
+            raise ValueError(f"Dependency cycle: {' -> '.join(chain + [program])}")
+        if program not in stages:
+            stages[program] = max((stage(d, chain + [program]) + 1 for d in dependencies[program]), default=0)
+        return stages[program]
+
+    for program in dependencies:
+        stage(program, [])
+    return stages
+
+
+def assign_backends(os_name, pm, programs, known=None):
+    """
+    Assigns every program to exactly one backend. Returns (groups, playbook):
+    groups maps (backend, stage) to a list of (program, package) pairs installed
+    by that backend directly, and playbook lists the programs the playbook has to
+    install. Programs of stage n depend on programs of an earlier stage (see
+    dependency_stages()); groups and playbook are ordered by stage.
+
+    A program goes to its catalog backend (the package manager, snap, or a Homebrew
+    cask), or to the native package manager if known (the package names it offers,
+    None if unknown) confirms the name. Everything else is left to the playbook,
+    which can ask the model, and so is every program that depends on one of those.
+    Windows has no playbook, so everything is installed with Chocolatey.
+    """
+    native = native_backend(os_name, pm)
+    assigned = {}
+    for program in programs:
+        resolved = lookup(os_name, program, pm) if os_name != "windows" else None
+        if resolved is not None:
+            backend, package = resolved
+            if backend == "snap" and package in CLASSIC_SNAPS:
+                backend = "classic snap"
+            assigned[program] = (backend, package)
+        elif os_name == "windows" or (known is not None and program in known):
+            assigned[program] = (native, program)
+        else:
+            assigned[program] = None
+
+    dependencies = program_dependencies(os_name, programs)
+    changed = True
+    while changed:
+        changed = False
+        for program, backend in assigned.items():
+            if backend is not None and any(assigned[d] is None for d in dependencies[program]):
+                assigned[program] = None
+                changed = True
+
+    stages = dependency_stages(dependencies)
+    groups = {}
+    playbook = []
+    for program in sorted(programs, key=stages.get):
+        if assigned[program] is None:
+            playbook.append(program)
+        else:
+            backend, package = assigned[program]
+            groups.setdefault((backend, stages[program]), []).append((program, package))
+    return groups, playbook
+
+
+def run_plan(plan, workers=None):
+    """
+    Runs the steps of plan, each as soon as the steps it comes after have succeeded
+    and none of its locks is held by a running step, so independent steps overlap.
+    Steps after a failed step are skipped.
+    Returns {step name: "done" | "failed" | "skipped"}.
+    """
+    status = {}
+    pending = list(plan.steps)
+    running = {}
+    held = set()
+    with ThreadPoolExecutor(max_workers=workers or max(1, len(plan.steps))) as executor:
+        while pending or running:
+            for step in list(pending):
+                if any(status.get(d) in ("failed", "skipped") for d in step.after):
+                    print(f"Skipping {step.name}.")
+                    status[step.name] = "skipped"
+                    pending.remove(step)
+                elif all(status.get(d) == "done" for d in step.after) and not step.locks & held:
+                    pending.remove(step)
+                    held |= step.locks
+                    running[executor.submit(step.action or (lambda: None))] = step
+            if not running:
+                # Only skipped steps were left.
+                continue
+
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                held -= step.locks
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error in step {step.name}: {e}")
+                    result = False
+                status[step.name] = "failed" if result is False else "done"
+    return status
@@ -0,0 +1,148 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+DEFAULT_TRACE_FILE = "program-installer-trace.json"
+
+
+def command_label(command):
+    """
+    Names a subprocess span after the program and its subcommand, e.g. "apt install".
+    """
+    if isinstance(command, str):
+        return command.split()[0] if command.strip() else command
+    args = [str(a) for a in command]
+    if args and args[0] == "sudo":
+        args = args[1:]
+    if len(args) > 2 and args[1] == "-m":
+        # python -m pip install ...
+        args = args[2:]
+    if "--syntax-check" in args:
+        return f"{args[0]} --syntax-check"
+    if len(args) > 1 and not args[1].startswith("-") and "/" not in args[1] and "." not in args[1]:
+        return " ".join(args[:2])
+    return args[0] if args else ""
+
+
+class Profiler:
+    """
+    Collects timed spans for phases, subprocesses and model requests. Spans cost
+    nothing but a flag check until the profiler is enabled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        with self._lock:
+            self.enabled = True
+            self.events = []
+            self.origin = time.perf_counter()
+
+    def disable(self):
+        self.enabled = False
+
+    @contextlib.contextmanager
+    def span(self, name, category="phase", **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = {
+                "name": name,
+                "cat": category,
+                "start": start - self.origin,
+                "duration": end - start,
+                "thread": threading.current_thread().name,
+                "args": args,
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def trace_events(self):
+        """
+        Returns the spans in the Chrome trace-event format (chrome://tracing, Perfetto).
+        """
+        with self._lock:
+            events = list(self.events)
+        threads = {}
+        trace = []
+        for event in sorted(events, key=lambda e: e["start"]):
+            tid = threads.setdefault(event["thread"], len(threads) + 1)
+            trace.append({
+                "name": event["name"],
+                "cat": event["cat"],
+                "ph": "X",
+                "ts": round(event["start"] * 1e6),
+                "dur": round(event["duration"] * 1e6),
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": event["args"],
+            })
+        for name, tid in threads.items():
+            trace.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}})
+        return trace
+
+    def write_trace(self, path):
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
+
+    def summary(self):
+        """
+        Returns one row per (category, name) with the call count, total and longest duration.
+        """
+        with self._lock:
+            events = list(self.events)
+        rows = {}
+        for event in events:
+            row = rows.setdefault((event["cat"], event["name"]), {
+                "category": event["cat"], "name": event["name"], "calls": 0, "total": 0.0, "max": 0.0,
+            })
+            row["calls"] += 1
+            row["total"] += event["duration"]
+            row["max"] = max(row["max"], event["duration"])
+        return sorted(rows.values(), key=lambda r: r["total"], reverse=True)
+
+    def print_summary(self):
+        rows = self.summary()
+        if not rows:
+            return
+        width = max(len(row["name"]) for row in rows)
+        print(f"{'Category':<10} {'Span':<{width}} {'Calls':>5} {'Total (s)':>10} {'Max (s)':>9}")
+        for row in rows:
+            print(f"{row['category']:<10} {row['name']:<{width}} {row['calls']:>5} "
+                  f"{row['total']:>10.3f} {row['max']:>9.3f}")
+
+
+profiler = Profiler()
+
+
+def span(name, category="phase", **args):
+    return profiler.span(name, category, **args)
+
+
+def subprocess_span(command):
+    return profiler.span(command_label(command), "subprocess", command=command)
+
+
+def traced(name):
+    """
+    Records every call of the decorated function as a phase span.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profiler.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
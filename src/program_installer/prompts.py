@@ -0,0 +1,210 @@
+import re
+import threading
+
+from .validator import TASK_KEYS, dump_playbook, load_yaml, task_module
+
+# Ansible output beyond this many lines is cut down to the lines around the error.
+MAX_ERROR_LINES = 20
+ERROR_CONTEXT_LINES = 2
+RELEVANT_ERROR_RE = re.compile(r"error|fatal|failed|line \d+, column \d+|^\s*\^", re.IGNORECASE)
+# A line ending in a block scalar indicator such as `content: |` or `- >-`.
+BLOCK_SCALAR_RE = re.compile(r"(?:^|:|-)\s*[|>][+-]?[1-9]?[+-]?\s*(?:#.*)?$")
+
+INSTRUCTIONS = (
+    "For each program installation task, add 'ignore_errors: true' to prevent failures if the program is already installed. "
+)
+ANSWER_FORMAT = (
+    "Do not include anything but the complete program and no text before or after answering this prompt "
+    "and get rid of ''' before and after"
+)
+
+
+def estimate_tokens(text):
+    """
+    Rough token count for budgeting: about four characters per token.
+    """
+    return len(text) // 4 + 1
+
+
+def strip_comments(text):
+    """
+    Blanks out comment-only lines, which cost tokens but tell the model nothing.
+    Lines inside block scalars (a `#!/bin/bash` in `content: |`) are kept, and no
+    line is removed, so Ansible's "line N, column M" still points at the right line.
+    """
+    lines = []
+    block_indent = None
+    for line in text.splitlines():
+        stripped = line.lstrip()
+        indent = len(line) - len(stripped)
+        if block_indent is not None:
+            if not stripped or indent > block_indent:
+                lines.append(line)
+                continue
+            block_indent = None
+        if stripped.startswith("#"):
+            lines.append("")
+            continue
+        lines.append(line)
+        if BLOCK_SCALAR_RE.search(line):
+            block_indent = indent
+    return "\n".join(lines) + "\n"
+
+
+def _minify_task(task):
+    task = dict(task)
+    module = task_module(task)
+    # `state: present` is the default of every package module.
+    args = task.get(module) if module else None
+    if isinstance(args, dict) and args.get("state") == "present" and len(args) > 1:
+        task[module] = {k: v for k, v in args.items() if k != "state"}
+    return task
+
+
+def _minify_tasks(tasks):
+    seen = set()
+    kept = []
+    for task in tasks:
+        if not isinstance(task, dict):
+            continue
+        module = task_module(task) or tuple(sorted(k for k in task if k in TASK_KEYS))
+        if module in seen:
+            continue
+        seen.add(module)
+        kept.append(_minify_task(task))
+    return kept
+
+
+def minify_template(template):
+    """
+    Shrinks a template playbook to what the model needs to copy its shape: one
+    representative task per module, no comments and no default values. Templates
+    that are not a YAML playbook only have their comments and blank lines stripped.
+    """
+    stripped = "\n".join(line for line in strip_comments(template).splitlines() if line.strip()) + "\n"
+    yaml = load_yaml()
+    try:
+        # The YAML parser drops comments itself and keeps block scalars intact.
+        plays = yaml.safe_load(template)
+    except yaml.YAMLError:
+        return stripped
+    if not isinstance(plays, list) or not all(isinstance(play, dict) for play in plays):
+        return stripped
+
+    for play in plays:
+        for section in ("pre_tasks", "tasks", "post_tasks", "handlers"):
+            if isinstance(play.get(section), list):
+                play[section] = _minify_tasks(play[section])
+    return dump_playbook(plays)
+
+
+def truncate_error(error, max_lines=MAX_ERROR_LINES, context=ERROR_CONTEXT_LINES):
+    """
+    Cuts long Ansible output down to the lines that mention the error, with a little
+    context around them. Short errors are returned unchanged.
+    """
+    lines = error.strip().splitlines()
+    if len(lines) <= max_lines:
+        return error
+
+    keep = set()
+    for index, line in enumerate(lines):
+        if RELEVANT_ERROR_RE.search(line):
+            keep.update(range(max(0, index - context), min(len(lines), index + context + 1)))
+    if not keep:
+        # Nothing stands out; the end of the output usually explains the failure.
+        keep = set(range(len(lines) - max_lines, len(lines)))
+
+    selected = sorted(keep)[:max_lines]
+    result = []
+    previous = -1
+    for index in selected:
+        if index != previous + 1:
+            result.append("...")
+        result.append(lines[index])
+        previous = index
+    if previous != len(lines) - 1:
+        result.append("...")
+    return "\n".join(result)
+
+
+def build_generate_prompt(os_name, programs, template=None, minify=True):
+    """
+    With minify=False the template is sent as is. Compiled catalog playbooks need
+    that: their tasks install programs the prompt does not name again.
+    """
+    prompt = (
+        f"Create an Ansible playbook YAML for {os_name} environment in order to install development environment "
+        f"and user required programs: {', '.join(programs)}. " + INSTRUCTIONS
+    )
+    if template:
+        prompt += f"\nUse the following template as a base:\n{minify_template(template) if minify else template}\n"
+    return prompt + ANSWER_FORMAT
+
+
+def build_fix_prompt(os_name, programs, error, previous_content):
+    return (
+        f"Fix this Ansible playbook YAML for {os_name} environment based on the following error: "
+        f"{truncate_error(error)}\n"
+        f"Previous playbook:\n{strip_comments(previous_content or '')}\n"
+        f"The playbook should install a development environment and the user-required programs: {', '.join(programs)}. "
+        f"For each program installation task, make sure to add 'ignore_errors: true' to prevent failures if the program is already installed. "
+        + ANSWER_FORMAT
+    )
+
+
+class UsageLog:
+    """
+    Records the token counts and latency of every model request. Counts are
+    estimated from the text when the API does not report usage (e.g. streaming).
+    """
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def record(self, model, prompt, content, latency, usage=None):
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        estimated = not (isinstance(prompt_tokens, int) and isinstance(completion_tokens, int))
+        if estimated:
+            prompt_tokens = estimate_tokens(prompt)
+            completion_tokens = estimate_tokens(content or "")
+        call = {
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency": latency,
+            "estimated": estimated,
+        }
+        with self._lock:
+            self.calls.append(call)
+        return call
+
+    def totals(self):
+        with self._lock:
+            calls = list(self.calls)
+        return {
+            "calls": len(calls),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+            "completion_tokens": sum(c["completion_tokens"] for c in calls),
+            "latency": sum(c["latency"] for c in calls),
+            "estimated": any(c["estimated"] for c in calls),
+        }
+
+    def print_summary(self):
+        totals = self.totals()
+        if not totals["calls"]:
+            return
+        note = " (partly estimated)" if totals["estimated"] else ""
+        print(
+            f"API usage: {totals['calls']} requests, {totals['prompt_tokens']} prompt tokens, "
+            f"{totals['completion_tokens']} completion tokens{note}, {totals['latency']:.1f}s waiting for models."
+        )
+
+    def clear(self):
+        with self._lock:
+            self.calls = []
+
+
+usage_log = UsageLog()
@@ -0,0 +1,157 @@
+import re
+
+from .validator import check_tasks, load_yaml, strip_fences
+
+# "The error appears to be in '/path/playbook.yml': line 12, column 7, ..."
+ANSIBLE_LOCATION_RE = re.compile(r"line (\d+), column (\d+)")
+# Locations reported by validator.validate_playbook(), e.g. "play 1 tasks task 3".
+VALIDATOR_LOCATION_RE = re.compile(r"play (\d+) (tasks|pre_tasks|post_tasks|handlers) task (\d+)")
+
+TASK_SECTIONS = ("tasks", "pre_tasks", "post_tasks", "handlers")
+SECTION_RE = re.compile(r"^(\s*)(%s):\s*$" % "|".join(TASK_SECTIONS))
+PLAY_RE = re.compile(r"^-\s")
+# A top-level program key of a fragments answer, e.g. "vim:" (see fragments.py).
+PROGRAM_RE = re.compile(r"^()([^\s#'\"-][^:]*|'[^']*'|\"[^\"]*\"):\s*$")
+
+
+def _indent(line):
+    return len(line) - len(line.lstrip(" "))
+
+
+def task_spans(content):
+    """
+    Finds every top-level task by its text layout, so it also works on playbooks that
+    are not valid YAML. Returns a list of dicts with the play number (1-based), section,
+    task number within the section (1-based), indentation and the [start, end) line range
+    (0-based).
+
+    Before the first play, a top-level key is read as a program of a fragments answer
+    ({program: [tasks]}); its tasks get the play None and the program as section.
+    """
+    lines = content.splitlines()
+    spans = []
+    play = 0
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if PLAY_RE.match(line):
+            play += 1
+        match = SECTION_RE.match(line)
+        program = play == 0 and not match and PROGRAM_RE.match(line)
+        if program:
+            match = program
+        if not match:
+            i += 1
+            continue
+
+        section_indent = len(match.group(1))
+        section = match.group(2).strip("'\"") if program else match.group(2)
+        task_indent = None
+        number = 0
+        i += 1
+        while i < len(lines):
+            line = lines[i]
+            if not line.strip() or line.lstrip().startswith("#"):
+                i += 1
+                continue
+            indent = _indent(line)
+            if indent <= section_indent and not (indent == section_indent and line.lstrip().startswith("- ")):
+                break
+            if task_indent is None and line.lstrip().startswith("- "):
+                task_indent = indent
+            if indent == task_indent and line.lstrip().startswith("- "):
+                number += 1
+                spans.append({"play": None if program else max(play, 1), "section": section, "task": number,
+                              "indent": task_indent, "start": i, "end": i + 1})
+            elif spans and number:
+                spans[-1]["end"] = i + 1
+            i += 1
+    return spans
+
+
+def span_location(span):
+    """
+    Returns the location of a span in the format validator errors use.
+    """
+    if span["play"] is None:
+        return f"{span['section']} task {span['task']}"
+    return f"play {span['play']} {span['section']} task {span['task']}"
+
+
+def failing_spans(content, error):
+    """
+    Returns the spans of the tasks referenced by an Ansible or validator error message.
+    Returns an empty list when the error cannot be attributed to specific tasks.
+    """
+    spans = task_spans(content)
+    found = []
+
+    for play, section, task in VALIDATOR_LOCATION_RE.findall(error):
+        for span in spans:
+            if (span["play"], span["section"], span["task"]) == (int(play), section, int(task)):
+                found.append(span)
+
+    for line, _ in ANSIBLE_LOCATION_RE.findall(error):
+        index = int(line) - 1
+        for span in spans:
+            if span["start"] <= index < span["end"]:
+                found.append(span)
+
+    unique = {span["start"]: span for span in found}
+    return [unique[start] for start in sorted(unique)]
+
+
+def task_fragment(content, span):
+    """
+    Returns the text of one task with its list indentation removed.
+    """
+    lines = content.splitlines()[span["start"]:span["end"]]
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return "\n".join(line[span["indent"]:] for line in lines) + "\n"
+
+
+def build_task_repair_prompt(os_name, fragment, error):
+    return (
+        f"Fix the following Ansible task from a playbook for {os_name} based on this error: {error}\n"
+        f"Task:\n{fragment}\n"
+        f"Return only the corrected task as a YAML list item. Keep 'ignore_errors: true' on program installation tasks. "
+        f"Do not include anything but the YAML and no text before or after answering this prompt and get rid of ''' before and after"
+    )
+
+
+def parse_fixed_tasks(response):
+    """
+    Parses the model's answer into a list of tasks, or returns None if it is unusable.
+    """
+    if not response:
+        return None
+    yaml = load_yaml()
+    try:
+        tasks = yaml.safe_load(strip_fences(response))
+    except yaml.YAMLError:
+        return None
+    if isinstance(tasks, dict):
+        tasks = [tasks]
+    if not isinstance(tasks, list) or not tasks:
+        return None
+
+    errors = []
+    check_tasks(tasks, "fixed", errors)
+    return None if errors else tasks
+
+
+def splice_tasks(content, span, tasks):
+    """
+    Replaces the lines of one task with the given tasks, indented to match.
+    """
+    rendered = load_yaml().safe_dump(tasks, default_flow_style=False, sort_keys=False)
+    prefix = " " * span["indent"]
+    new_lines = [prefix + line if line else line for line in rendered.splitlines()]
+
+    lines = content.splitlines()
+    end = span["end"]
+    # Keep blank lines that separated the task from the next one.
+    while end > span["start"] and not lines[end - 1].strip():
+        end -= 1
+    return "\n".join(lines[:span["start"]] + new_lines + lines[end:]) + "\n"
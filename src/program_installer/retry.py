@@ -0,0 +1,165 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Error categories returned by classify_error().
+RATE_LIMIT = "rate_limit"
+TIMEOUT = "timeout"
+SERVER_ERROR = "server_error"
+NON_RETRYABLE = "non_retryable"
+UNKNOWN = "unknown"
+
+# 4xx responses that can succeed on a later attempt.
+RETRYABLE_CLIENT_STATUSES = {408, 409, 429}
+
+
+def _status_code(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def classify_error(error):
+    """
+    Sorts an exception raised by the API client into one of the error categories.
+    Works on duck-typed attributes so that the openai package is not required.
+    """
+    status = _status_code(error)
+    name = type(error).__name__
+
+    if status == 429 or name == "RateLimitError":
+        return RATE_LIMIT
+    if status == 408 or isinstance(error, TimeoutError) or "Timeout" in name:
+        return TIMEOUT
+    if isinstance(error, ConnectionError) or name == "APIConnectionError":
+        return TIMEOUT
+    if status is not None and status >= 500:
+        return SERVER_ERROR
+    if status is not None and 400 <= status < 500 and status not in RETRYABLE_CLIENT_STATUSES:
+        return NON_RETRYABLE
+    return UNKNOWN
+
+
+def retry_after_seconds(error):
+    """
+    Returns the delay requested by the server through Retry-After, or None.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    try:
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms is not None:
+            return max(0.0, float(retry_after_ms) / 1000)
+
+        retry_after = headers.get("retry-after")
+        if retry_after is None:
+            return None
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            retry_at = parsedate_to_datetime(retry_after)
+            return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with jitter that honors Retry-After and never retries
+    errors that cannot succeed.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=7, multiplier=2, max_delay=60, jitter=0.5):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def should_retry(self, category):
+        return category != NON_RETRYABLE
+
+    def delay(self, attempt, error=None):
+        """
+        Returns the seconds to wait after the given zero-based attempt failed.
+        """
+        retry_after = retry_after_seconds(error) if error is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+
+        backoff = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        # Spread retries from many machines so they do not hit the API in lockstep.
+        return backoff * (1 - self.jitter * random.random())
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a model after repeated failures. Once reset_timeout has
+    passed a single trial request is let through; its outcome closes or reopens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_timeout=60, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self, trip=False):
+        with self._lock:
+            self.failures += 1
+            if trip or self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+    @property
+    def is_open(self):
+        return self.state == self.OPEN
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(model):
+    """
+    Returns the process-wide circuit breaker for a model.
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker()
+        return breaker
+
+
+def reset_circuit_breakers():
+    with _breakers_lock:
+        _breakers.clear()
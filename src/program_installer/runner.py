@@ -0,0 +1,116 @@
+import codecs
+import collections
+import os
+import subprocess
+import sys
+import threading
+
+from .profiling import subprocess_span
+
+DEFAULT_TAIL_LINES = 200
+READ_SIZE = 4096
+
+
+def stdout_sink(line):
+    """
+    Writes a line to the current sys.stdout, which is the GUI console when the GUI runs.
+    """
+    sys.stdout.write(line)
+    sys.stdout.flush()
+
+
+class FileSink:
+    """
+    Appends every line to a log file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def __call__(self, line):
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+# Sinks used when run_streaming() is not given any.
+DEFAULT_SINKS = [stdout_sink]
+
+
+def add_default_sink(sink):
+    DEFAULT_SINKS.append(sink)
+
+
+class RunResult:
+    def __init__(self, command, returncode, output):
+        self.command = command
+        self.returncode = returncode
+        # The last lines of the output only; everything else went to the sinks.
+        self.output = output
+
+
+def _pump(stream, sinks, tail):
+    """
+    Reads whatever the process has written so far and hands complete lines to the sinks.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    fd = stream.fileno()
+    while True:
+        chunk = os.read(fd, READ_SIZE)
+        text = decoder.decode(chunk, final=not chunk)
+        pending += text
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            _emit(line + "\n", sinks, tail)
+        if not chunk:
+            break
+    if pending:
+        _emit(pending + "\n", sinks, tail)
+    stream.close()
+
+
+def _emit(line, sinks, tail):
+    tail.append(line)
+    for sink in sinks:
+        try:
+            sink(line)
+        except Exception:
+            # A broken sink must not stall the child process on a full pipe.
+            pass
+
+
+def run_streaming(command, sinks=None, timeout=None, check=True, tail_lines=DEFAULT_TAIL_LINES, **popen_kwargs):
+    """
+    Runs a command with stdout and stderr merged and passes its output to the sinks
+    line by line while it runs. Only the last tail_lines lines are kept in memory.
+    Raises subprocess.TimeoutExpired (after killing the process) if it runs longer than
+    timeout seconds, and subprocess.CalledProcessError, with the tail as output, if it
+    fails and check is true. Returns a RunResult.
+    """
+    sinks = DEFAULT_SINKS if sinks is None else sinks
+    tail = collections.deque(maxlen=tail_lines)
+    with subprocess_span(command):
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **popen_kwargs)
+        reader = threading.Thread(target=_pump, args=(process.stdout, sinks, tail), daemon=True)
+        reader.start()
+        try:
+            returncode = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            # Grandchildren may still hold the pipe open; do not wait for them.
+            reader.join(timeout=1)
+            raise subprocess.TimeoutExpired(command, timeout, output="".join(tail).encode("utf-8"))
+        reader.join()
+
+    output = "".join(tail)
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command, output=output.encode("utf-8"))
+    return RunResult(command, returncode, output)
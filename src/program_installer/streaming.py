@@ -0,0 +1,110 @@
+import sys
+
+from .repair import span_location, task_fragment, task_spans
+from .validator import check_task, load_yaml
+
+
+class StreamAborted(Exception):
+    """
+    Raised when a streamed playbook contains a task that is clearly broken.
+    """
+
+    def __init__(self, errors):
+        super().__init__("Generation aborted: " + "; ".join(errors))
+        self.errors = errors
+
+
+def check_fragment(fragment, span):
+    """
+    Returns the problems found in one complete task.
+    """
+    location = span_location(span)
+    yaml = load_yaml()
+    try:
+        tasks = yaml.safe_load(fragment)
+    except yaml.YAMLError as e:
+        return [f"{location}: invalid YAML: {e}"]
+    if not isinstance(tasks, list) or len(tasks) != 1:
+        return [f"{location}: task must be a single list item."]
+
+    errors = []
+    check_task(tasks[0], location, errors)
+    return errors
+
+
+class ProgressiveValidator:
+    """
+    Validates each task of a playbook or fragments answer as soon as the following
+    task starts, so a broken generation can be stopped before the model finishes.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.checked = 0
+
+    def _check(self, text, final):
+        spans = task_spans(text)
+        # The last task may still be growing until the next one starts.
+        complete = len(spans) if final else len(spans) - 1
+        errors = []
+        for span in spans[self.checked:complete]:
+            errors.extend(check_fragment(task_fragment(text, span), span))
+        self.checked = max(self.checked, complete)
+        return errors
+
+    def feed(self, chunk):
+        self.text += chunk
+        if "\n" not in chunk:
+            return []
+        return self._check(self.text[:self.text.rfind("\n") + 1], final=False)
+
+    def finish(self):
+        return self._check(self.text, final=True)
+
+
+def print_token(token):
+    sys.stdout.write(token)
+    sys.stdout.flush()
+
+
+def stream_completion(client, model, prompt, on_token=print_token, cancelled=None, timeout=None):
+    """
+    Requests a streamed completion, echoing tokens through on_token and validating
+    tasks as they complete. Raises StreamAborted on the first broken task.
+    Returns the full text, or None if the request was cancelled.
+    """
+    options = {} if timeout is None else {"timeout": timeout}
+    response = client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        stream=True,
+        **options
+    )
+    validator = ProgressiveValidator()
+    parts = []
+    try:
+        for chunk in response:
+            if cancelled is not None and cancelled.is_set():
+                return None
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if not token:
+                continue
+            parts.append(token)
+            if on_token:
+                on_token(token)
+            errors = validator.feed(token)
+            if errors:
+                raise StreamAborted(errors)
+
+        errors = validator.finish()
+        if errors:
+            raise StreamAborted(errors)
+    finally:
+        if on_token and parts:
+            on_token("\n")
+        close = getattr(response, "close", None)
+        if close:
+            close()
+    return "".join(parts)
@@ -0,0 +1,176 @@
+import re
+
+
+# Modules our templates and generated playbooks are expected to use.
+ALLOWED_MODULES = {
+    "apt", "apt_key", "apt_repository", "assert", "command", "copy", "debug", "dnf", "fail",
+    "file", "flatpak", "get_url", "git", "group", "homebrew", "homebrew_cask", "homebrew_tap",
+    "import_tasks", "include_tasks", "lineinfile", "npm", "package", "pacman", "pip", "raw",
+    "rpm_key", "service", "set_fact", "shell", "snap", "stat", "systemd", "template",
+    "unarchive", "user", "yum", "yum_repository",
+}
+
+# Modules that install packages; their tasks must tolerate already-installed programs.
+PACKAGE_MODULES = {
+    "apt", "dnf", "flatpak", "homebrew", "homebrew_cask", "npm", "package", "pacman", "pip", "snap", "yum",
+}
+
+MODULE_PREFIXES = ("ansible.builtin.", "ansible.legacy.", "community.general.")
+
+PLAY_KEYS = {
+    "any_errors_fatal", "become", "become_method", "become_user", "check_mode", "collections",
+    "connection", "diff", "environment", "force_handlers", "gather_facts", "handlers", "hosts",
+    "ignore_errors", "max_fail_percentage", "module_defaults", "name", "order", "post_tasks",
+    "pre_tasks", "remote_user", "roles", "serial", "strategy", "tags", "tasks", "vars", "vars_files",
+}
+
+TASK_KEYS = {
+    "always", "any_errors_fatal", "args", "async", "become", "become_method", "become_user",
+    "block", "changed_when", "check_mode", "collections", "debugger", "delay", "delegate_to",
+    "diff", "environment", "failed_when", "ignore_errors", "listen", "loop", "loop_control",
+    "module_defaults", "name", "no_log", "notify", "poll", "register", "rescue", "retries",
+    "run_once", "tags", "throttle", "timeout", "until", "vars", "when", "with_dict", "with_items",
+    "with_list",
+}
+
+FENCE_RE = re.compile(r"^\s*(```|''')")
+
+
+def module_name(key):
+    for prefix in MODULE_PREFIXES:
+        if key.startswith(prefix):
+            return key[len(prefix):]
+    return key
+
+
+def strip_fences(content):
+    """
+    Removes Markdown code fences and any prose before or after them.
+    """
+    lines = content.strip().splitlines()
+    fence_lines = [i for i, line in enumerate(lines) if FENCE_RE.match(line)]
+    if len(fence_lines) >= 2:
+        lines = lines[fence_lines[0] + 1:fence_lines[-1]]
+    else:
+        lines = [line for line in lines if not FENCE_RE.match(line)]
+    return "\n".join(lines).strip() + "\n"
+
+
+def task_module(task):
+    """
+    Returns the module key of a task, or None if it has none or more than one.
+    """
+    modules = [key for key in task if key not in TASK_KEYS]
+    return modules[0] if len(modules) == 1 else None
+
+
+def check_task(task, location, errors):
+    """
+    Validates one task in place. Returns True if the task was repaired.
+    """
+    if not isinstance(task, dict):
+        errors.append(f"{location}: task must be a mapping.")
+        return False
+
+    label = f"{location} ({task['name']})" if task.get("name") else location
+    if "block" in task:
+        repaired = False
+        for section in ("block", "rescue", "always"):
+            repaired = check_tasks(task.get(section) or [], f"{label} {section}", errors) or repaired
+        return repaired
+
+    modules = [key for key in task if key not in TASK_KEYS]
+    if not modules:
+        errors.append(f"{label}: no module specified.")
+        return False
+    if len(modules) > 1:
+        errors.append(f"{label}: conflicting modules {', '.join(modules)}.")
+        return False
+
+    module = module_name(modules[0])
+    if module not in ALLOWED_MODULES:
+        errors.append(f"{label}: unknown module '{modules[0]}'.")
+        return False
+
+    if module in PACKAGE_MODULES and task.get("ignore_errors") is not True:
+        task["ignore_errors"] = True
+        return True
+    return False
+
+
+def check_tasks(tasks, location, errors):
+    if not isinstance(tasks, list):
+        errors.append(f"{location}: tasks must be a list.")
+        return False
+    repaired = False
+    for index, task in enumerate(tasks):
+        repaired = check_task(task, f"{location} task {index + 1}", errors) or repaired
+    return repaired
+
+
+def check_play(play, index, errors):
+    """
+    Validates one play, returning (play, repaired). Missing hosts default to localhost.
+    """
+    location = f"play {index + 1}"
+    if not isinstance(play, dict):
+        errors.append(f"{location}: play must be a mapping.")
+        return play, False
+
+    repaired = False
+    if "hosts" not in play:
+        play = dict([("hosts", "localhost"), ("connection", "local")] + list(play.items()))
+        repaired = True
+
+    unknown_keys = [key for key in play if key not in PLAY_KEYS]
+    if unknown_keys:
+        errors.append(f"{location}: unknown play keys {', '.join(unknown_keys)}.")
+
+    for section in ("pre_tasks", "tasks", "post_tasks", "handlers"):
+        if section in play:
+            repaired = check_tasks(play[section] or [], f"{location} {section}", errors) or repaired
+    return play, repaired
+
+
+def load_yaml():
+    """
+    Returns the PyYAML module. It is imported on first use rather than with this module,
+    so that bootstrap_dependencies() can still install it before any YAML is parsed.
+    """
+    import yaml
+    return yaml
+
+
+def dump_playbook(plays):
+    return "---\n" + load_yaml().safe_dump(plays, default_flow_style=False, sort_keys=False)
+
+
+def validate_playbook(content):
+    """
+    Checks a playbook without starting Ansible and repairs defects that have an obvious fix:
+    code fences, a missing `hosts` and missing `ignore_errors: true` on install tasks.
+    Returns (content, errors); content is the repaired playbook and errors lists the
+    problems that could not be repaired.
+    """
+    if not content or not content.strip():
+        return content, ["Playbook is empty."]
+
+    content = strip_fences(content)
+    yaml = load_yaml()
+    try:
+        plays = yaml.safe_load(content)
+    except yaml.YAMLError as e:
+        return content, [f"Invalid YAML: {e}"]
+
+    if not isinstance(plays, list) or not plays:
+        return content, ["Playbook must be a non-empty list of plays."]
+
+    errors = []
+    repaired = False
+    for index, play in enumerate(plays):
+        plays[index], play_repaired = check_play(play, index, errors)
+        repaired = repaired or play_repaired
+
+    if repaired and not errors:
+        content = dump_playbook(plays)
+    return content, errors
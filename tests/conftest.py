@@ -8,3 +8,62 @@ ROOT = Path(__file__).resolve().parents[1]
 SRC = ROOT / "src"
 if str(SRC) not in sys.path:
     sys.path.insert(0, str(SRC))
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path, monkeypatch):
+    """
+    Keeps on-disk caches written during a test out of the user's home directory.
+    """
+    cache_path = tmp_path / "aes-cm-cache"
+    monkeypatch.setenv("AES_CM_CACHE_DIR", str(cache_path))
+    return cache_path
+
+
+@pytest.fixture(autouse=True)
+def reset_circuit_breakers():
+    """
+    Circuit breakers persist for the whole process; start every test with closed circuits.
+    """
+    from program_installer import retry
+
+    retry.reset_circuit_breakers()
+    yield
+    retry.reset_circuit_breakers()
+
+
+@pytest.fixture(autouse=True)
+def reset_environment_facts():
+    """
+    Environment facts are loaded once per process; start every test without them.
+    """
+    from program_installer import environment
+
+    environment.reset_environment_facts()
+    yield
+    environment.reset_environment_facts()
+
+
+@pytest.fixture(autouse=True)
+def reset_profiler():
+    """
+    The profiler is process-wide; make sure a test that enables it does not leak spans.
+    """
+    from program_installer.profiling import profiler
+
+    yield
+    profiler.disable()
+    profiler.events = []
+
+
+@pytest.fixture(autouse=True)
+def no_package_name_lookups(monkeypatch):
+    """
+    Listing every available package is slow and depends on the host; tests opt in
+    by setting NAME_COMMANDS themselves.
+    """
+    from program_installer import names
+
+    monkeypatch.setattr(names, "NAME_COMMANDS", {})
@@ -0,0 +1,20 @@
+"""
+Fixtures shared by the tests that fake playbook generation.
+"""
+from unittest.mock import MagicMock
+
+GENERATED_PLAYBOOK = """---
+- hosts: localhost
+  tasks:
+    - name: Install vim
+      homebrew:
+        name: vim
+        state: present
+      ignore_errors: true
+"""
+
+
+def completion(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    return response
@@ -0,0 +1,102 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from program_installer import batch, main
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_waits_for_refill():
+    """
+    Test that a burst up to the capacity passes and further requests wait for the refill.
+    """
+    clock = FakeClock()
+    bucket = batch.TokenBucket(60, clock=clock, sleep=clock.sleep)
+
+    for _ in range(60):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+    bucket.acquire()
+    assert clock.sleeps == [1.0]
+
+    # Requests larger than the bucket wait for a full bucket instead of forever.
+    bucket.acquire(1000)
+    assert clock.now == 61.0
+
+
+def test_rate_limited_client_corrects_estimate_from_usage():
+    """
+    Test that every completion waits for the limiter and reported usage replaces the estimate.
+    """
+    clock = FakeClock()
+    limiter = batch.RateLimiter(requests_per_minute=10, tokens_per_minute=1000, clock=clock, sleep=clock.sleep)
+    client = MagicMock()
+    client.chat.completions.create.return_value.usage.total_tokens = 50
+    limited = batch.RateLimitedClient(client, limiter, expected_output_tokens=200)
+
+    limited.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "x" * 400}])
+
+    client.chat.completions.create.assert_called_once()
+    assert limiter.requests.tokens == 9
+    assert limiter.tokens.tokens == 950
+
+
+def test_dedup_requests():
+    """
+    Test that profiles asking for the same playbook are grouped and invalid ones are reported.
+    """
+    profiles = [
+        {"name": "web 1", "os": "linux", "package_manager": "apt", "programs": ["vim", "git"]},
+        {"name": "web2", "os": "Linux", "package_manager": "apt", "programs": "git, vim"},
+        {"name": "mac", "os": "darwin", "list": "basic"},
+        {"name": "phone", "os": "android", "programs": ["vim"]},
+    ]
+    requests, errors = batch.dedup_requests(profiles, {"a": main.BASIC_PROGRAMS, "b": main.DEVELOPER_PROGRAMS})
+
+    assert requests[("linux", "apt", ("git", "vim"))]["names"] == ["web-1", "web2"]
+    assert requests[("darwin", None, tuple(sorted(main.BASIC_PROGRAMS["darwin"])))]["choice"] == "a"
+    assert errors == {"phone": "unsupported os 'android'"}
+
+
+def test_run_batch_generates_each_request_once(tmp_path):
+    """
+    Test that duplicate profiles share one generation, failures leave no playbook behind,
+    and all requests go through the rate-limited client.
+    """
+    profiles = tmp_path / "profiles.json"
+    profiles.write_text(json.dumps([
+        {"name": "web1", "os": "linux", "package_manager": "apt", "programs": ["htop"]},
+        {"name": "web2", "os": "linux", "package_manager": "apt", "programs": ["htop"]},
+        {"name": "broken", "os": "linux", "package_manager": "apt", "programs": ["nothing"]},
+    ]))
+    output_dir = tmp_path / "out"
+
+    def fake_prepare(programs, os_name, pm, client, choice, playbook_file, use_cache):
+        assert isinstance(client, batch.RateLimitedClient)
+        with open(playbook_file, "w") as f:
+            f.write("partial")
+        return None if programs == ["nothing"] else f"playbook for {programs[0]}\n"
+
+    with patch('program_installer.main.prepare_playbook', side_effect=fake_prepare) as mock_prepare:
+        results = main.run_batch(str(profiles), str(output_dir), MagicMock(), workers=2)
+
+    assert mock_prepare.call_count == 2
+    assert results == {
+        "web1": str(output_dir / "web1.yml"),
+        "web2": str(output_dir / "web2.yml"),
+        "broken": None,
+    }
+    assert (output_dir / "web2.yml").read_text() == "playbook for htop\n"
+    assert sorted(p.name for p in output_dir.iterdir()) == ["web1.yml", "web2.yml"]
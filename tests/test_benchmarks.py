@@ -0,0 +1,37 @@
+import importlib.util
+import json
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_bench():
+    spec = importlib.util.spec_from_file_location("bench", os.path.join(ROOT, "benchmarks", "bench.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_benchmark_scenarios_run_offline():
+    """
+    Test that every benchmark scenario completes against the fakes and matches the committed baseline counts.
+    """
+    bench = load_bench()
+    report = bench.run_all()
+    scenarios = report["scenarios"]
+
+    assert set(scenarios) == set(bench.SCENARIOS)
+    # The catalog covers the built-in lists: apt and snap install them without a playbook.
+    for name in ("basic", "developer"):
+        assert scenarios[name]["llm_calls"] == 0
+        assert not scenarios[name]["playbook_ran"]
+    # Every custom program is offered by apt, so no playbook is needed at all.
+    assert scenarios["custom"]["llm_calls"] == 0
+    assert not scenarios["custom"]["playbook_ran"]
+    # The broken task is repaired on its own, so the playbook is checked twice, then once more optimized.
+    assert scenarios["repair-loop"]["llm_calls"] == 2
+    assert scenarios["repair-loop"]["commands"].count("ansible-playbook ansible_playbook.yml --syntax-check -v") == 3
+
+    with open(os.path.join(ROOT, "benchmarks", "baseline.json")) as f:
+        baseline = json.load(f)
+    assert [line for line in bench.compare(baseline, report) if "wall_time" not in line] == []
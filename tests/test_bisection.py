@@ -0,0 +1,95 @@
+import subprocess
+from unittest.mock import patch
+
+from program_installer import main
+from program_installer.bisection import install_bisecting, named_failures
+
+
+def fake_manager(bad, named=False, prefix=3):
+    """
+    Returns a run() that fails any batch containing a bad package, and the list of
+    batches it was given. The first prefix words of a command are not packages.
+    With named=True the error names the bad packages like apt does.
+    """
+    batches = []
+
+    def run(command):
+        batch = command[prefix:]
+        batches.append(batch)
+        broken = [p for p in batch if p in bad]
+        if broken:
+            if named:
+                output = "".join(f"E: Unable to locate package {p}\n" for p in broken)
+            else:
+                output = "Reading package lists...\nE: Sub-process /usr/bin/dpkg returned an error code (1)\n"
+            raise subprocess.CalledProcessError(100, command, output=output.encode())
+
+    return run, batches
+
+
+def apt_install(batch):
+    return ["apt", "install", "-y"] + batch
+
+
+def test_single_bad_package_is_isolated_by_bisection():
+    """
+    Test that one bad package among many is found by bisection and everything else is installed.
+    """
+    packages = [f"pkg{i}" for i in range(16)]
+    run, batches = fake_manager({"pkg11"})
+
+    installed, failed = install_bisecting(apt_install, packages, run=run)
+
+    assert installed == [p for p in packages if p != "pkg11"]
+    assert list(failed) == ["pkg11"]
+    assert "dpkg returned an error code" in failed["pkg11"]
+    # One full run, then two halves per level of a 16-package list.
+    assert len(batches) == 1 + 2 * 4
+
+
+def test_named_failures_are_dropped_without_bisecting():
+    """
+    Test that packages named in the error are set aside at once and the rest is retried.
+    """
+    run, batches = fake_manager({"vscode", "chrome"}, named=True)
+
+    installed, failed = install_bisecting(apt_install, ["git", "vscode", "vim", "chrome"], run=run)
+
+    assert installed == ["git", "vim"]
+    assert failed == {
+        "vscode": "E: Unable to locate package vscode",
+        "chrome": "E: Unable to locate package chrome",
+    }
+    assert batches == [["git", "vscode", "vim", "chrome"], ["git", "vim"]]
+
+
+def test_named_failures_patterns():
+    """
+    Test that the failure patterns of each package manager pick out the named packages.
+    """
+    output = ('No match for argument: nope\n'
+              'error: target not found: gone\n'
+              'Error: No available formula with the name "missing"\n'
+              'E: Unable to locate package unrelated\n')
+    assert named_failures(output, ["nope", "gone", "missing", "git"]) == {
+        "nope": "No match for argument: nope",
+        "gone": "error: target not found: gone",
+        "missing": 'Error: No available formula with the name "missing"',
+    }
+
+
+@patch('program_installer.main.run_streaming')
+def test_install_reports_failed_programs(mock_run_streaming, capsys):
+    """
+    Test that the native install prints the programs it could not install with their errors.
+    """
+    run, batches = fake_manager({"bad"}, named=True, prefix=2)
+    mock_run_streaming.side_effect = run
+
+    failed = main.install_with_package_manager("darwin", None, ["git", "bad"])
+
+    assert list(failed) == ["bad"]
+    assert mock_run_streaming.call_args.args[0] == ["brew", "install", "git"]
+    out = capsys.readouterr().out
+    assert "Installed 1 of 2 programs" in out
+    assert "Unable to locate package bad" in out
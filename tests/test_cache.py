@@ -0,0 +1,134 @@
+import os
+import subprocess
+import time
+from unittest.mock import MagicMock, patch, mock_open
+
+from program_installer import cache, main
+
+from helpers import GENERATED_PLAYBOOK
+
+
+def test_playbook_cache_key_normalizes_program_order():
+    """
+    Test that the cache key ignores program order, case and surrounding whitespace.
+    """
+    key_a = cache.playbook_cache_key("darwin", ["git", "VLC "], "template", 1, ["m"])
+    key_b = cache.playbook_cache_key("darwin", ["vlc", "git"], "template", 1, ["m"])
+    assert key_a == key_b
+
+
+def test_playbook_cache_key_changes_with_inputs():
+    """
+    Test that the OS, template, prompt version and model all affect the cache key.
+    """
+    base = cache.playbook_cache_key("darwin", ["git"], "template", 1, ["m"])
+    assert base != cache.playbook_cache_key("linux", ["git"], "template", 1, ["m"])
+    assert base != cache.playbook_cache_key("darwin", ["git"], "other template", 1, ["m"])
+    assert base != cache.playbook_cache_key("darwin", ["git"], "template", 2, ["m"])
+    assert base != cache.playbook_cache_key("darwin", ["git"], "template", 1, ["n"])
+
+
+def test_disk_cache_round_trip(tmp_path):
+    """
+    Test that a stored entry is returned by a later lookup.
+    """
+    disk_cache = cache.DiskCache(str(tmp_path))
+    assert disk_cache.get("key") is None
+    disk_cache.put("key", "playbook")
+    assert disk_cache.get("key") == "playbook"
+
+
+def test_disk_cache_expires_old_entries(tmp_path):
+    """
+    Test that entries older than max_age are treated as misses and removed.
+    """
+    disk_cache = cache.DiskCache(str(tmp_path), max_age=60)
+    disk_cache.put("key", "playbook")
+    path = os.path.join(str(tmp_path), "key.yml")
+    old = time.time() - 120
+    os.utime(path, (old, old))
+
+    assert disk_cache.get("key") is None
+    assert not os.path.exists(path)
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    """
+    Test that eviction drops the least recently used entry once max_entries is exceeded.
+    """
+    disk_cache = cache.DiskCache(str(tmp_path), max_entries=2)
+    disk_cache.put("first", "1")
+    disk_cache.put("second", "2")
+    old = time.time() - 100
+    os.utime(os.path.join(str(tmp_path), "first.yml"), (old, old))
+    os.utime(os.path.join(str(tmp_path), "second.yml"), (old + 10, old + 10))
+
+    # A hit refreshes "first", so "second" becomes the eviction candidate.
+    assert disk_cache.get("first") == "1"
+    disk_cache.put("third", "3")
+
+    assert disk_cache.get("second") is None
+    assert disk_cache.get("first") == "1"
+    assert disk_cache.get("third") == "3"
+
+
+def test_disk_cache_evicts_by_size(tmp_path):
+    """
+    Test that eviction keeps the total size of the cache under max_bytes.
+    """
+    disk_cache = cache.DiskCache(str(tmp_path), max_bytes=10)
+    disk_cache.put("first", "x" * 6)
+    old = time.time() - 100
+    os.utime(os.path.join(str(tmp_path), "first.yml"), (old, old))
+    disk_cache.put("second", "y" * 6)
+
+    assert disk_cache.get("first") is None
+    assert disk_cache.get("second") == "y" * 6
+
+
+def syntax_checks(mock_run_streaming):
+    return sum('--syntax-check' in c.args[0] for c in mock_run_streaming.call_args_list)
+
+
+@patch('program_installer.main.run_streaming')
+@patch('builtins.open', new_callable=mock_open)
+@patch('program_installer.main.command_exists', return_value=True)
+@patch('program_installer.main.missing_packages', side_effect=lambda manager, packages: list(packages))
+@patch('program_installer.main.generate_playbook', return_value=GENERATED_PLAYBOOK)
+def test_install_reuses_cached_playbook(
+    mock_generate_playbook, mock_missing_packages, mock_command_exists, mock_open_file, mock_run_streaming
+):
+    """
+    Test that a second identical run reuses the validated playbook without calling the API
+    or re-running the syntax check.
+    """
+    client = MagicMock()
+    main.install_programs_and_configure(["vim"], "darwin", client, "c")
+    assert mock_generate_playbook.call_count == 1
+    # The generated playbook and its optimized version are both checked and cached.
+    assert syntax_checks(mock_run_streaming) == 2
+    assert len(cache.playbook_cache().entries()) == 2
+
+    with patch.object(cache.DiskCache, 'get', return_value=GENERATED_PLAYBOOK):
+        main.install_programs_and_configure(["vim"], "darwin", client, "c")
+
+    assert mock_generate_playbook.call_count == 1
+    assert syntax_checks(mock_run_streaming) == 2
+    assert any(['ansible-playbook', 'ansible_playbook.yml', '-v'] in c.args for c in mock_run_streaming.call_args_list)
+
+
+
+@patch('program_installer.main.run_streaming',
+       side_effect=subprocess.CalledProcessError(1, 'cmd', output=b'syntax error'))
+@patch('builtins.open', new_callable=mock_open)
+@patch('program_installer.main.command_exists', return_value=True)
+@patch('program_installer.main.missing_packages', side_effect=lambda manager, packages: list(packages))
+@patch('program_installer.main.generate_playbook', return_value='broken_playbook_content')
+def test_install_does_not_cache_failed_playbook(
+    mock_generate_playbook, mock_missing_packages, mock_command_exists, mock_open_file, mock_run_streaming
+):
+    """
+    Test that playbooks which never pass the syntax check are not cached.
+    """
+    main.install_programs_and_configure(["vim"], "darwin", MagicMock(), "c")
+    assert cache.playbook_cache().entries() == []
@@ -0,0 +1,76 @@
+from unittest.mock import MagicMock, patch, mock_open
+
+import yaml
+
+from program_installer import catalog, main
+
+from helpers import GENERATED_PLAYBOOK
+
+
+def test_builtin_profiles_are_fully_cataloged():
+    """
+    Test that every program in the built-in profiles compiles without falling back to the API.
+    """
+    for os_name, package_manager in (("darwin", None), ("linux", "apt"), ("linux", "dnf"), ("linux", "pacman")):
+        for profile in (main.BASIC_PROGRAMS, main.DEVELOPER_PROGRAMS):
+            content, unknown = catalog.compile_playbook(os_name, profile[os_name], package_manager)
+            assert unknown == []
+            assert content is not None
+
+
+def test_compile_playbook_darwin_modules():
+    """
+    Test that formulae use the homebrew module and applications use homebrew_cask.
+    """
+    content, unknown = catalog.compile_playbook("darwin", ["git", "vlc"])
+    play = yaml.safe_load(content)[0]
+
+    assert unknown == []
+    assert play["hosts"] == "localhost"
+    assert play["tasks"][0]["homebrew"] == {"name": "git", "state": "present"}
+    assert play["tasks"][1]["homebrew_cask"] == {"name": "vlc", "state": "present"}
+    assert all(task["ignore_errors"] is True for task in play["tasks"])
+
+
+def test_compile_playbook_linux_uses_package_manager():
+    """
+    Test that Linux tasks use the detected package manager, fall back to snap and become root.
+    """
+    content, _ = catalog.compile_playbook("linux", ["docker.io", "slack"], "dnf")
+    tasks = yaml.safe_load(content)[0]["tasks"]
+
+    assert tasks[0]["dnf"] == {"name": "moby-engine", "state": "present"}
+    assert tasks[1]["snap"] == {"name": "slack", "state": "present", "classic": True}
+    assert all(task["become"] is True for task in tasks)
+
+
+def test_compile_playbook_reports_unknown_programs():
+    """
+    Test that programs missing from the catalog are returned for API generation.
+    """
+    content, unknown = catalog.compile_playbook("darwin", ["git", "vim"])
+    assert unknown == ["vim"]
+    assert "name: git" in content
+
+    content, unknown = catalog.compile_playbook("darwin", ["vim"])
+    assert content is None
+    assert unknown == ["vim"]
+
+
+@patch('program_installer.main.run_streaming')
+@patch('builtins.open', new_callable=mock_open)
+@patch('program_installer.main.generate_playbook', return_value=GENERATED_PLAYBOOK)
+@patch('program_installer.main.complete_prompt', return_value=None)
+def test_prepare_generates_only_unknown_programs(
+    mock_complete_prompt, mock_generate_playbook, mock_open_file, mock_run_streaming
+):
+    """
+    Test that only programs missing from the catalog are sent to the API, with the
+    compiled tasks as the template when the whole playbook has to be generated.
+    """
+    main.prepare_playbook(["code", "vim"], "linux", "apt", MagicMock(), "c", "ansible_playbook.yml")
+
+    compiled, _ = catalog.compile_playbook("linux", ["code"], "apt")
+    mock_generate_playbook.assert_called_once()
+    assert mock_generate_playbook.call_args[0][2] == ["vim"]
+    assert mock_generate_playbook.call_args[1]['template'] == compiled
@@ -0,0 +1,63 @@
+import threading
+
+from program_installer.console import ConsoleBuffer
+
+
+def test_drain_coalesces_writes():
+    """
+    Test that writes from several threads are delivered in one batch per drain.
+    """
+    console = ConsoleBuffer(max_lines=100)
+    threads = [threading.Thread(target=lambda: [console.write("line\n") for _ in range(10)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    batch = console.drain()
+    assert batch.text == "line\n" * 40
+    assert batch.trim_lines == 0
+    assert console.drain() is None
+
+
+def test_drain_trims_to_max_lines():
+    """
+    Test that the console keeps at most max_lines lines by trimming from the top.
+    """
+    console = ConsoleBuffer(max_lines=5)
+    console.write("a\nb\nc\n")
+    assert console.drain().trim_lines == 0
+
+    console.write("d\ne\nf\ng\n")
+    batch = console.drain()
+    assert batch.trim_lines == 2
+    assert console.lines == 5
+
+
+def test_large_batch_replaces_console():
+    """
+    Test that a batch longer than the console only keeps its tail and clears the rest.
+    """
+    console = ConsoleBuffer(max_lines=3)
+    console.write("old\n")
+    console.drain()
+
+    console.write("".join(f"{i}\n" for i in range(10)))
+    batch = console.drain()
+    assert batch.text == "7\n8\n9\n"
+    assert batch.trim_lines == 2
+    assert console.lines == 3
+
+
+def test_spill_file_keeps_full_log(tmp_path):
+    """
+    Test that the spill file receives everything, including output trimmed from the console.
+    """
+    log_file = tmp_path / "install.log"
+    console = ConsoleBuffer(max_lines=2, spill_path=str(log_file))
+    console.write("".join(f"{i}\n" for i in range(10)))
+    console.drain()
+    console.write("pending\n")
+    console.close()
+
+    assert log_file.read_text() == "".join(f"{i}\n" for i in range(10)) + "pending\n"
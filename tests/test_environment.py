@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+from unittest.mock import MagicMock, patch
+
+from program_installer import environment, main, validator
+
+
+def test_facts_are_cached_across_runs():
+    """
+    Test that a probe result is stored in the stamp file and reused by a later run.
+    """
+    probe = MagicMock(return_value="apt")
+    assert environment.EnvironmentFacts().get("package_manager", probe) == "apt"
+    assert environment.EnvironmentFacts().get("package_manager", probe) == "apt"
+    probe.assert_called_once()
+
+
+def test_negative_results_are_not_cached():
+    """
+    Test that a missing command is probed again, so a later install is noticed.
+    """
+    probe = MagicMock(return_value=False)
+    facts = environment.EnvironmentFacts()
+    facts.get("ansible-playbook", probe)
+    facts.get("ansible-playbook", probe)
+    assert probe.call_count == 2
+
+
+def test_facts_are_discarded_when_path_changes(monkeypatch):
+    """
+    Test that the stamp file is ignored once the PATH differs from the one it was probed with.
+    """
+    environment.EnvironmentFacts().set("pip", True)
+    monkeypatch.setenv("PATH", "/nonexistent")
+    assert environment.EnvironmentFacts().facts == {}
+    assert environment.environment_facts().facts == {}
+
+
+@patch('program_installer.main.install_package')
+@patch('program_installer.main.check_pip', return_value=True)
+def test_bootstrap_installs_only_missing_modules(mock_check_pip, mock_install_package):
+    """
+    Test that only packages whose modules cannot be imported are installed.
+    """
+    with patch('program_installer.main.module_available', side_effect=lambda name: name == "dotenv"):
+        main.bootstrap_dependencies()
+    assert [c.args[0] for c in mock_install_package.call_args_list] == ["openai", "PyYAML"]
+
+    mock_check_pip.reset_mock()
+    mock_install_package.reset_mock()
+    with patch('program_installer.main.module_available', return_value=True):
+        main.bootstrap_dependencies()
+    mock_check_pip.assert_not_called()
+    mock_install_package.assert_not_called()
+
+
+def test_yaml_is_imported_on_first_use():
+    """
+    Test that importing the tool does not need PyYAML, so bootstrap_dependencies() can still install it.
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+    script = "import sys; import program_installer.main; print('yaml' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
+
+    assert validator.validate_playbook("- hosts: localhost\n  tasks: []\n")[1] == []
+    assert "yaml" in sys.modules
+
+
+@patch('program_installer.main.OpenAI')
+def test_lazy_client_is_created_on_first_use(mock_openai):
+    """
+    Test that the OpenAI client is only constructed when the API is first used.
+    """
+    client = main.create_client("test_key")
+    mock_openai.assert_not_called()
+
+    client.chat.completions.create(model="gpt-4o-mini", messages=[])
+    client.chat.completions.create(model="gpt-4o-mini", messages=[])
+    mock_openai.assert_called_once_with(base_url=main.API_BASE_URL, api_key="test_key")
@@ -0,0 +1,141 @@
+from unittest.mock import patch
+
+from program_installer import fleet, main
+
+INVENTORY = """
+# Local-connection aliases stand in for real machines.
+[web_ubuntu]
+web1 ansible_connection=local
+web2 ansible_connection=local
+
+[db]
+db1 ansible_connection=local
+
+[db:vars]
+installer_os=linux
+installer_package_manager=dnf
+
+[printers]
+printer1
+"""
+
+RECAP_OUTPUT = """
+PLAY [web_ubuntu] **************************************************************
+
+PLAY RECAP *********************************************************************
+web1                       : ok=3    changed=1    unreachable=0    failed=0    skipped=0    rescued=0    ignored=0
+web2                       : ok=1    changed=0    unreachable=0    failed=1    skipped=0    rescued=0    ignored=0
+"""
+
+PLAYBOOK = """---
+- name: Setup Linux Development Environment
+  hosts: localhost
+  connection: local
+  gather_facts: false
+
+  tasks:
+    - name: Install git
+      apt:
+        name: git
+        state: present
+      become: true
+      ignore_errors: true
+"""
+
+
+def test_os_groups_from_vars_and_names():
+    """
+    Test that groups get their OS from group vars or, failing that, from their name.
+    """
+    groups = fleet.parse_ini_inventory(INVENTORY)
+
+    assert fleet.group_hosts(groups, "web_ubuntu") == ["web1", "web2"]
+    assert fleet.os_groups(groups) == {"web_ubuntu": ("linux", "apt"), "db": ("linux", "dnf")}
+
+
+def test_yaml_inventory_children():
+    """
+    Test that YAML inventories are read, including hosts of child groups.
+    """
+    groups = fleet.parse_yaml_inventory(
+        "all:\n  children:\n    macs:\n      hosts:\n        mini1:\n        mini2:\n"
+    )
+    assert fleet.group_hosts(groups, "all") == ["mini1", "mini2"]
+    assert fleet.os_groups(groups) == {"macs": ("darwin", None)}
+
+
+def test_fleet_playbook_targets_group():
+    """
+    Test that the local play is retargeted at the group and the connection is left to the inventory.
+    """
+    content = fleet.fleet_playbook(PLAYBOOK, "web_ubuntu")
+    assert "  hosts: web_ubuntu\n" in content
+    assert "connection" not in content
+    assert "ignore_errors: true" in content
+
+
+def test_parse_recap_and_summary(capsys):
+    """
+    Test that per-host results are read from the recap and failures are summarized.
+    """
+    recap = fleet.parse_recap(RECAP_OUTPUT)
+    assert recap["web1"]["changed"] == 1
+    assert recap["web2"]["failed"] == 1
+
+    failed = fleet.print_fleet_summary({"web_ubuntu": {"web1": recap["web1"], "web2": recap["web2"], "web3": None}})
+    assert failed == ["web2", "web3"]
+    assert "1 of 3 hosts succeeded." in capsys.readouterr().out
+
+
+@patch('program_installer.main.prepare_playbook', return_value=PLAYBOOK)
+def test_run_fleet_prepares_once_per_platform(mock_prepare, tmp_path, monkeypatch):
+    """
+    Test that groups sharing an OS and package manager reuse one playbook, and that
+    each group is run with its own limit and the requested forks.
+    """
+    monkeypatch.chdir(tmp_path)
+    inventory = tmp_path / "hosts.ini"
+    inventory.write_text("[ubuntu_web]\nweb1\nweb2\n\n[ubuntu_db]\ndb1\n")
+
+    def fake_run(command, sinks, check):
+        for line in RECAP_OUTPUT.splitlines(True):
+            for sink in sinks:
+                sink(line)
+
+    with patch('program_installer.main.run_streaming', side_effect=fake_run) as mock_run_streaming:
+        results = main.run_fleet(str(inventory), None, 'c', ['git'], forks=10)
+
+    mock_prepare.assert_called_once()
+    assert [c.args[0] for c in mock_run_streaming.call_args_list] == [
+        fleet.fleet_command("fleet_ubuntu_web.yml", str(inventory), "ubuntu_web", 10),
+        fleet.fleet_command("fleet_ubuntu_db.yml", str(inventory), "ubuntu_db", 10),
+    ]
+    assert "hosts: ubuntu_db" in (tmp_path / "fleet_ubuntu_db.yml").read_text()
+    assert results["ubuntu_web"]["web2"]["failed"] == 1
+    assert results["ubuntu_db"] == {"db1": None}
+
+
+@patch('program_installer.main.prepare_playbook', return_value=PLAYBOOK)
+def test_run_fleet_provisions_nested_groups_once(mock_prepare, tmp_path, monkeypatch, capsys):
+    """
+    Test that hosts of child OS groups are not provisioned again through their parent group.
+    """
+    monkeypatch.chdir(tmp_path)
+    inventory = tmp_path / "hosts.ini"
+    inventory.write_text("[ubuntu]\nweb1\n\n[fedora]\ndb1\n\n[linux:children]\nubuntu\nfedora\n\n"
+                         "[all_linux:children]\nlinux\n\n[all_linux]\nci1\n")
+    groups = fleet.load_inventory(str(inventory))
+    platforms = fleet.os_groups(groups)
+
+    assert platforms["linux"] == ("linux", None)
+    assert fleet.fleet_limit(groups, "linux", platforms) == ("linux:!ubuntu:!fedora", [])
+    assert fleet.fleet_limit(groups, "all_linux", platforms) == ("all_linux:!linux:!ubuntu:!fedora", ["ci1"])
+
+    with patch('program_installer.main.run_streaming') as mock_run_streaming:
+        results = main.run_fleet(str(inventory), None, 'c', ['git'])
+
+    assert [c.args[0][5] for c in mock_run_streaming.call_args_list] == [
+        "ubuntu", "fedora", "all_linux:!linux:!ubuntu:!fedora"
+    ]
+    assert results == {"ubuntu": {"web1": None}, "fedora": {"db1": None}, "all_linux": {"ci1": None}}
+    assert "Skipping group linux: its hosts are provisioned through its child groups." in capsys.readouterr().out
@@ -0,0 +1,116 @@
+from unittest.mock import MagicMock, patch
+
+import yaml
+
+from program_installer import fragments, main
+
+FRAGMENTS_ANSWER = """```yaml
+vim:
+  - name: Install vim
+    homebrew:
+      name: vim
+htop:
+  - name: Install htop
+    homebrew:
+      name: htop
+    ignore_errors: true
+```"""
+
+
+def test_parse_fragments():
+    """
+    Test that each program gets its validated tasks, with ignore_errors added where missing.
+    """
+    result = fragments.parse_fragments(FRAGMENTS_ANSWER, ["vim", "htop", "tmux"])
+
+    assert set(result) == {"vim", "htop"}
+    assert yaml.safe_load(result["vim"]) == [
+        {"name": "Install vim", "homebrew": {"name": "vim"}, "ignore_errors": True}
+    ]
+
+
+def test_parse_fragments_rejects_invalid_tasks():
+    """
+    Test that programs with invalid tasks and unusable answers are left out.
+    """
+    answer = "vim:\n  - name: Install vim\n    brew_install: vim\n"
+    assert fragments.parse_fragments(answer, ["vim"]) == {}
+    assert fragments.parse_fragments("not yaml: [", ["vim"]) == {}
+    assert fragments.parse_fragments(["not", "text"], ["vim"]) == {}
+
+
+def test_indent_fragment():
+    """
+    Test that fragments are indented for a play's tasks list.
+    """
+    assert fragments.indent_fragment("- name: a\n  debug: {}\n") == "    - name: a\n      debug: {}\n"
+
+
+@patch('program_installer.main.run_streaming')
+@patch('program_installer.main.generate_playbook')
+@patch('program_installer.main.complete_prompt')
+def test_prepare_playbook_generates_only_uncached_fragments(
+    mock_complete, mock_generate_playbook, mock_run_streaming, tmp_path
+):
+    """
+    Test that a new program added to a known list costs one small generation for that
+    program only, and that the composed playbook keeps catalog and cached tasks.
+    """
+    playbook_file = str(tmp_path / "ansible_playbook.yml")
+    mock_complete.return_value = FRAGMENTS_ANSWER
+
+    main.prepare_playbook(["git", "vim", "htop"], "darwin", None, MagicMock(), "c", playbook_file)
+    assert mock_complete.call_count == 1
+    # One syntax check for the composed playbook and one for its optimized version.
+    assert mock_run_streaming.call_count == 2
+
+    mock_complete.return_value = "tmux:\n  - name: Install tmux\n    homebrew:\n      name: tmux\n"
+    content = main.prepare_playbook(["git", "vim", "htop", "tmux"], "darwin", None, MagicMock(), "c", playbook_file)
+
+    prompt = mock_complete.call_args[0][1]
+    assert "tmux" in prompt and "vim" not in prompt and "htop" not in prompt
+    mock_generate_playbook.assert_not_called()
+
+    # The optimizer may merge neighbouring tasks into package lists; the order is kept.
+    tasks = yaml.safe_load(content)[0]["tasks"]
+    names = [t["homebrew"]["name"] for t in tasks if "loop" not in t]
+    assert [n for name in names for n in (name if isinstance(name, list) else [name])] == ["git", "vim", "htop", "tmux"]
+    with open(playbook_file) as f:
+        assert f.read() == content
+
+
+@patch('program_installer.main.run_streaming')
+@patch('program_installer.main.generate_playbook')
+@patch('program_installer.main.complete_prompt', return_value=FRAGMENTS_ANSWER)
+def test_prepare_playbook_checks_cached_fragments_before_caching(
+    mock_complete, mock_generate_playbook, mock_run_streaming, tmp_path
+):
+    """
+    Test that a playbook composed only from cached fragments is syntax-checked before it is
+    cached, and that the cached playbook is then reused without another check.
+    """
+    playbook_file = str(tmp_path / "ansible_playbook.yml")
+    main.prepare_playbook(["vim", "htop"], "darwin", None, MagicMock(), "c", playbook_file)
+    main.prepare_playbook(["vim"], "darwin", None, MagicMock(), "c", playbook_file)
+    assert mock_complete.call_count == 1
+    # Each playbook is checked once as composed and once optimized.
+    assert mock_run_streaming.call_count == 4
+
+    main.prepare_playbook(["vim"], "darwin", None, MagicMock(), "c", playbook_file)
+    assert mock_run_streaming.call_count == 4
+
+
+@patch('program_installer.main.run_streaming')
+@patch('program_installer.main.generate_playbook', return_value="- hosts: localhost\n  tasks: []\n")
+@patch('program_installer.main.complete_prompt', return_value="vim:\n  - name: Install vim\n    homebrew:\n      name: vim\n")
+def test_prepare_playbook_falls_back_when_fragment_missing(
+    mock_complete, mock_generate_playbook, mock_run_streaming, tmp_path
+):
+    """
+    Test that the whole playbook is generated when some programs are missing from the answer.
+    """
+    main.prepare_playbook(["vim", "htop"], "darwin", None, MagicMock(), "c", str(tmp_path / "playbook.yml"))
+
+    mock_generate_playbook.assert_called_once()
+    assert mock_generate_playbook.call_args[0][2] == ["vim", "htop"]
+    assert fragments.fragment_cache().entries() == []
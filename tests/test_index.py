@@ -0,0 +1,112 @@
+import os
+import subprocess
+import time
+from unittest.mock import MagicMock, patch
+
+from program_installer import index, main
+
+
+def fake_index(monkeypatch, tmp_path, manager, age):
+    """
+    Points the manager's index at a file in tmp_path that was modified age seconds ago.
+    """
+    stamp = tmp_path / "index"
+    stamp.write_text("")
+    modified = time.time() - age
+    os.utime(str(stamp), (modified, modified))
+    monkeypatch.setitem(index.INDEX_PATHS, manager, [str(tmp_path / "missing"), str(stamp)])
+
+
+def test_index_age_uses_newest_file(monkeypatch, tmp_path):
+    """
+    Test that the index age comes from the newest matching file, and is None without one.
+    """
+    old = tmp_path / "old.db"
+    new = tmp_path / "new.db"
+    for path, age in ((old, 3600), (new, 60)):
+        path.write_text("")
+        os.utime(str(path), (1000000 - age, 1000000 - age))
+    monkeypatch.setitem(index.INDEX_PATHS, "pacman", [str(tmp_path / "*.db")])
+
+    assert index.index_age("pacman", now=1000000) == 60
+    monkeypatch.setitem(index.INDEX_PATHS, "pacman", [str(tmp_path / "nothing-*")])
+    assert index.index_age("pacman") is None
+
+
+@patch('program_installer.index.run_streaming')
+def test_fresh_index_is_not_refreshed(mock_run_streaming, monkeypatch, tmp_path, capsys):
+    """
+    Test that a fresh index is only refreshed when forced.
+    """
+    fake_index(monkeypatch, tmp_path, "apt", 60)
+    assert index.refresh_index("apt", ttl=3600) is False
+    mock_run_streaming.assert_not_called()
+    assert "skipping refresh" in capsys.readouterr().out
+
+    assert index.refresh_index("apt", ttl=3600, force=True) is True
+    mock_run_streaming.assert_called_once_with(["sudo", "apt", "update"])
+
+
+@patch('program_installer.index.run_streaming')
+def test_stale_or_missing_index_is_refreshed(mock_run_streaming, monkeypatch, tmp_path):
+    """
+    Test that a stale or missing index is refreshed with a sync-only command.
+    """
+    fake_index(monkeypatch, tmp_path, "pacman", 7200)
+    assert index.refresh_index("pacman", ttl=3600) is True
+    # A sync-only refresh: no system upgrade.
+    mock_run_streaming.assert_called_once_with(["sudo", "pacman", "-Sy"])
+
+    monkeypatch.setitem(index.INDEX_PATHS, "dnf", [str(tmp_path / "missing")])
+    assert index.refresh_index("dnf") is True
+    assert mock_run_streaming.call_args.args[0] == ["sudo", "dnf", "makecache", "--refresh"]
+
+
+@patch('program_installer.index.run_streaming', side_effect=subprocess.CalledProcessError(100, 'apt'))
+def test_failed_refresh_is_reported(mock_run_streaming, monkeypatch, tmp_path, capsys):
+    """
+    Test that a failed refresh is reported instead of raised.
+    """
+    monkeypatch.setitem(index.INDEX_PATHS, "apt", [])
+    assert index.refresh_index("apt") is False
+    assert "Could not refresh the apt package index" in capsys.readouterr().out
+
+
+def test_install_commands_do_not_refresh_or_upgrade():
+    """
+    Test that install commands neither refresh the index again nor upgrade the system.
+    """
+    assert index.install_command("pacman", ["vim"]) == ["sudo", "pacman", "-S", "--needed", "--noconfirm", "vim"]
+    assert index.install_command("apt", ["vim"]) == ["sudo", "apt", "install", "-y", "vim"]
+    assert index.install_command("dnf", ["vim"]) == [
+        "sudo", "dnf", "install", "-y", "--setopt=metadata_expire=never", "vim"
+    ]
+
+
+@patch('program_installer.main.run_playbook')
+@patch('program_installer.main.prepare_playbook', return_value=None)
+@patch('program_installer.main.install_with_package_manager')
+@patch('program_installer.main.refresh_index')
+@patch('program_installer.main.missing_packages', side_effect=lambda manager, packages: list(packages))
+@patch('program_installer.main.detect_package_manager', return_value='apt')
+def test_install_refreshes_index_with_policy(
+    mock_detect, mock_missing, mock_refresh, mock_install, mock_prepare, mock_run_playbook
+):
+    """
+    Test that an install refreshes the index only when it is stale or a refresh is forced.
+    """
+    main.install_programs_and_configure(['git'], 'linux', MagicMock(), 'c', force_refresh=True, index_ttl=60)
+    mock_refresh.assert_called_once_with('apt', 60, force=True)
+    mock_install.assert_called_once_with('linux', 'apt', ['git'], 'apt')
+
+    # Programs left to the playbook need a fresh index as well.
+    mock_refresh.reset_mock()
+    main.install_programs_and_configure(['mystery'], 'linux', MagicMock(), 'c', force_refresh=True, index_ttl=60)
+    mock_refresh.assert_called_once_with('apt', 60, force=True)
+    mock_run_playbook.assert_not_called()
+
+    # A fresh index is left out of the plan altogether.
+    with patch('program_installer.main.index_is_fresh', return_value=True):
+        main.install_programs_and_configure(['git'], 'linux', MagicMock(), 'c', index_ttl=60)
+    assert mock_refresh.call_count == 1
+    assert mock_install.call_count == 2
@@ -0,0 +1,122 @@
+import subprocess
+from unittest.mock import MagicMock, patch, mock_open
+
+from program_installer import inventory, main
+
+from helpers import GENERATED_PLAYBOOK
+
+
+@patch('subprocess.check_output', return_value=b'git ii\nvlc rc\n')
+def test_missing_packages_apt(mock_check_output):
+    """
+    Test that dpkg-query is called once and only fully installed packages are skipped.
+    """
+    assert inventory.missing_packages("apt", ["git", "vlc", "gimp"]) == ["vlc", "gimp"]
+    mock_check_output.assert_called_once()
+    command = mock_check_output.call_args[0][0]
+    assert command[0] == "dpkg-query"
+    assert command[-3:] == ["git", "vlc", "gimp"]
+
+
+@patch('subprocess.check_output', side_effect=subprocess.CalledProcessError(
+    1, 'rpm', output=b'git ii\npackage gimp is not installed\n'))
+def test_missing_packages_rpm_partial(mock_check_output):
+    """
+    Test that the installed packages are still read when rpm exits non-zero.
+    """
+    assert inventory.missing_packages("dnf", ["git", "gimp"]) == ["gimp"]
+    assert mock_check_output.call_args[0][0][:2] == ["rpm", "-q"]
+
+
+@patch('subprocess.check_output', return_value=b'git 2.45.0\nvlc 3.0.21\n')
+def test_missing_packages_brew_all_installed(mock_check_output):
+    """
+    Test that brew list --versions output marks every listed package as installed.
+    """
+    assert inventory.missing_packages("brew", ["git", "vlc"]) == []
+    assert mock_check_output.call_args[0][0] == ["brew", "list", "--versions", "git", "vlc"]
+
+
+@patch('subprocess.check_output', side_effect=FileNotFoundError)
+def test_missing_packages_probe_unavailable(mock_check_output):
+    """
+    Test that every package is assumed missing when the query tool is unavailable.
+    """
+    assert inventory.missing_packages("pacman", ["git", "vlc"]) == ["git", "vlc"]
+
+
+def test_missing_packages_unknown_manager():
+    """
+    Test that managers without an inventory query return the list unchanged.
+    """
+    assert inventory.missing_packages("choco", ["git"]) == ["git"]
+
+
+@patch('program_installer.main.run_streaming')
+@patch('builtins.open', new_callable=mock_open)
+@patch('program_installer.main.command_exists', return_value=True)
+@patch('program_installer.main.missing_packages', return_value=[])
+@patch('program_installer.main.generate_playbook')
+def test_install_skips_everything_when_all_installed(
+    mock_generate_playbook, mock_missing_packages, mock_command_exists, mock_open_file, mock_run_streaming, capsys
+):
+    """
+    Test that nothing is installed or generated when every program is already present.
+    """
+    main.install_programs_and_configure(["git", "vim"], "darwin", MagicMock(), "c")
+
+    mock_missing_packages.assert_called_once_with("brew", ["git", "vim"])
+    mock_run_streaming.assert_not_called()
+    mock_generate_playbook.assert_not_called()
+    assert "All programs are already installed" in capsys.readouterr().out
+
+
+@patch('program_installer.main.run_streaming')
+@patch('builtins.open', new_callable=mock_open)
+@patch('program_installer.main.command_exists', return_value=True)
+@patch('program_installer.main.missing_packages', return_value=["vim"])
+@patch('program_installer.main.generate_playbook', return_value=GENERATED_PLAYBOOK)
+def test_install_covers_only_missing_programs(
+    mock_generate_playbook, mock_missing_packages, mock_command_exists, mock_open_file, mock_run_streaming
+):
+    """
+    Test that only missing programs are installed, each by exactly one backend.
+    """
+    main.install_programs_and_configure(["git", "vim"], "darwin", MagicMock(), "c")
+
+    # vim is not in the catalog and cannot be checked against Homebrew, so the playbook installs it.
+    assert not any(c.args[0][:2] == ['brew', 'install'] for c in mock_run_streaming.call_args_list)
+    assert mock_generate_playbook.call_args[0][2] == ["vim"]
+
+
+@patch('subprocess.check_output', return_value=b'Name    Version  Rev  Tracking       Publisher  Notes\n'
+                                                b'code    1.90     160  latest/stable  vscode     classic\n')
+def test_missing_packages_snap(mock_check_output):
+    """
+    Test that snap list marks installed snaps and its header line is ignored.
+    """
+    assert inventory.missing_packages("snap", ["code", "slack"]) == ["slack"]
+    assert mock_check_output.call_args[0][0] == ["snap", "list", "code", "slack"]
+
+
+def test_skip_installed_probes_backend_package_names():
+    """
+    Test that each backend is probed for the package it installs, so mapped names and snaps are detected.
+    """
+    installed = {"rpm": {"moby-engine"}, "snap": {"code"}}
+
+    def fake_missing(manager, packages):
+        probed.append((manager, packages))
+        return [p for p in packages if p not in installed.get("rpm" if manager == "dnf" else manager, set())]
+
+    probed = []
+    with patch('program_installer.main.missing_packages', side_effect=fake_missing):
+        groups, playbook = main.skip_installed(
+            {("dnf", 0): [("docker.io", "moby-engine"), ("htop", "htop")],
+             ("classic snap", 0): [("code", "code")]},
+            ["mystery"], "dnf"
+        )
+
+    assert groups == {("dnf", 0): [("htop", "htop")]}
+    assert playbook == ["mystery"]
+    assert probed == [("dnf", ["moby-engine", "htop", "mystery"]), ("snap", ["code"])]
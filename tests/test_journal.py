@@ -0,0 +1,112 @@
+import subprocess
+from unittest.mock import MagicMock, patch
+
+from program_installer import main
+from program_installer.journal import Journal, TaskRecorder, task_names
+
+PLAYBOOK = """---
+- hosts: localhost
+  tasks:
+    - name: Install mystery
+      apt:
+        name: mystery
+    - name: Configure mystery
+      command: mystery --setup
+"""
+
+FAILED_RUN = [
+    "PLAY [localhost] ***\n",
+    "TASK [Install mystery] ***\n",
+    "changed: [localhost]\n",
+    "TASK [Configure mystery] ***\n",
+    "fatal: [localhost]: FAILED! => {\"msg\": \"setup failed\"}\n",
+    "PLAY RECAP ***\n",
+]
+
+
+def test_journal_appends_and_ignores_cut_off_lines(tmp_path):
+    """
+    Test that the journal is read back without a cut-off last line and replaced by a new run.
+    """
+    path = str(tmp_path / "journal.jsonl")
+    journal = Journal(path)
+    journal.record("installed", backend="apt", programs=["git"])
+    journal.record("playbook", file="ansible_playbook.yml", hash="abc", programs=["vim"])
+    with open(path, "a") as f:
+        f.write('{"event": "installed", "programs": ["v')
+
+    resumed = Journal(path, resume=True)
+    assert resumed.installed_programs() == {"git"}
+    assert [e["hash"] for e in resumed.events("playbook")] == ["abc"]
+
+    # A new run starts an empty journal, but only replaces the file once it records something.
+    fresh = Journal(path)
+    assert fresh.installed_programs() == set()
+    assert Journal(path, resume=True).installed_programs() == {"git"}
+    fresh.record("installed", backend="apt", programs=["htop"])
+    assert Journal(path, resume=True).installed_programs() == {"htop"}
+
+
+def test_task_recorder_keeps_tasks_without_unignored_failures(tmp_path):
+    """
+    Test that only tasks without an unignored failure are journaled as finished.
+    """
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    recorder = TaskRecorder(journal, "abc")
+    lines = FAILED_RUN[:3] + [
+        "TASK [Install optional] ***\n",
+        "\x1b[0;31mfatal: [localhost]: FAILED! => {}\x1b[0m\n",
+        "...ignoring\n",
+    ] + FAILED_RUN[3:]
+    for line in lines:
+        recorder(line)
+
+    assert journal.finished_tasks("abc") == {"Install mystery", "Install optional"}
+    assert journal.finished_tasks("other") == set()
+    assert task_names(PLAYBOOK) == ["Install mystery", "Configure mystery"]
+    assert task_names("not: [valid") == []
+
+
+@patch('program_installer.main.install_with_package_manager', return_value={})
+@patch('program_installer.main.index_is_fresh', return_value=True)
+@patch('program_installer.main.missing_packages', side_effect=lambda manager, packages: list(packages))
+@patch('program_installer.main.detect_package_manager', return_value='apt')
+def test_resume_skips_finished_work(mock_detect, mock_missing, mock_fresh, mock_install, monkeypatch, tmp_path, capsys):
+    """
+    Test that a resumed run skips installed programs, reuses the playbook and starts at the first unfinished task.
+    """
+    monkeypatch.chdir(tmp_path)
+    commands = []
+
+    def fake_prepare(programs, os_name, pm, client, choice, playbook_file, *args):
+        with open(playbook_file, "w") as f:
+            f.write(PLAYBOOK)
+        return PLAYBOOK
+
+    def fake_run_streaming(command, sinks=None, **kwargs):
+        commands.append(command)
+        if len(commands) == 1:
+            for line in FAILED_RUN:
+                for sink in sinks:
+                    sink(line)
+            raise subprocess.CalledProcessError(2, command)
+
+    programs = ['git', 'mystery']
+    with patch('program_installer.main.prepare_playbook', side_effect=fake_prepare) as mock_prepare, \
+            patch('program_installer.main.run_streaming', side_effect=fake_run_streaming):
+        main.install_programs_and_configure(programs, 'linux', MagicMock(), 'c')
+        main.install_programs_and_configure(programs, 'linux', MagicMock(), 'c', resume=True)
+
+    assert mock_install.call_count == 1
+    assert mock_prepare.call_count == 1
+    assert commands[1] == ['ansible-playbook', 'ansible_playbook.yml', '-v', '--start-at-task', 'Configure mystery']
+    out = capsys.readouterr().out
+    assert "Skipping programs installed by the interrupted run: git" in out
+    assert "Reusing the playbook validated by the interrupted run." in out
+
+    # The playbook finished this time, so nothing is left to resume.
+    with patch('program_installer.main.run_streaming') as mock_run_streaming:
+        main.install_programs_and_configure(programs, 'linux', MagicMock(), 'c', resume=True)
+    mock_run_streaming.assert_not_called()
+    assert mock_install.call_count == 1
+    assert "All programs are already installed. Nothing to do." in capsys.readouterr().out
@@ -1,9 +1,14 @@
 import pytest
 from unittest.mock import patch, MagicMock, mock_open, call
-from program_installer import main
+from program_installer import main, catalog
+from program_installer.optimizer import optimize_playbook
 import sys
 import subprocess
 import os
+import threading
+import time
+
+from helpers import GENERATED_PLAYBOOK, completion
 
 @patch('subprocess.check_call')
 def test_check_pip_exists(mock_check_call):
@@ -168,8 +173,9 @@ def test_generate_playbook_with_error():
     assert "vim, git" in prompt
     assert "ignore_errors: true" in prompt
 
+@patch('random.random', return_value=0.0)
 @patch('time.sleep', return_value=None)
-def test_generate_playbook_fallback_succeeds(mock_sleep):
+def test_generate_playbook_fallback_succeeds(mock_sleep, mock_random):
     """
     Test that generate_playbook falls back to the second model and succeeds.
     """
@@ -190,11 +196,13 @@ def test_generate_playbook_fallback_succeeds(mock_sleep):
     result = main.generate_playbook(mock_client, "macOS", ["vim", "git"])
     assert result == "playbook_content"
     assert mock_client.chat.completions.create.call_count == 4
-    mock_sleep.assert_has_calls([call(7), call(12), call(17)])
-    assert mock_sleep.call_count == 3
+    # Exponential backoff, with no sleep after the last attempt of a model.
+    mock_sleep.assert_has_calls([call(7), call(14)])
+    assert mock_sleep.call_count == 2
 
+@patch('random.random', return_value=0.0)
 @patch('time.sleep', return_value=None)
-def test_generate_playbook_fallback_fails(mock_sleep):
+def test_generate_playbook_fallback_fails(mock_sleep, mock_random):
     """
     Test that generate_playbook returns None after all models and retries fail.
     """
@@ -209,10 +217,10 @@ def test_generate_playbook_fallback_fails(mock_sleep):
     assert result is None
     assert mock_client.chat.completions.create.call_count == 6
     mock_sleep.assert_has_calls([
-        call(7), call(12), call(17), # First model failures
-        call(7), call(12), call(17)  # Second model failures
+        call(7), call(14), # First model failures
+        call(7), call(14)  # Second model failures
     ])
-    assert mock_sleep.call_count == 6
+    assert mock_sleep.call_count == 4
 
 @patch('builtins.input', return_value='a')
 def test_get_program_list_basic(mock_input):
@@ -242,6 +250,7 @@ def test_get_program_list_custom(mock_input):
     assert programs == ['custom-prog1', 'custom-prog2']
 
 @patch('platform.system', return_value='darwin')
+@patch('program_installer.main.module_available', return_value=False)
 @patch('program_installer.main.check_pip', return_value=True)
 @patch('program_installer.main.install_pip')
 @patch('program_installer.main.install_package')
@@ -250,15 +259,15 @@ def test_get_program_list_custom(mock_input):
 @patch('builtins.input', side_effect=['c', 'vim, git'])
 @patch('program_installer.main.command_exists')
 @patch('program_installer.main.install_homebrew')
-@patch('subprocess.check_call')
-@patch('subprocess.check_output', return_value=b'Syntax check passed')
+@patch('program_installer.main.run_streaming')
 @patch('builtins.open', new_callable=mock_open)
 @patch('program_installer.main.advise_path_update')
-@patch('program_installer.main.generate_playbook', return_value='generated_playbook_content')
+@patch('program_installer.main.generate_playbook', return_value=GENERATED_PLAYBOOK)
 def test_main_macos(
-    mock_generate_playbook, mock_advise, mock_open_file, mock_check_output, mock_check_call,
+    mock_generate_playbook, mock_advise, mock_open_file, mock_run_streaming,
     mock_install_homebrew, mock_command_exists, mock_input, mock_openai,
-    mock_load_dotenv, mock_install_package, mock_install_pip, mock_check_pip, mock_system
+    mock_load_dotenv, mock_install_package, mock_install_pip, mock_check_pip, mock_module_available,
+    mock_system
 ):
     """
     Test the main function on macOS.
@@ -277,7 +286,7 @@ def test_main_macos(
     # Check that the correct functions were called
     mock_check_pip.assert_called_once()
     mock_install_pip.assert_not_called()
-    assert mock_install_package.call_count == 2
+    assert mock_install_package.call_count == 3
     mock_load_dotenv.assert_called_once()
     mock_openai.assert_called_once()
     assert mock_input.call_count == 2
@@ -285,21 +294,25 @@ def test_main_macos(
     mock_install_homebrew.assert_called_once()
 
     # Check ansible installation calls
-    assert any(['brew', 'install', 'ansible'] in call.args for call in mock_check_call.call_args_list)
+    assert any(['brew', 'install', 'ansible'] in call.args for call in mock_run_streaming.call_args_list)
 
-    # Check program installation calls
-    assert any(['brew', 'install', 'vim', 'git'] in call.args for call in mock_check_call.call_args_list)
+    # Check program installation calls: git is a catalog formula, vim is left to the playbook
+    assert any(['brew', 'install', 'git'] in call.args for call in mock_run_streaming.call_args_list)
+    assert not any(['brew', 'install', 'vim', 'git'] in call.args for call in mock_run_streaming.call_args_list)
 
     # Check playbook generation and execution
     mock_generate_playbook.assert_called_once()
+    assert mock_generate_playbook.call_args[0][2] == ['vim']
     # The template loading is tested in other tests. Here we focus on the main flow.
-    mock_open_file.assert_called_with('ansible_playbook.yml', 'w')
-    mock_open_file().write.assert_called_once_with('generated_playbook_content')
-    mock_check_output.assert_called_with(
+    mock_open_file.assert_any_call('ansible_playbook.yml', 'w')
+    # The checked playbook is written first, then its optimized version; the rest is the install journal.
+    written = [c.args[0] for c in mock_open_file().write.call_args_list if not c.args[0].startswith('{')]
+    assert written == [GENERATED_PLAYBOOK, optimize_playbook(GENERATED_PLAYBOOK)[0]]
+    mock_run_streaming.assert_any_call(
         ['ansible-playbook', 'ansible_playbook.yml', '--syntax-check', '-v'],
-        stderr=subprocess.STDOUT
+        timeout=main.SYNTAX_CHECK_TIMEOUT
     )
-    assert any(['ansible-playbook', 'ansible_playbook.yml', '-v'] in call.args for call in mock_check_call.call_args_list)
+    assert any(['ansible-playbook', 'ansible_playbook.yml', '-v'] in call.args for call in mock_run_streaming.call_args_list)
 
 @patch('sys.argv', ['program-installer', '--help'])
 def test_main_help(capsys):
@@ -335,23 +348,154 @@ def test_main_version(mock_version, capsys):
 @patch('program_installer.main.OpenAI')
 @patch('builtins.input', return_value='b')
 @patch('program_installer.main.command_exists', return_value=True)
-@patch('subprocess.check_call')
-@patch('subprocess.check_output', return_value=b'Syntax check passed')
+@patch('program_installer.main.run_streaming')
 @patch('builtins.open', new_callable=mock_open)
-@patch('program_installer.main.generate_playbook', return_value='generated_playbook_content')
+@patch('program_installer.main.generate_playbook', return_value=GENERATED_PLAYBOOK)
 def test_main_developer_list(
-    mock_generate_playbook, mock_open_file, mock_check_output, mock_check_call,
+    mock_generate_playbook, mock_open_file, mock_run_streaming,
     mock_command_exists, mock_input, mock_openai, mock_load_dotenv,
     mock_install_package, mock_install_pip, mock_check_pip, mock_system
 ):
     """
-    Test that the full developer template is used when option 'b' is selected.
+    Test that the developer list, which Homebrew installs entirely, needs neither the
+    API nor a playbook, and that formulae and casks are installed separately.
     """
     os.environ['OPENAI_API_KEY'] = 'test_key'
     main.main()
 
-    with open('template-full.yml', 'r') as f:
-        expected_template = f.read()
+    casks = [catalog.lookup('darwin', p, None)[1] for p in main.DEVELOPER_PROGRAMS['darwin'] if p != 'git']
+    commands = [call.args[0] for call in mock_run_streaming.call_args_list]
+    assert ['brew', 'install', 'git'] in commands
+    assert ['brew', 'install', '--cask'] + casks in commands
 
-    mock_generate_playbook.assert_called_once()
-    assert mock_generate_playbook.call_args[1]['template'] == expected_template
+    mock_generate_playbook.assert_not_called()
+    assert not any(c.args[:1] == ('ansible_playbook.yml',) for c in mock_open_file.call_args_list)
+    assert not any(call.args[0][0] == 'ansible-playbook' for call in mock_run_streaming.call_args_list)
+
+@patch('program_installer.main.run_playbook')
+@patch('program_installer.main.missing_packages', side_effect=lambda manager, packages: list(packages))
+@patch('program_installer.main.command_exists', return_value=True)
+def test_install_overlaps_playbook_preparation_with_native_install(
+    mock_command_exists, mock_missing_packages, mock_run_playbook
+):
+    """
+    Test that the playbook is prepared while the native install is still running,
+    and that the playbook only runs after both have finished.
+    """
+    prepared = threading.Event()
+    overlapped = []
+
+    def fake_prepare(*args):
+        prepared.set()
+        return 'playbook_content'
+
+    def fake_install(os_name, pm, programs, backend=None):
+        # Blocks until preparation has started on the other thread.
+        overlapped.append(prepared.wait(timeout=5))
+
+    with patch('program_installer.main.prepare_playbook', side_effect=fake_prepare), \
+            patch('program_installer.main.install_with_package_manager', side_effect=fake_install):
+        main.install_programs_and_configure(['git', 'vim'], 'darwin', MagicMock(), 'c')
+
+    assert overlapped == [True]
+    mock_run_playbook.assert_called_once()
+    assert mock_run_playbook.call_args.args[:2] == ('ansible_playbook.yml', None)
+
+@patch('program_installer.main.run_playbook')
+@patch('program_installer.main.install_with_package_manager')
+@patch('program_installer.main.prepare_playbook', side_effect=RuntimeError("generation failed"))
+@patch('program_installer.main.missing_packages', side_effect=lambda manager, packages: list(packages))
+@patch('program_installer.main.command_exists', return_value=True)
+def test_install_reports_playbook_preparation_errors(
+    mock_command_exists, mock_missing_packages, mock_prepare, mock_install, mock_run_playbook, capsys
+):
+    """
+    Test that an exception raised while preparing the playbook is reported at the join
+    point and the playbook is not run.
+    """
+    main.install_programs_and_configure(['git', 'vim'], 'darwin', MagicMock(), 'c')
+
+    mock_install.assert_called_once_with('darwin', None, ['git'], 'homebrew')
+    mock_run_playbook.assert_not_called()
+    assert "Error preparing playbook: generation failed" in capsys.readouterr().out
+
+def test_generate_playbook_hedges_slow_primary_model():
+    """
+    Test that the fallback model is queried once the primary exceeds the latency budget,
+    and that its response wins.
+    """
+    release_primary = threading.Event()
+
+    def create(model, messages, timeout):
+        if model == main.MODELS[0]:
+            release_primary.wait(timeout=5)
+            return completion("slow_playbook")
+        return completion("fast_playbook")
+
+    mock_client = MagicMock()
+    mock_client.chat.completions.create.side_effect = create
+    try:
+        result = main.generate_playbook(mock_client, "macOS", ["vim"], hedge_after=0.05)
+    finally:
+        release_primary.set()
+
+    assert result == "fast_playbook"
+    called_models = [c[1]['model'] for c in mock_client.chat.completions.create.call_args_list]
+    assert called_models == main.MODELS
+
+HUNG_PRIMARY_SCRIPT = """
+import time
+from unittest.mock import MagicMock
+from program_installer import main
+
+def create(model, messages, timeout):
+    assert timeout == main.REQUEST_TIMEOUT
+    if model == main.MODELS[0]:
+        time.sleep(30)
+    response = MagicMock()
+    response.choices[0].message.content = "fast_playbook"
+    return response
+
+client = MagicMock()
+client.chat.completions.create.side_effect = create
+started = time.monotonic()
+assert main.hedged_completion(client, "prompt", main.MODELS, 0.05) == "fast_playbook"
+print(f"returned after {time.monotonic() - started:.1f}s")
+"""
+
+def test_hedged_completion_does_not_wait_for_the_losing_request():
+    """
+    Test that neither the result nor the exit of the process waits for a hung request that lost the race.
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+    started = time.monotonic()
+    result = subprocess.run([sys.executable, "-c", HUNG_PRIMARY_SCRIPT], env=env, capture_output=True, text=True,
+                            timeout=25)
+
+    assert result.returncode == 0, result.stderr
+    assert "returned after 0." in result.stdout
+    assert time.monotonic() - started < 10
+
+def test_generate_playbook_hedge_not_needed_for_fast_primary():
+    """
+    Test that the fallback model is never queried when the primary answers within budget.
+    """
+    mock_client = MagicMock()
+    mock_client.chat.completions.create.return_value = completion("playbook_content")
+
+    result = main.generate_playbook(mock_client, "macOS", ["vim"], hedge_after=5)
+
+    assert result == "playbook_content"
+    mock_client.chat.completions.create.assert_called_once()
+    assert mock_client.chat.completions.create.call_args[1]['model'] == main.MODELS[0]
+
+@patch('program_installer.main.request_with_retries', side_effect=[None, "fallback_playbook"])
+def test_generate_playbook_hedge_starts_fallback_when_primary_fails(mock_request):
+    """
+    Test that a failed primary model starts the fallback immediately instead of
+    waiting for the latency budget to expire.
+    """
+    result = main.generate_playbook(MagicMock(), "macOS", ["vim"], hedge_after=60)
+
+    assert result == "fallback_playbook"
+    assert [c[0][1] for c in mock_request.call_args_list] == main.MODELS
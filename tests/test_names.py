@@ -0,0 +1,98 @@
+import os
+import subprocess
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+from program_installer import main, names
+from program_installer.names import NameIndex, load_name_index, resolve_programs
+
+APT_NAMES = ["code-server", "gimp", "gimp-data", "git", "git-lfs", "google-chrome-stable", "vim", "vlc"]
+
+
+def test_name_index_lookups():
+    """
+    Test exact, prefix and similarity lookups in the package name index.
+    """
+    index = NameIndex(APT_NAMES)
+    assert "gimp" in index and "gim" not in index
+    assert index.prefix_matches("gi") == ["gimp", "gimp-data", "git"]
+    assert index.similar("vlcc") == ["vlc"]
+    assert index.suggest("git-lf") == ["git-lfs", "git"]
+    assert index.suggest("zzzzzz") == []
+
+
+def test_name_list_is_cached_until_ttl(monkeypatch):
+    """
+    Test that the list of available packages is queried once and reused until it expires.
+    """
+    command = [sys.executable, "-c", "print('git'); print('vim')"]
+    monkeypatch.setattr(names, "NAME_COMMANDS", {"apt": [command]})
+
+    with patch('subprocess.check_output', wraps=subprocess.check_output) as mock_check_output:
+        assert load_name_index("apt").names == ["git", "vim"]
+        assert load_name_index("apt").names == ["git", "vim"]
+        assert mock_check_output.call_count == 1
+
+        old = time.time() - names.DEFAULT_NAMES_TTL - 1
+        os.utime(names.names_file("apt"), (old, old))
+        load_name_index("apt")
+        load_name_index("apt", refresh=True)
+        assert mock_check_output.call_count == 3
+
+
+def test_stale_list_is_used_when_the_query_fails(monkeypatch, capsys):
+    """
+    Test that a stale package list is used when listing the packages fails.
+    """
+    monkeypatch.setattr(names, "NAME_COMMANDS", {"apt": [["apt-cache", "pkgnames"]]})
+    with patch('subprocess.check_output', return_value=b"git\nvim\n"):
+        load_name_index("apt")
+    with patch('subprocess.check_output', side_effect=OSError("no apt-cache")):
+        assert load_name_index("apt", refresh=True).names == ["git", "vim"]
+    assert "Could not list the available apt packages" in capsys.readouterr().out
+
+    with patch('subprocess.check_output', side_effect=OSError("no pacman")):
+        assert load_name_index("pacman") is None
+
+
+def test_resolve_maps_aliases_and_reports_unknown_names(capsys):
+    """
+    Test that aliases are mapped, case is fixed and unknown names get suggestions.
+    """
+    with patch('program_installer.names.load_name_index', return_value=NameIndex(APT_NAMES)):
+        programs, known = resolve_programs("apt", ["chrome", "VLC", "gimpp", "code"])
+
+    assert programs == ["google-chrome-stable", "vlc", "gimpp", "code"]
+    assert known == {"google-chrome-stable", "vlc"}
+    out = capsys.readouterr().out
+    assert "Using apt package google-chrome-stable for chrome." in out
+    assert "gimpp is not a known apt package. Did you mean: gimp" in out
+
+
+def test_resolve_without_index_only_maps_aliases():
+    """
+    Test that without a package list only aliases are mapped and nothing is known.
+    """
+    assert resolve_programs("choco", ["vscode", "git"]) == (["vscode", "git"], None)
+    assert resolve_programs("brew", ["vscode"]) == (["visual-studio-code"], None)
+
+
+@patch('program_installer.main.run_playbook')
+@patch('program_installer.main.prepare_playbook', return_value='playbook_content')
+@patch('program_installer.main.install_with_package_manager')
+@patch('program_installer.main.refresh_index')
+@patch('program_installer.main.missing_packages', side_effect=lambda manager, packages: list(packages))
+@patch('program_installer.main.detect_package_manager', return_value='apt')
+@patch('program_installer.names.load_name_index', return_value=NameIndex(APT_NAMES))
+def test_unknown_names_are_left_to_the_playbook(
+    mock_load, mock_detect, mock_missing, mock_refresh, mock_install, mock_prepare, mock_run_playbook
+):
+    """
+    Test that names the package manager does not offer are installed by the playbook only.
+    """
+    client = MagicMock()
+    main.install_programs_and_configure(['vim', 'node'], 'linux', client, 'c')
+
+    mock_install.assert_called_once_with('linux', 'apt', ['vim'], 'apt')
+    assert mock_prepare.call_args.args[0] == ['nodejs']
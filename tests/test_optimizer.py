@@ -0,0 +1,142 @@
+import subprocess
+from unittest.mock import patch
+
+import yaml
+
+from program_installer import cache, catalog, main
+from program_installer.optimizer import optimize_playbook
+
+PLAYBOOK = """---
+- hosts: localhost
+  tasks:
+    - name: Install git
+      apt:
+        name: git
+        state: present
+      become: true
+      ignore_errors: true
+    - name: Install vim
+      apt:
+        name: vim
+        state: present
+      become: true
+      ignore_errors: true
+    - name: Remove nano
+      apt:
+        name: nano
+        state: absent
+      become: true
+      ignore_errors: true
+    - name: Install htop
+      apt:
+        name: htop
+        state: present
+      become: true
+      ignore_errors: true
+"""
+
+
+def test_consecutive_installs_are_merged_with_a_fallback():
+    """
+    Test that consecutive installs with one module are merged, with a looped fallback when the batch fails.
+    """
+    content, merged = optimize_playbook(PLAYBOOK)
+    play = yaml.safe_load(content)[0]
+    tasks = play["tasks"]
+
+    assert merged == 1
+    assert tasks[0]["apt"] == {"name": ["git", "vim"], "state": "present"}
+    assert tasks[0]["register"] == "installer_batch_1"
+    assert tasks[0]["ignore_errors"] is True
+    # One bad package fails the list, so the fallback installs them one by one.
+    assert tasks[1]["apt"] == {"name": "{{ item }}", "state": "present"}
+    assert tasks[1]["loop"] == ["git", "vim"]
+    assert tasks[1]["when"] == "installer_batch_1 is failed"
+    assert tasks[1]["become"] is True and tasks[1]["ignore_errors"] is True
+    # A different state or a lone task is left alone.
+    assert tasks[2]["name"] == "Remove nano"
+    assert tasks[3]["name"] == "Install htop"
+
+
+def test_play_settings():
+    """
+    Test that fact gathering is turned off unless a task uses facts, and pipelining is turned on.
+    """
+    play = yaml.safe_load(optimize_playbook(PLAYBOOK)[0])[0]
+    assert list(play)[:4] == ["hosts", "gather_facts", "vars", "tasks"]
+    assert play["gather_facts"] is False
+    assert play["vars"] == {"ansible_pipelining": True}
+
+    uses_facts = PLAYBOOK.replace("      become: true\n", "      when: ansible_os_family == 'Debian'\n", 1)
+    play = yaml.safe_load(optimize_playbook(uses_facts)[0])[0]
+    assert "gather_facts" not in play
+
+
+def test_existing_conditions_are_kept():
+    """
+    Test that the conditions of merged tasks are kept on the batch and its fallback.
+    """
+    content = PLAYBOOK.replace("      become: true\n", "      when: install_tools\n")
+    tasks = yaml.safe_load(optimize_playbook(content)[0])[0]["tasks"]
+    assert tasks[0]["when"] == "install_tools"
+    assert tasks[1]["when"] == ["install_tools", "installer_batch_1 is failed"]
+
+
+def test_optimized_playbook_is_idempotent_and_invalid_input_unchanged():
+    """
+    Test that optimizing twice changes nothing and invalid YAML is returned as is.
+    """
+    content, _ = optimize_playbook(PLAYBOOK)
+    assert optimize_playbook(content) == (content, 0)
+    assert optimize_playbook("not: [valid") == ("not: [valid", 0)
+
+
+def test_classic_snaps_are_not_merged():
+    """
+    Test that neighbouring classic snap tasks stay separate, since the snap module only
+    accepts classic with a single snap, while strict snaps are still merged.
+    """
+    content, _ = catalog.compile_playbook("linux", ["code", "slack", "postman", "dbeaver-ce"], "apt")
+    tasks = yaml.safe_load(optimize_playbook(content)[0])[0]["tasks"]
+
+    assert [t["snap"]["name"] for t in tasks if "loop" not in t] == ["code", "slack", ["postman", "dbeaver-ce"]]
+    assert all(t["snap"]["classic"] is True for t in tasks[:2])
+
+
+def test_developer_profile_needs_one_install_per_backend():
+    """
+    Test that the compiled developer profile installs with one task per backend.
+    """
+    content, _ = catalog.compile_playbook("darwin", main.DEVELOPER_PROGRAMS["darwin"])
+    optimized, merged = optimize_playbook(content)
+    batches = [t for t in yaml.safe_load(optimized)[0]["tasks"] if "loop" not in t]
+    assert merged == len(main.DEVELOPER_PROGRAMS["darwin"]) - 2
+    assert [list(t)[1] for t in batches] == ["homebrew", "homebrew_cask"]
+
+
+def test_optimized_playbook_falls_back_when_it_fails_the_checks(tmp_path):
+    """
+    Test that an optimized playbook failing validation or the syntax check is replaced by the
+    unoptimized one, and that a passing one is cached and reused without another check.
+    """
+    playbook_file = tmp_path / "ansible_playbook.yml"
+    store = cache.playbook_cache()
+
+    with patch('program_installer.main.run_streaming',
+               side_effect=subprocess.CalledProcessError(4, 'ansible-playbook')) as mock_run_streaming:
+        assert main.optimize_checked_playbook(str(playbook_file), PLAYBOOK, store) == PLAYBOOK
+    assert "--syntax-check" in mock_run_streaming.call_args.args[0]
+    assert playbook_file.read_text() == PLAYBOOK
+
+    broken = PLAYBOOK.replace("become: true", "become: true\n      bogus_module: {}", 1)
+    with patch('program_installer.main.optimize_playbook', return_value=(broken, 2)), \
+            patch('program_installer.main.run_streaming') as mock_run_streaming:
+        assert main.optimize_checked_playbook(str(playbook_file), PLAYBOOK, store) == PLAYBOOK
+    mock_run_streaming.assert_not_called()
+
+    with patch('program_installer.main.run_streaming') as mock_run_streaming:
+        optimized = main.optimize_checked_playbook(str(playbook_file), PLAYBOOK, store)
+        assert optimized == optimize_playbook(PLAYBOOK)[0]
+        assert main.optimize_checked_playbook(str(playbook_file), PLAYBOOK, store) == optimized
+    mock_run_streaming.assert_called_once()
+    assert playbook_file.read_text() == optimized
@@ -0,0 +1,197 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+from program_installer import main, planner
+from program_installer.planner import Plan, assign_backends, run_plan
+
+
+def test_every_program_gets_exactly_one_backend():
+    """
+    Test that every program is assigned to exactly one backend or the playbook.
+    """
+    groups, playbook = assign_backends("linux", "dnf", ["docker.io", "code", "htop", "mystery"], known={"htop"})
+    # The catalog maps docker.io to its dnf package; code is a classic snap.
+    assert groups == {
+        ("dnf", 0): [("docker.io", "moby-engine"), ("htop", "htop")],
+        ("classic snap", 0): [("code", "code")],
+    }
+    assert playbook == ["mystery"]
+
+    # Without a list of available packages, names outside the catalog cannot be trusted.
+    assert assign_backends("darwin", None, ["slack", "git", "htop"]) == (
+        {("homebrew_cask", 0): [("slack", "slack")], ("homebrew", 0): [("git", "git")]}, ["htop"]
+    )
+    assert assign_backends("windows", None, ["vlc"]) == ({("choco", 0): [("vlc", "vlc")]}, [])
+
+
+def test_dependencies_are_installed_in_later_stages(monkeypatch):
+    """
+    Test that programs are staged after their dependencies and dependency cycles are rejected.
+    """
+    groups, playbook = assign_backends("linux", "apt", ["docker-compose", "docker.io", "postman"],
+                                       known={"docker-compose"})
+    assert list(groups) == [("apt", 0), ("snap", 0), ("apt", 1)]
+    assert groups[("apt", 1)] == [("docker-compose", "docker-compose")]
+
+    # A program that needs one the playbook installs is installed by the playbook too.
+    monkeypatch.setitem(planner.PROGRAM_DEPENDENCIES, "linux", {"git": ["mystery"]})
+    assert assign_backends("linux", "apt", ["git", "mystery"]) == ({}, ["mystery", "git"])
+
+    monkeypatch.setitem(planner.PROGRAM_DEPENDENCIES, "linux", {"git": ["vim"], "vim": ["git"]})
+    try:
+        assign_backends("linux", "apt", ["git", "vim"])
+    except ValueError as e:
+        assert "Dependency cycle" in str(e)
+    else:
+        raise AssertionError("dependency cycle accepted")
+
+
+@patch('program_installer.main.index_is_fresh', return_value=False)
+def test_install_plan_runs_backends_side_by_side(mock_fresh):
+    """
+    Test that each backend gets its own step, locked by the package database it uses.
+    """
+    groups, _ = assign_backends("linux", "apt", ["docker-compose", "docker.io", "postman"], known={"docker-compose"})
+    plan = main.build_install_plan("linux", "apt", groups, [], MagicMock(), "c", "ansible_playbook.yml")
+
+    assert plan.describe() == [
+        "  1. refresh index: sudo apt update",
+        "  2. apt install: sudo apt install -y docker.io  (after 1)",
+        "  3. snap install: sudo snap install postman",
+        "  4. apt install, stage 2: sudo apt install -y docker-compose  (after 1, 2)",
+    ]
+    assert [step.locks for step in plan.steps] == [{"dpkg"}, {"dpkg"}, {"snapd"}, {"dpkg"}]
+
+
+def test_plan_description_and_unknown_dependencies():
+    """
+    Test that the plan is described as numbered steps and unknown dependencies are rejected.
+    """
+    plan = Plan()
+    plan.add("refresh index", "sudo apt update")
+    plan.add("native install", "apt install git", after=["refresh index"])
+    plan.add("prepare playbook", "compile or generate tasks for code")
+    plan.add("run playbook", "ansible-playbook ansible_playbook.yml", after=["prepare playbook", "native install"])
+
+    assert plan.describe() == [
+        "  1. refresh index: sudo apt update",
+        "  2. native install: apt install git  (after 1)",
+        "  3. prepare playbook: compile or generate tasks for code",
+        "  4. run playbook: ansible-playbook ansible_playbook.yml  (after 3, 2)",
+    ]
+    try:
+        plan.add("post config", "configure", after=["missing"])
+    except ValueError as e:
+        assert "missing" in str(e)
+    else:
+        raise AssertionError("unknown dependency accepted")
+
+
+def test_run_plan_overlaps_independent_steps_and_skips_after_failures(capsys):
+    """
+    Test that independent steps run at the same time and steps after a failure are skipped.
+    """
+    started = threading.Barrier(2, timeout=5)
+    order = []
+
+    def independent(name):
+        def action():
+            # Both independent steps must be running at the same time to pass the barrier.
+            started.wait()
+            order.append(name)
+        return action
+
+    plan = Plan()
+    plan.add("a", "first", independent("a"))
+    plan.add("b", "second", independent("b"))
+    plan.add("c", "after both", lambda: order.append("c"), after=["a", "b"])
+    plan.add("d", "fails", lambda: False)
+    plan.add("e", "after the failure", lambda: order.append("e"), after=["d"])
+    plan.add("f", "after the skipped step", lambda: order.append("f"), after=["e"])
+
+    status = run_plan(plan)
+
+    assert sorted(order[:2]) == ["a", "b"] and order[2:] == ["c"]
+    assert status == {"a": "done", "b": "done", "c": "done", "d": "failed", "e": "skipped", "f": "skipped"}
+    assert "Skipping e." in capsys.readouterr().out
+
+
+def test_run_plan_never_overlaps_steps_sharing_a_lock():
+    """
+    Test that steps sharing a lock take turns while steps with other locks overlap.
+    """
+    started = threading.Barrier(2, timeout=5)
+    events = []
+
+    def install(name, wait=False):
+        def action():
+            events.append(("start", name))
+            if wait:
+                # Only passes if the snap step runs while the first dpkg step does.
+                started.wait()
+            events.append(("end", name))
+        return action
+
+    plan = Plan()
+    plan.add("apt", "first dpkg step", install("apt", wait=True), locks=["dpkg"])
+    plan.add("apt stage 2", "second dpkg step", install("apt stage 2"), locks=["dpkg"])
+    plan.add("snap", "snapd step", install("snap", wait=True), locks=["snapd"])
+
+    assert set(run_plan(plan).values()) == {"done"}
+    assert events.index(("end", "apt")) < events.index(("start", "apt stage 2"))
+
+
+@patch('program_installer.main.run_playbook')
+@patch('program_installer.main.prepare_playbook')
+@patch('program_installer.main.install_with_package_manager')
+@patch('program_installer.main.refresh_index')
+@patch('program_installer.main.index_is_fresh', return_value=False)
+@patch('program_installer.main.missing_packages', side_effect=lambda manager, packages: list(packages))
+@patch('program_installer.main.detect_package_manager', return_value='apt')
+def test_dry_run_prints_the_plan_and_installs_nothing(
+    mock_detect, mock_missing, mock_fresh, mock_refresh, mock_install, mock_prepare, mock_run_playbook, capsys
+):
+    """
+    Test that a dry run prints the plan without installing anything.
+    """
+    main.install_programs_and_configure(['git', 'slack', 'mystery'], 'linux', MagicMock(), 'c', dry_run=True)
+
+    out = capsys.readouterr().out
+    assert "1. refresh index: sudo apt update" in out
+    assert "2. apt install: sudo apt install -y git  (after 1)" in out
+    assert "3. classic snap install: sudo snap install --classic slack" in out
+    assert "4. prepare playbook: compile or generate tasks for mystery" in out
+    assert "5. run playbook: ansible-playbook ansible_playbook.yml  (after 4, 1)" in out
+    for mock in (mock_refresh, mock_install, mock_prepare, mock_run_playbook):
+        mock.assert_not_called()
+
+
+@patch('program_installer.main.index_is_fresh', return_value=False)
+def test_playbook_only_plan_still_refreshes_a_stale_index(mock_fresh):
+    """
+    Test that a Linux plan without native installs refreshes a stale index before the playbook runs.
+    """
+    plan = main.build_install_plan("linux", "apt", {}, ["htop", "neovim"], MagicMock(), "c", "ansible_playbook.yml")
+
+    assert plan.describe() == [
+        "  1. refresh index: sudo apt update",
+        "  2. prepare playbook: compile or generate tasks for htop, neovim",
+        "  3. run playbook: ansible-playbook ansible_playbook.yml  (after 2, 1)",
+    ]
+
+
+@patch('program_installer.main.run_streaming')
+def test_classic_snaps_are_installed_one_at_a_time(mock_run_streaming):
+    """
+    Test that every classic snap gets its own command, since snapd only accepts
+    --classic with a single snap name.
+    """
+    assert main.install_with_package_manager("linux", "apt", ["code", "slack"], "classic snap") == {}
+    assert [c.args[0] for c in mock_run_streaming.call_args_list] == [
+        ["sudo", "snap", "install", "--classic", "code"],
+        ["sudo", "snap", "install", "--classic", "slack"],
+    ]
+
+    groups, _ = assign_backends("linux", "apt", ["code", "slack"])
+    plan = main.build_install_plan("linux", "apt", groups, [], MagicMock(), "c", "ansible_playbook.yml")
+    assert plan.steps[-1].description == "sudo snap install --classic code; sudo snap install --classic slack"
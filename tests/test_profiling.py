@@ -0,0 +1,103 @@
+import json
+import os
+from unittest.mock import MagicMock, patch
+
+from program_installer import index, main, profiling
+from program_installer.profiling import profiler
+
+
+def test_spans_are_only_recorded_when_enabled():
+    """
+    Test that spans are free until profiling is enabled.
+    """
+    with profiling.span("idle"):
+        pass
+    assert profiler.events == []
+
+    profiler.enable()
+    with profiling.span("busy", "phase", detail=1):
+        pass
+    assert [(e["name"], e["cat"], e["args"]) for e in profiler.events] == [("busy", "phase", {"detail": 1})]
+
+
+def test_command_label():
+    """
+    Test that subprocess spans are named after the program and its subcommand.
+    """
+    assert profiling.command_label(["sudo", "apt", "install", "-y", "vim"]) == "apt install"
+    assert profiling.command_label(["/usr/bin/python3", "-m", "pip", "--version"]) == "pip"
+    assert profiling.command_label(["ansible-playbook", "ansible_playbook.yml", "-v"]) == "ansible-playbook"
+    assert profiling.command_label(["ansible-playbook", "x.yml", "--syntax-check"]) == "ansible-playbook --syntax-check"
+
+
+@patch('subprocess.Popen')
+def test_phases_and_subprocesses_are_traced(mock_popen, tmp_path, capsys):
+    """
+    Test that a phase and the subprocesses it spawns end up in the trace and the summary.
+    """
+    def fake_popen(command, **kwargs):
+        # A finished process that printed nothing.
+        read_fd, write_fd = os.pipe()
+        os.close(write_fd)
+        return MagicMock(stdout=os.fdopen(read_fd, "rb"), **{"wait.return_value": 0})
+
+    mock_popen.side_effect = fake_popen
+    profiler.enable()
+    index.refresh_index("apt", force=True)
+    main.install_with_package_manager("linux", "apt", ["vim"])
+
+    names = [(e["cat"], e["name"]) for e in profiler.events]
+    assert names == [("subprocess", "apt update"), ("subprocess", "apt install"), ("phase", "native install")]
+
+    trace_file = tmp_path / "trace.json"
+    profiler.write_trace(str(trace_file))
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    complete = [e for e in events if e["ph"] == "X"]
+    assert {e["name"] for e in complete} == {"apt update", "apt install", "native install"}
+    assert all(e["dur"] >= 0 and "tid" in e for e in complete)
+
+    profiler.print_summary()
+    out = capsys.readouterr().out
+    assert "native install" in out and "Total (s)" in out
+
+
+@patch('sys.argv', ['program-installer', '--profile'])
+@patch('program_installer.main.run_main', side_effect=lambda args: main.run_playbook('missing.yml'))
+@patch('program_installer.main.run_streaming')
+def test_profile_flag_writes_trace(mock_run_streaming, mock_run_main, tmp_path, monkeypatch):
+    """
+    Test that --profile enables the profiler and writes the trace file when the run ends.
+    """
+    monkeypatch.chdir(tmp_path)
+    main.main()
+
+    events = json.loads((tmp_path / profiling.DEFAULT_TRACE_FILE).read_text())["traceEvents"]
+    assert "run playbook" in [e["name"] for e in events]
+
+
+@patch('sys.argv', ['program-installer', '--profile', 'fleet', 'inv.ini'])
+@patch('program_installer.main.run_main')
+def test_profile_flag_before_a_subcommand(mock_run_main, tmp_path, monkeypatch):
+    """
+    Test that --profile does not take the subcommand after it as the trace file.
+    """
+    monkeypatch.chdir(tmp_path)
+    main.main()
+
+    args = mock_run_main.call_args.args[0]
+    assert (args.command, args.inventory) == ("fleet", "inv.ini")
+    assert (tmp_path / profiling.DEFAULT_TRACE_FILE).exists()
+
+
+@patch('sys.argv', ['program-installer', '--profile-file', 'trace.json', 'batch', 'profiles.json'])
+@patch('program_installer.main.run_main')
+def test_profile_file_names_the_trace(mock_run_main, tmp_path, monkeypatch):
+    """
+    Test that --profile-file enables profiling and writes the trace to the given file.
+    """
+    monkeypatch.chdir(tmp_path)
+    main.main()
+
+    assert mock_run_main.call_args.args[0].command == "batch"
+    assert (tmp_path / "trace.json").exists()
+    assert not (tmp_path / profiling.DEFAULT_TRACE_FILE).exists()
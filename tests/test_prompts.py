@@ -0,0 +1,116 @@
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import yaml
+
+from program_installer import catalog, main, prompts
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_minify_template_keeps_one_task_per_module():
+    """
+    Test that the bundled full template shrinks to one example per module without defaults.
+    """
+    with open(os.path.join(ROOT, "template-full.yml")) as f:
+        template = f.read()
+
+    minified = prompts.minify_template(template)
+    tasks = yaml.safe_load(minified)[0]["tasks"]
+
+    assert tasks == [
+        {"name": "Install Git", "homebrew": {"name": "git"}, "ignore_errors": True},
+        {"name": "Install Docker", "homebrew_cask": {"name": "docker"}, "ignore_errors": True},
+    ]
+    assert prompts.estimate_tokens(minified) * 4 < prompts.estimate_tokens(template)
+
+
+def test_minify_template_strips_comments_from_text():
+    """
+    Test that templates that are not playbooks only lose their comments and blank lines.
+    """
+    assert prompts.minify_template("# base\n\nplaybook_template\n") == "playbook_template\n"
+
+
+@patch('program_installer.main.complete_prompt', return_value="playbook_content")
+def test_compiled_catalog_template_is_sent_whole(mock_complete_prompt):
+    """
+    Test that a compiled catalog playbook used as the template keeps every task, since
+    the prompt only names the programs missing from the catalog.
+    """
+    compiled, unknown = catalog.compile_playbook("darwin", ["vlc", "docker", "slack", "git", "htop"])
+    main.generate_full_playbook(MagicMock(), "darwin", unknown, "c", compiled)
+
+    prompt = mock_complete_prompt.call_args.args[1]
+    assert compiled in prompt
+    for program in ("vlc", "docker", "slack", "git"):
+        assert f"name: {program}" in prompt
+    assert "programs: htop." in prompt
+
+
+def test_truncate_error_keeps_relevant_lines():
+    """
+    Test that long Ansible output is cut down to the lines around the error.
+    """
+    noise = [f"Using module file /usr/lib/python3/module_{i}.py" for i in range(40)]
+    error = "\n".join(noise[:20] + [
+        "ERROR! 'brew_install' is not a valid attribute for a Task",
+        "The error appears to be in 'ansible_playbook.yml': line 12, column 7",
+    ] + noise[20:])
+
+    truncated = prompts.truncate_error(error)
+
+    assert "ERROR! 'brew_install'" in truncated
+    assert "line 12, column 7" in truncated
+    assert "module_0.py" not in truncated
+    assert len(truncated.splitlines()) < 10
+    assert prompts.truncate_error("some error") == "some error"
+
+
+def test_build_fix_prompt_compacts_previous_playbook():
+    """
+    Test that comments of the previous playbook are not resent, while line numbers and
+    block scalar contents stay as they are.
+    """
+    previous = (
+        "---\n"
+        "# comment\n"
+        "- hosts: localhost\n"
+        "  tasks:\n"
+        "    - name: Add script\n"
+        "      copy:\n"
+        "        content: |\n"
+        "          #!/bin/bash\n"
+        "\n"
+        "          # keep me\n"
+        "          echo hi\n"
+        "        dest: /tmp/hi.sh  # trailing\n"
+        "    # done\n"
+    )
+    prompt = prompts.build_fix_prompt("linux", ["vim"], "some error", previous)
+    assert "# comment" not in prompt and "# done" not in prompt
+    expected = previous.replace("# comment", "").replace("    # done", "")
+    assert f"Previous playbook:\n{expected}\n" in prompt
+    assert yaml.safe_load(expected) == yaml.safe_load(previous)
+
+
+def test_request_records_usage():
+    """
+    Test that reported token usage and latency are recorded per request, and estimated when missing.
+    """
+    prompts.usage_log.clear()
+    client = MagicMock()
+    response = client.chat.completions.create.return_value
+    response.choices[0].message.content = "playbook"
+    response.usage = SimpleNamespace(prompt_tokens=120, completion_tokens=30, total_tokens=150)
+
+    assert main.request_with_retries(client, "gpt-4o-mini", "prompt") == "playbook"
+    prompts.usage_log.record("gpt-5-2025-08-07", "x" * 400, "y" * 40, 0.5)
+
+    first, second = prompts.usage_log.calls
+    assert (first["model"], first["prompt_tokens"], first["completion_tokens"]) == ("gpt-4o-mini", 120, 30)
+    assert first["estimated"] is False and first["latency"] >= 0
+    assert (second["prompt_tokens"], second["completion_tokens"], second["estimated"]) == (101, 11, True)
+    assert prompts.usage_log.totals()["prompt_tokens"] == 221
+    prompts.usage_log.clear()
@@ -0,0 +1,132 @@
+import subprocess
+from unittest.mock import MagicMock, patch, mock_open
+
+import yaml
+
+from program_installer import main, repair
+
+PLAYBOOK = """---
+- hosts: localhost
+  tasks:
+    - name: Install git
+      homebrew:
+        name: git
+        state: present
+      ignore_errors: true
+
+    - name: Install vlc
+      homebrew_cask:
+        nme: vlc
+      ignore_errors: true
+
+    - name: Install slack
+      homebrew_cask:
+        name: slack
+      ignore_errors: true
+"""
+
+ANSIBLE_ERROR = (
+    "ERROR! Unsupported parameters for (homebrew_cask) module: nme\n\n"
+    "The error appears to be in '/tmp/ansible_playbook.yml': line 11, column 9, but may\n"
+    "be elsewhere in the file depending on the exact syntax problem.\n"
+)
+
+
+def test_task_spans():
+    """
+    Test that tasks are located by line range, including on invalid YAML.
+    """
+    spans = repair.task_spans(PLAYBOOK)
+    assert [(s["task"], s["start"], s["end"]) for s in spans] == [(1, 3, 8), (2, 9, 13), (3, 14, 18)]
+    assert all(s["indent"] == 4 and s["play"] == 1 for s in spans)
+
+    broken = "- hosts: localhost\n  tasks:\n    - name: a\n      shell: [\n    - name: b\n      debug: {}\n"
+    assert [s["start"] for s in repair.task_spans(broken)] == [2, 4]
+
+    # A fragments answer keeps its tasks under top-level program keys.
+    fragments = "vim:\n  - name: a\n    homebrew: {}\n'docker.io':\n- name: b\n  apt: {}\n"
+    assert [(s["play"], s["section"], s["start"], s["end"]) for s in repair.task_spans(fragments)] == [
+        (None, "vim", 1, 3), (None, "docker.io", 4, 6)
+    ]
+
+
+def test_failing_spans_from_ansible_and_validator_errors():
+    """
+    Test that Ansible line numbers and validator task references map to the right task.
+    """
+    assert [s["task"] for s in repair.failing_spans(PLAYBOOK, ANSIBLE_ERROR)] == [2]
+    assert [s["task"] for s in repair.failing_spans(PLAYBOOK, "play 1 tasks task 3 (Install slack): bad")] == [3]
+    assert repair.failing_spans(PLAYBOOK, "ERROR! no hosts matched") == []
+
+
+def test_task_fragment_and_splice():
+    """
+    Test that a task is extracted without indentation and replaced in place.
+    """
+    span = repair.failing_spans(PLAYBOOK, ANSIBLE_ERROR)[0]
+    assert repair.task_fragment(PLAYBOOK, span) == (
+        "- name: Install vlc\n  homebrew_cask:\n    nme: vlc\n  ignore_errors: true\n"
+    )
+
+    fixed = [{"name": "Install vlc", "homebrew_cask": {"name": "vlc"}, "ignore_errors": True}]
+    result = repair.splice_tasks(PLAYBOOK, span, fixed)
+    tasks = yaml.safe_load(result)[0]["tasks"]
+
+    assert tasks[1] == fixed[0]
+    assert tasks[0]["name"] == "Install git" and tasks[2]["name"] == "Install slack"
+    assert result.count("\n\n") == PLAYBOOK.count("\n\n")
+
+
+def test_parse_fixed_tasks_rejects_invalid_answers():
+    """
+    Test that answers which are not valid tasks are rejected.
+    """
+    assert repair.parse_fixed_tasks("```yaml\n- name: a\n  debug:\n    msg: hi\n```") == [
+        {"name": "a", "debug": {"msg": "hi"}}
+    ]
+    assert repair.parse_fixed_tasks("- name: a\n  not_a_module: {}\n") is None
+    assert repair.parse_fixed_tasks("Sorry, I cannot help.") is None
+
+
+@patch('program_installer.main.run_streaming')
+@patch('builtins.open', new_callable=mock_open)
+@patch('program_installer.main.generate_playbook')
+@patch('program_installer.main.complete_prompt',
+       return_value="- name: Install vlc\n  homebrew_cask:\n    name: vlc\n  ignore_errors: true\n")
+def test_check_and_fix_repairs_only_failing_task(mock_complete, mock_generate_playbook, mock_open_file, mock_run_streaming):
+    """
+    Test that a syntax-check failure regenerates only the task it points at.
+    """
+    mock_run_streaming.side_effect = [
+        subprocess.CalledProcessError(4, 'ansible-playbook', output=ANSIBLE_ERROR.encode()),
+        None,
+    ]
+
+    result = main.check_and_fix_playbook(MagicMock(), "darwin", ["git", "vlc", "slack"],
+                                         "ansible_playbook.yml", PLAYBOOK)
+
+    mock_generate_playbook.assert_not_called()
+    prompt = mock_complete.call_args[0][1]
+    assert "nme: vlc" in prompt
+    assert "Install git" not in prompt and "Install slack" not in prompt
+    assert yaml.safe_load(result)[0]["tasks"][1]["homebrew_cask"] == {"name": "vlc"}
+
+
+@patch('program_installer.main.run_streaming')
+@patch('builtins.open', new_callable=mock_open)
+@patch('program_installer.main.generate_playbook', return_value=PLAYBOOK)
+@patch('program_installer.main.complete_prompt')
+def test_check_and_fix_falls_back_to_full_regeneration(mock_complete, mock_generate_playbook, mock_open_file, mock_run_streaming):
+    """
+    Test that errors without a task location regenerate the whole playbook.
+    """
+    mock_run_streaming.side_effect = [
+        subprocess.CalledProcessError(4, 'ansible-playbook', output=b'ERROR! something odd'),
+        None,
+    ]
+
+    main.check_and_fix_playbook(MagicMock(), "darwin", ["git"], "ansible_playbook.yml", PLAYBOOK)
+
+    mock_complete.assert_not_called()
+    mock_generate_playbook.assert_called_once()
+    assert mock_generate_playbook.call_args[1]['error'] == 'ERROR! something odd'
@@ -0,0 +1,117 @@
+from unittest.mock import MagicMock, patch
+
+from program_installer import main, retry
+
+from helpers import completion
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = MagicMock(status_code=status_code, headers=headers or {})
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+def test_classify_error():
+    """
+    Test that errors are sorted into rate-limit, timeout, server and non-retryable categories.
+    """
+    assert retry.classify_error(FakeAPIError(429)) == retry.RATE_LIMIT
+    assert retry.classify_error(APITimeoutError()) == retry.TIMEOUT
+    assert retry.classify_error(ConnectionResetError()) == retry.TIMEOUT
+    assert retry.classify_error(FakeAPIError(503)) == retry.SERVER_ERROR
+    assert retry.classify_error(FakeAPIError(401)) == retry.NON_RETRYABLE
+    assert retry.classify_error(FakeAPIError(400)) == retry.NON_RETRYABLE
+    assert retry.classify_error(ValueError("bad")) == retry.UNKNOWN
+
+
+def test_retry_after_header():
+    """
+    Test that Retry-After and retry-after-ms headers are parsed into seconds.
+    """
+    assert retry.retry_after_seconds(FakeAPIError(429, {"retry-after": "3"})) == 3.0
+    assert retry.retry_after_seconds(FakeAPIError(429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry.retry_after_seconds(FakeAPIError(429, {"retry-after": "Thu, 01 Jan 1970 00:00:00 GMT"})) == 0.0
+    assert retry.retry_after_seconds(FakeAPIError(500)) is None
+
+
+@patch('random.random', return_value=1.0)
+def test_retry_policy_exponential_backoff_with_jitter(mock_random):
+    """
+    Test that delays grow exponentially, are capped, and are reduced by jitter.
+    """
+    policy = retry.RetryPolicy(base_delay=2, multiplier=2, max_delay=10, jitter=0.5)
+    assert policy.delay(0) == 1.0
+    assert policy.delay(1) == 2.0
+    assert policy.delay(5) == 5.0
+    assert policy.delay(0, FakeAPIError(429, {"retry-after": "4"})) == 4.0
+
+
+def test_circuit_breaker_opens_and_half_opens():
+    """
+    Test that the breaker opens after repeated failures and lets a trial through after the timeout.
+    """
+    now = [0.0]
+    breaker = retry.CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now[0] = 31.0
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now[0] = 62.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.failures == 0
+
+
+@patch('time.sleep', return_value=None)
+def test_generate_playbook_skips_retries_for_non_retryable_errors(mock_sleep):
+    """
+    Test that an authentication error moves on to the next model without sleeping.
+    """
+    mock_client = MagicMock()
+    mock_client.chat.completions.create.side_effect = [FakeAPIError(401), completion("playbook_content")]
+
+    assert main.generate_playbook(mock_client, "macOS", ["vim"]) == "playbook_content"
+    assert mock_client.chat.completions.create.call_count == 2
+    mock_sleep.assert_not_called()
+
+
+@patch('time.sleep', return_value=None)
+def test_generate_playbook_honors_retry_after(mock_sleep):
+    """
+    Test that the delay requested by a rate-limit response is used instead of the backoff.
+    """
+    mock_client = MagicMock()
+    mock_client.chat.completions.create.side_effect = [
+        FakeAPIError(429, {"retry-after": "3"}), completion("playbook_content")
+    ]
+
+    assert main.generate_playbook(mock_client, "macOS", ["vim"]) == "playbook_content"
+    mock_sleep.assert_called_once_with(3.0)
+
+
+@patch('time.sleep', return_value=None)
+def test_circuit_breaker_persists_across_calls(mock_sleep):
+    """
+    Test that a model which exhausted its retries is skipped by the next call in the process.
+    """
+    mock_client = MagicMock()
+    mock_client.chat.completions.create.side_effect = [FakeAPIError(503)] * 3 + [completion("first")]
+    assert main.generate_playbook(mock_client, "macOS", ["vim"]) == "first"
+
+    mock_client.chat.completions.create.reset_mock(side_effect=True)
+    mock_client.chat.completions.create.return_value = completion("second")
+    assert main.generate_playbook(mock_client, "macOS", ["vim"]) == "second"
+
+    mock_client.chat.completions.create.assert_called_once()
+    assert mock_client.chat.completions.create.call_args[1]['model'] == main.MODELS[1]
@@ -0,0 +1,95 @@
+import subprocess
+import sys
+
+import pytest
+
+from program_installer.runner import FileSink, run_streaming
+
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+
+def test_lines_reach_sinks_while_the_process_runs(tmp_path):
+    """
+    Test that a line is delivered before the process exits, not only at the end.
+    The child only prints its second line once the sink has seen the first one.
+    """
+    marker = tmp_path / "seen"
+    lines = []
+
+    def sink(line):
+        lines.append(line)
+        marker.touch()
+
+    code = (
+        "import os, time\n"
+        "print('first', flush=True)\n"
+        "deadline = time.time() + 10\n"
+        f"while not os.path.exists({str(marker)!r}) and time.time() < deadline: time.sleep(0.01)\n"
+        f"print('second' if os.path.exists({str(marker)!r}) else 'buffered')\n"
+    )
+    result = run_streaming(python(code), sinks=[sink])
+
+    assert lines == ["first\n", "second\n"]
+    assert result.returncode == 0
+
+
+def test_stderr_is_merged_and_partial_last_line_kept():
+    """
+    Test that stderr is merged into stdout and a last line without a newline is still delivered.
+    """
+    lines = []
+    code = "import sys; sys.stderr.write('warn\\n'); sys.stderr.flush(); sys.stdout.write('no newline')"
+    result = run_streaming(python(code), sinks=[lines.append])
+    assert lines == ["warn\n", "no newline\n"]
+    assert result.output == "warn\nno newline\n"
+
+
+def test_only_the_tail_is_kept():
+    """
+    Test that every line reaches the sinks but only the last tail_lines are kept as output.
+    """
+    lines = []
+    result = run_streaming(python("for i in range(50): print(i)"), sinks=[lines.append], tail_lines=3)
+    assert len(lines) == 50
+    assert result.output == "47\n48\n49\n"
+
+
+def test_failure_raises_with_the_tail_as_output():
+    """
+    Test that a failing command raises CalledProcessError carrying the output tail.
+    """
+    code = "print('boom'); raise SystemExit(3)"
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        run_streaming(python(code), sinks=[])
+    assert e.value.returncode == 3
+    assert e.value.output == b"boom\n"
+
+    result = run_streaming(python(code), sinks=[], check=False)
+    assert result.returncode == 3
+
+
+def test_timeout_kills_the_process():
+    """
+    Test that a command running past its timeout is killed and TimeoutExpired is raised.
+    """
+    with pytest.raises(subprocess.TimeoutExpired):
+        run_streaming(python("import time; print('waiting', flush=True); time.sleep(30)"), sinks=[], timeout=1)
+
+
+def test_broken_sink_does_not_stop_the_others(tmp_path):
+    """
+    Test that a sink that raises does not keep the other sinks from receiving lines.
+    """
+    def broken(line):
+        raise IOError("disk full")
+
+    log = tmp_path / "install.log"
+    file_sink = FileSink(str(log))
+    lines = []
+    run_streaming(python("print('a'); print('b')"), sinks=[broken, file_sink, lines.append])
+    file_sink.close()
+
+    assert lines == ["a\n", "b\n"]
+    assert log.read_text() == "a\nb\n"
@@ -0,0 +1,147 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from program_installer import main, streaming
+
+PLAYBOOK = """---
+- hosts: localhost
+  tasks:
+    - name: Install git
+      homebrew:
+        name: git
+      ignore_errors: true
+    - name: Install vlc
+      homebrew_cask:
+        name: vlc
+      ignore_errors: true
+"""
+
+BROKEN_PLAYBOOK = """---
+- hosts: localhost
+  tasks:
+    - name: Install git
+      brew_install:
+        name: git
+    - name: Install vlc
+      homebrew_cask:
+        name: vlc
+      ignore_errors: true
+"""
+
+BROKEN_FRAGMENTS = """vim:
+  - name: Install vim
+    bogus_module:
+      name: vim
+  - name: Configure vim
+    command: vim --version
+git:
+  - name: Install git
+    homebrew:
+      name: git
+    ignore_errors: true
+"""
+
+
+def _chunks(text, size=7):
+    chunks = []
+    for start in range(0, len(text), size):
+        chunk = MagicMock()
+        chunk.choices[0].delta.content = text[start:start + size]
+        chunks.append(chunk)
+    return chunks
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def test_progressive_validator_checks_tasks_as_they_complete():
+    """
+    Test that a task is only validated once the next task starts, and the last one on finish.
+    """
+    validator = streaming.ProgressiveValidator()
+    first_task_end = BROKEN_PLAYBOOK.index("    - name: Install vlc")
+
+    assert validator.feed(BROKEN_PLAYBOOK[:first_task_end]) == []
+    errors = validator.feed(BROKEN_PLAYBOOK[first_task_end:])
+    assert errors == ["play 1 tasks task 1 (Install git): unknown module 'brew_install'."]
+    assert validator.finish() == []
+
+
+def test_stream_completion_echoes_tokens():
+    """
+    Test that every token is passed to the sink and the full text is returned.
+    """
+    client = MagicMock()
+    stream = FakeStream(_chunks(PLAYBOOK))
+    client.chat.completions.create.return_value = stream
+    tokens = []
+
+    result = streaming.stream_completion(client, "model", "prompt", on_token=tokens.append)
+
+    assert result == PLAYBOOK
+    assert "".join(tokens) == PLAYBOOK + "\n"
+    assert client.chat.completions.create.call_args[1]['stream'] is True
+    assert stream.closed
+
+
+def test_stream_completion_aborts_on_broken_task():
+    """
+    Test that generation stops as soon as a broken task is complete.
+    """
+    client = MagicMock()
+    stream = FakeStream(_chunks(BROKEN_PLAYBOOK, size=1))
+    client.chat.completions.create.return_value = stream
+
+    with pytest.raises(streaming.StreamAborted):
+        streaming.stream_completion(client, "model", "prompt", on_token=None)
+
+    assert stream.consumed < len(stream.chunks)
+    assert stream.closed
+
+
+@patch('time.sleep', return_value=None)
+def test_generate_playbook_stream_retries_after_abort(mock_sleep, capsys):
+    """
+    Test that an aborted stream counts as a failed attempt and the next attempt is used.
+    """
+    client = MagicMock()
+    client.chat.completions.create.side_effect = [
+        FakeStream(_chunks(BROKEN_PLAYBOOK)), FakeStream(_chunks(PLAYBOOK))
+    ]
+
+    result = main.generate_playbook(client, "darwin", ["git", "vlc"], stream=True, hedge_after=5)
+
+    assert result == PLAYBOOK
+    assert client.chat.completions.create.call_count == 2
+    assert "Generation aborted" in capsys.readouterr().out
+
+
+@patch('time.sleep', return_value=None)
+def test_generate_task_fragments_stream_aborts_on_broken_task(mock_sleep, capsys):
+    """
+    Test that a streamed fragments answer is validated per task under each program key
+    and the broken generation is abandoned early.
+    """
+    validator = streaming.ProgressiveValidator()
+    assert validator.feed(BROKEN_FRAGMENTS) == ["vim task 1 (Install vim): unknown module 'bogus_module'."]
+
+    client = MagicMock()
+    stream = FakeStream(_chunks(BROKEN_FRAGMENTS, size=1))
+    client.chat.completions.create.side_effect = [stream] + [FakeStream(_chunks(BROKEN_FRAGMENTS))] * 10
+
+    assert main.generate_task_fragments(client, "darwin", None, ["vim", "git"], stream=True) == {}
+    assert stream.consumed < len(stream.chunks)
+    assert "Generation aborted" in capsys.readouterr().out
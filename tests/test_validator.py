@@ -0,0 +1,110 @@
+from unittest.mock import MagicMock, patch, mock_open
+
+import yaml
+
+from program_installer import main, validator
+
+VALID_PLAYBOOK = """---
+- hosts: localhost
+  connection: local
+  tasks:
+    - name: Install git
+      homebrew:
+        name: git
+        state: present
+      ignore_errors: true
+"""
+
+
+def test_validate_playbook_accepts_valid_playbook():
+    """
+    Test that a valid playbook is returned unchanged with no errors.
+    """
+    assert validator.validate_playbook(VALID_PLAYBOOK) == (VALID_PLAYBOOK, [])
+
+
+def test_validate_playbook_strips_code_fences():
+    """
+    Test that Markdown fences and surrounding prose are removed.
+    """
+    content, errors = validator.validate_playbook("Here you go:\n```yaml\n" + VALID_PLAYBOOK + "```\nEnjoy!")
+    assert errors == []
+    assert content == VALID_PLAYBOOK
+
+
+def test_validate_playbook_repairs_missing_hosts_and_ignore_errors():
+    """
+    Test that a missing hosts entry and missing ignore_errors on install tasks are added.
+    """
+    content, errors = validator.validate_playbook(
+        "- tasks:\n"
+        "    - name: Install vlc\n"
+        "      community.general.homebrew_cask:\n"
+        "        name: vlc\n"
+        "    - name: Say hello\n"
+        "      debug:\n"
+        "        msg: hello\n"
+    )
+    play = yaml.safe_load(content)[0]
+
+    assert errors == []
+    assert play["hosts"] == "localhost"
+    assert play["tasks"][0]["ignore_errors"] is True
+    assert "ignore_errors" not in play["tasks"][1]
+
+
+def test_validate_playbook_reports_unrepairable_defects():
+    """
+    Test that invalid YAML, unknown modules and tasks without modules are reported.
+    """
+    _, errors = validator.validate_playbook("- hosts: localhost\n  tasks: [\n")
+    assert errors and errors[0].startswith("Invalid YAML")
+
+    _, errors = validator.validate_playbook(
+        "- hosts: localhost\n"
+        "  tasks:\n"
+        "    - name: Install thing\n"
+        "      brew_install:\n"
+        "        name: thing\n"
+        "    - name: Nothing to do\n"
+        "      become: true\n"
+    )
+    assert errors == [
+        "play 1 tasks task 1 (Install thing): unknown module 'brew_install'.",
+        "play 1 tasks task 2 (Nothing to do): no module specified.",
+    ]
+
+    _, errors = validator.validate_playbook("just some text")
+    assert errors == ["Playbook must be a non-empty list of plays."]
+
+
+@patch('program_installer.main.run_streaming')
+@patch('builtins.open', new_callable=mock_open)
+@patch('program_installer.main.generate_playbook', return_value=VALID_PLAYBOOK)
+def test_check_and_fix_skips_syntax_check_for_invalid_playbook(mock_generate_playbook, mock_open_file, mock_run_streaming):
+    """
+    Test that a structurally broken playbook is sent for fixing without starting Ansible,
+    and only the fixed playbook is syntax-checked.
+    """
+    result = main.check_and_fix_playbook(MagicMock(), "darwin", ["git"], "ansible_playbook.yml", "not a playbook")
+
+    assert result == VALID_PLAYBOOK
+    mock_generate_playbook.assert_called_once()
+    assert "Playbook must be a non-empty list of plays." in mock_generate_playbook.call_args[1]['error']
+    mock_run_streaming.assert_called_once()
+
+
+@patch('program_installer.main.run_streaming')
+@patch('builtins.open', new_callable=mock_open)
+@patch('program_installer.main.generate_playbook')
+def test_check_and_fix_writes_repaired_playbook(mock_generate_playbook, mock_open_file, mock_run_streaming):
+    """
+    Test that auto-repaired defects are written back before the syntax check.
+    """
+    result = main.check_and_fix_playbook(MagicMock(), "darwin", ["git"], "ansible_playbook.yml",
+                                         "```yaml\n" + VALID_PLAYBOOK + "```\n")
+
+    assert result == VALID_PLAYBOOK
+    mock_generate_playbook.assert_not_called()
+    mock_open_file().write.assert_called_once_with(VALID_PLAYBOOK)
+    mock_run_streaming.assert_called_once()